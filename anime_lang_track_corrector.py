@@ -1,18 +1,37 @@
 #!/usr/bin/env python3
 import argparse
+import asyncio
+import contextlib
+import hashlib
+import heapq
+import json
+import math
 import os
 import re
+import shutil
+import signal
+import socket
+import sqlite3
 import subprocess
 import sys
-from datetime import datetime
-
-import fasttext
-import pymkv
+import threading
+import time
+import urllib.parse
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
 from chardet.universaldetector import UniversalDetector
 from discord_webhook import DiscordWebhook
 from langcodes import Language, standardize_tag
 from pysubparser import parser
 
+from detectors import load_detector
+from file_sources import MatroskaReader, extract_track, is_remote_path, open_file_source
+from image_subtitles import get_installed_languages, ocr_image_subtitles
+from profiling import FileProfiler
+
 from settings import *
 
 # Version of the script
@@ -24,7 +43,14 @@ ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # FastText Model Location
 PRETRAINED_MODEL_PATH = os.path.join(ROOT_DIR, fasttext_model_name)
-model = fasttext.load_model(PRETRAINED_MODEL_PATH)
+
+# The language detector backend, see detectors.py
+detector = load_detector(
+    detector_backend,
+    PRETRAINED_MODEL_PATH,
+    os.path.join(ROOT_DIR, ngram_profile_name),
+    detector_languages,
+)
 
 # Subtitle extraction location
 subtitle_location = os.path.join("/tmp", "subs_test")
@@ -62,17 +88,6 @@ if not in_docker:
             print(f"Error: {e}")
             exit()
 
-    se_download_link = "https://github.com/SubtitleEdit/subtitleedit/releases"
-
-    # if the file count isn't bigger than 1, then there's no files in the se folder
-    # bigger than one, because github requries a file for the folder to be created
-    se_file_count = [name for name in os.listdir(se_path) if not name.startswith(".")]
-    if len(se_file_count) <= 1:
-        print(f"\nSubtitleEdit not found!")
-        print(f"Download it at: {se_download_link}")
-        print(f"Place the contents in: {se_path}")
-        exit()
-
     # if subtitle_location does not exist, create it
     if not os.path.isdir(subtitle_location):
         try:
@@ -93,10 +108,94 @@ required_lang_match_percentage = 70
 # Used to determine the total execution time at the end
 startTime = datetime.now()
 
-# Stuff printed at the end
+# The messages of the file being processed, moved into the journal once it completes
 items_changed = []
 errors = []
 
+# The run journal location, used to resume interrupted runs and build the summary
+journal_path = os.path.join(ROOT_DIR, "logs", "journal.jsonl")
+
+# Whether or not to continue from the files completed in the journal
+resume = False
+
+# The maximum runtime, after which the run stops at the next file
+max_runtime = None
+
+# The run journal, if opened
+journal = None
+
+# Set when the process is asked to terminate, the run then stops at the next file
+stop_requested = False
+
+# The shard of the library scanned by this host (zero-based index) and the shard count
+shard_index = None
+shard_count = None
+
+# The resource governor throttling spawned tools, if enabled
+governor = None
+
+# The shard journals to merge into one report, when running in merge mode
+merge_journal_paths = []
+
+# The path the merged journal is written to
+merge_output_path = None
+
+# The worklist written when running in triage mode
+triage_output_path = None
+
+# The worklist of files to process, instead of a path or file
+worklist_path = None
+
+# The edit plan written instead of editing the files, when running in plan mode
+plan_output_path = None
+
+# The edit plan to verify and apply, when running in apply mode
+apply_plan_path = None
+
+# The folder the plan's files are applied under, instead of the root they were scanned at
+apply_root = None
+
+# The edit plan being written, if opened
+edit_plan = None
+
+# Whether to only list the learned release group rules
+list_rules = False
+
+# The path the learned release group rules are exported to
+export_rules_path = None
+
+# How often the Unicode script pre-classifier decided a track on its own
+script_detection_stats = {"decided": 0, "deferred": 0}
+
+# How many ASS events were kept as dialogue or dropped as signs/karaoke
+ass_filter_stats = {"dialogue": 0, "signs": 0, "fallbacks": 0}
+
+# The track languages set on the file currently being processed, by track id
+current_file_decisions = {}
+
+# The edits made to the file currently being processed, with their evidence, by track id
+current_file_edits = {}
+
+# The files an edit couldn't be written to, journaled as failed so a resumed run retries them
+failed_write_paths = set()
+
+# The track languages inferred from a season layout cluster for the current file
+layout_decisions = {}
+
+# The lowest confidence the layout sample had in each inferred track language
+layout_confidences = {}
+
+# The running asyncio pipeline, if enabled
+pipeline = None
+
+# Whether to profile the CPU time, allocations and RSS of each processed file
+profile_enabled = False
+
+# The collapsed stack file written when profiling, for flamegraph tools
+profile_output_path = os.path.join(ROOT_DIR, "logs", "profile.collapsed")
+
+# The running profiler, if enabled
+profiler = None
 
 # Signs & Full keyword arrays, add any keywords you want to be searched for
 signs_keywords = ["sign", "music", "song", "s&s"]
@@ -132,11 +231,162 @@ p.add_argument(
     help="The path to the SubtitleEdit folder.",
     required=False,
 )
+p.add_argument(
+    "-j",
+    "--journal",
+    help="The path to the run journal used for resuming and the end-of-run summary.",
+    required=False,
+)
+p.add_argument(
+    "--resume",
+    help="Continue from the files already completed in the run journal.",
+    action="store_true",
+    required=False,
+)
+p.add_argument(
+    "--max-runtime",
+    help="The maximum runtime in minutes, the run stops cleanly at the next file after it.",
+    required=False,
+)
+p.add_argument(
+    "--shard",
+    help="Only scan shard i of N of the path (EX: 1/4), split by series folder.",
+    required=False,
+)
+p.add_argument(
+    "--merge",
+    help="Merge the given shard journals into one report and exit.",
+    nargs="+",
+    required=False,
+)
+p.add_argument(
+    "--merge-output",
+    help="The path to write the merged journal to when using --merge.",
+    required=False,
+)
+p.add_argument(
+    "--triage",
+    help="Only read the track headers of the path or file, and write the files a full run would change or extract to this worklist.",
+    required=False,
+)
+p.add_argument(
+    "--worklist",
+    help="Only process the files in this worklist, written by --triage.",
+    required=False,
+)
+p.add_argument(
+    "--plan",
+    help="Run detection read-only and write the edits to this plan instead of editing the files.",
+    required=False,
+)
+p.add_argument(
+    "--apply",
+    help="Verify the files in this plan, written by --plan, are unchanged and apply its edits.",
+    required=False,
+)
+p.add_argument(
+    "--apply-root",
+    help="Apply the plan to the files under this folder instead of the path they were scanned at, EX: the original library of a scanned replica.",
+    required=False,
+)
+p.add_argument(
+    "--list-rules",
+    help="List the learned release group rules and exit.",
+    action="store_true",
+    required=False,
+)
+p.add_argument(
+    "--export-rules",
+    help="Export the learned release group rules to this JSON file and exit.",
+    required=False,
+)
+p.add_argument(
+    "--order",
+    help="The order path scans process directories in: walk (sorted os.walk order) or newest (most recently added first).",
+    choices=["walk", "newest"],
+    required=False,
+)
+p.add_argument(
+    "--priority-dirs",
+    help="Directories scanned before all others, in this order, as folder names or paths relative to the path.",
+    nargs="+",
+    required=False,
+)
+p.add_argument(
+    "--fresh-days",
+    help="Only scan files added or modified within this many days.",
+    required=False,
+)
+p.add_argument(
+    "-rg",
+    "--resource-governor",
+    help="Throttle extraction, OCR and writes so scans can run during playback.",
+    action="store_true",
+    required=False,
+)
+p.add_argument(
+    "-dm",
+    "--detection-mode",
+    help="How a track's lines are scored: lines (per-line votes) or windows (joined windows of lines).",
+    choices=["lines", "windows"],
+    required=False,
+)
+p.add_argument(
+    "-ap",
+    "--async-pipeline",
+    help="Overlap extraction, detection and writes using asyncio.",
+    action="store_true",
+    required=False,
+)
+p.add_argument(
+    "--profile",
+    help="Profile the CPU hot spots, allocation sites and RSS growth of each file.",
+    action="store_true",
+    required=False,
+)
+p.add_argument(
+    "--profile-output",
+    help="The collapsed stack file written when profiling, for flamegraph tools.",
+    required=False,
+)
 
 # parse the arguments
 args = p.parse_args()
 
-if args.path is None and args.file is None:
+if args.merge:
+    merge_journal_paths = args.merge
+    merge_output_path = args.merge_output
+    print(f"\tMerge Journals: {merge_journal_paths}")
+    print(f"\tMerge Output: {merge_output_path}")
+elif args.apply:
+    if args.path or args.file or args.worklist or args.triage or args.plan:
+        print("\tA plan can't be applied along with a path, file, worklist, triage or plan.")
+        exit()
+    if not os.path.isfile(args.apply):
+        print(f"\tPlan not found: {args.apply}")
+        exit()
+    apply_plan_path = os.path.abspath(args.apply)
+    print(f"\tApply Plan: {apply_plan_path}")
+    if args.apply_root:
+        if not os.path.isdir(args.apply_root):
+            print(f"\tApply root not found: {args.apply_root}")
+            exit()
+        apply_root = os.path.abspath(args.apply_root)
+    print(f"\tApply Root: {apply_root or 'the scanned paths'}")
+elif args.list_rules or args.export_rules:
+    list_rules = args.list_rules
+    export_rules_path = args.export_rules
+    print(f"\tRelease Rules: {release_rules_path}")
+elif args.worklist:
+    if args.path or args.file or args.triage:
+        print("\tA worklist can't be combined with a path, file or triage.")
+        exit()
+    if not os.path.isfile(args.worklist):
+        print(f"\tWorklist not found: {args.worklist}")
+        exit()
+    worklist_path = os.path.abspath(args.worklist)
+    print(f"\tWorklist: {worklist_path}")
+elif args.path is None and args.file is None:
     print("\tNo path or file specified.")
     exit()
 
@@ -172,6 +422,109 @@ if args.se_path:
         exit()
 print(f"\tSubtitleEdit Path: {se_path}")
 
+if args.triage:
+    triage_output_path = args.triage
+    print(f"\tTriage Output: {triage_output_path}")
+
+if args.plan:
+    if args.triage:
+        print("\tA plan can't be combined with triage.")
+        exit()
+    # the walk changes directory, so the path is resolved up front
+    plan_output_path = os.path.abspath(args.plan)
+    print(f"\tPlan Output: {plan_output_path}")
+
+if file and is_remote_path(file) and not plan_output_path and not triage_output_path:
+    print("\tRemote files can only be scanned with --plan or --triage.")
+    exit()
+
+if (
+    not in_docker
+    and not merge_journal_paths
+    and not triage_output_path
+    and not apply_plan_path
+    and not list_rules
+    and not export_rules_path
+):
+    se_download_link = "https://github.com/SubtitleEdit/subtitleedit/releases"
+
+    # if the file count isn't bigger than 1, then there's no files in the se folder
+    # bigger than one, because github requries a file for the folder to be created
+    se_file_count = [name for name in os.listdir(se_path) if not name.startswith(".")]
+    if len(se_file_count) <= 1:
+        print(f"\nSubtitleEdit not found!")
+        print(f"Download it at: {se_download_link}")
+        print(f"Place the contents in: {se_path}")
+        exit()
+
+if args.async_pipeline:
+    async_pipeline = True
+print(f"\tAsync Pipeline: {async_pipeline}")
+
+if args.detection_mode:
+    detection_mode = args.detection_mode
+print(f"\tDetection Mode: {detection_mode}")
+
+if args.profile or args.profile_output:
+    profile_enabled = True
+    if args.profile_output:
+        profile_output_path = os.path.abspath(args.profile_output)
+    print(f"\tProfile Output: {profile_output_path}")
+print(f"\tProfile: {profile_enabled}")
+
+if args.shard:
+    try:
+        shard_number, shard_count = [int(part) for part in args.shard.split("/")]
+        if not 1 <= shard_number <= shard_count:
+            raise ValueError
+        shard_index = shard_number - 1
+    except ValueError:
+        print("Invalid shard, expected i/N with 1 <= i <= N (EX: 1/4).")
+        exit()
+    lock_files_enabled = True
+    # keep each shard's journal apart on the share
+    journal_path = os.path.join(
+        ROOT_DIR, "logs", f"journal.shard-{shard_number}-of-{shard_count}.jsonl"
+    )
+    print(f"\tShard: {shard_number}/{shard_count}")
+print(f"\tLock Files: {lock_files_enabled}")
+
+if args.order:
+    scan_order = args.order
+print(f"\tScan Order: {scan_order}")
+
+if args.priority_dirs:
+    priority_directories = args.priority_dirs
+print(f"\tPriority Directories: {priority_directories}")
+
+if args.fresh_days:
+    try:
+        fresh_days = float(args.fresh_days)
+    except ValueError:
+        print("Invalid fresh days.")
+        exit()
+print(f"\tFresh Days: {fresh_days}")
+
+if args.resource_governor:
+    resource_governor_enabled = True
+print(f"\tResource Governor: {resource_governor_enabled}")
+
+if args.journal:
+    journal_path = args.journal
+print(f"\tJournal: {journal_path}")
+
+if args.resume:
+    resume = True
+print(f"\tResume: {resume}")
+
+if args.max_runtime:
+    try:
+        max_runtime = timedelta(minutes=int(args.max_runtime))
+    except ValueError:
+        print("Invalid max runtime.")
+        exit()
+print(f"\tMax Runtime: {max_runtime}")
+
 
 # Removes the file if it exists (used for cleaning up after FastText detection)
 def remove_file(file, silent=False):
@@ -263,8 +616,247 @@ def remove_hidden_files(files, root):
             files.remove(file)
 
 
-# execute command with subprocess and return the output
-def execute_command(command):
+# Throttles the heavy subprocesses (extraction, OCR, writes) with ionice/nice,
+# a read bandwidth limit, per-class concurrency caps, and an adaptive backoff
+# while the load average (net of this tool's own work) is high or a playback
+# pause file exists.
+class ResourceGovernor:
+    def __init__(self):
+        self.semaphores = {
+            resource_class: threading.BoundedSemaphore(max(int(limit), 1))
+            for resource_class, limit in governor_concurrency.items()
+        }
+        self.lock = threading.Lock()
+        self.read_available_at = time.monotonic()
+        self.prefix = []
+        if shutil.which("ionice"):
+            self.prefix += ["ionice", "-c", str(governor_ionice_class)]
+        if shutil.which("nice"):
+            self.prefix += ["nice", "-n", str(governor_nice_level)]
+        # concurrent extractions share the read limit
+        self.read_rate = int(
+            governor_read_bytes_per_second
+            / max(int(governor_concurrency.get("extract", 1)), 1)
+        )
+        # probed on the first limited read, None until then
+        self.scope_prefix = None
+        self.probe_lock = threading.Lock()
+        # the heavy subprocesses running and the load they and this process add,
+        # only tracked when the load average is checked
+        self.active = 0
+        self.own_load = 0
+        if governor_max_load:
+            threading.Thread(target=self.track_own_load, daemon=True).start()
+
+    # Returns the systemd-run prefix that runs a command in a transient scope with
+    # a read bandwidth limit (cgroup io.max), or an empty list where it's not available
+    def probe_scope_prefix(self):
+        if not self.read_rate or not shutil.which("systemd-run"):
+            return []
+        prefix = ["systemd-run", "--scope", "--quiet"]
+        if os.geteuid() != 0:
+            prefix.append("--user")
+        device = self.get_block_device(ROOT_DIR)
+        if not device:
+            return []
+        try:
+            result = subprocess.run(
+                prefix
+                + ["-p", f"IOReadBandwidthMax={device} {self.read_rate}", "--", "true"],
+                capture_output=True,
+                timeout=30,
+            )
+        except (OSError, subprocess.SubprocessError):
+            return []
+        return prefix if result.returncode == 0 else []
+
+    # Returns the block device node of the file's file system, EX: /dev/block/8:1,
+    # or None for network and virtual file systems, which have no block device
+    def get_block_device(self, full_path):
+        try:
+            device = os.stat(full_path).st_dev
+        except OSError:
+            return None
+        device_path = f"/dev/block/{os.major(device)}:{os.minor(device)}"
+        if not os.major(device) or not os.path.exists(device_path):
+            return None
+        return device_path
+
+    # Returns the device the command's reads of the file can be limited on, if any.
+    # systemd-run is only probed once a read is limited.
+    def get_read_device(self, read_path):
+        if not self.read_rate or not read_path:
+            return None
+        with self.probe_lock:
+            if self.scope_prefix is None:
+                self.scope_prefix = self.probe_scope_prefix()
+        if not self.scope_prefix:
+            return None
+        return self.get_block_device(read_path)
+
+    # Prefixes the command with ionice and nice, which its children inherit,
+    # and with a scope limiting its reads from the device when given
+    def wrap_command(self, command, read_device=None):
+        prefix = list(self.prefix)
+        if read_device:
+            prefix = (
+                self.scope_prefix
+                + ["-p", f"IOReadBandwidthMax={read_device} {self.read_rate}", "--"]
+                + prefix
+            )
+        return prefix + list(command)
+
+    # Averages the load this tool adds itself the way the kernel averages the load:
+    # every 5 seconds, over a minute. It counts the running heavy subprocesses
+    # and the CPU this process used since the last sample.
+    def track_own_load(self):
+        decay = math.exp(-5 / 60)
+        last_cpu = sum(os.times()[:2])
+        while True:
+            time.sleep(5)
+            cpu = sum(os.times()[:2])
+            current = self.active + (cpu - last_cpu) / 5
+            last_cpu = cpu
+            self.own_load = self.own_load * decay + current * (1 - decay)
+
+    # Checks the configured load signals
+    def is_overloaded(self):
+        if governor_pause_file and os.path.exists(governor_pause_file):
+            return True
+        if governor_max_load:
+            try:
+                load = max(os.getloadavg()[0] - self.own_load, 0) / (os.cpu_count() or 1)
+            except OSError:
+                return False
+            return load > governor_max_load
+        return False
+
+    # Waits with an exponential backoff until the load signals are low
+    def wait_for_capacity(self):
+        backoff = 1
+        while self.is_overloaded():
+            if stop_requested:
+                return
+            print(f"\t\tSystem busy, backing off for {backoff}s.")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, governor_max_backoff_seconds)
+
+    # Spaces out the starts of reads so the average rate stays under the configured
+    # limit, charging each its whole size up front. Used where the reads themselves
+    # can't be limited, a single read still runs at full speed.
+    def throttle_read(self, read_bytes):
+        if not governor_read_bytes_per_second or not read_bytes:
+            return
+        with self.lock:
+            now = time.monotonic()
+            start_at = max(now, self.read_available_at)
+            self.read_available_at = (
+                start_at + read_bytes / governor_read_bytes_per_second
+            )
+        if start_at > now:
+            time.sleep(start_at - now)
+
+    def acquire(self, resource_class, read_bytes=0):
+        self.wait_for_capacity()
+        semaphore = self.semaphores.get(resource_class)
+        if semaphore:
+            semaphore.acquire()
+        self.throttle_read(read_bytes)
+        with self.lock:
+            self.active += 1
+
+    def release(self, resource_class):
+        with self.lock:
+            self.active -= 1
+        semaphore = self.semaphores.get(resource_class)
+        if semaphore:
+            semaphore.release()
+
+    @contextlib.contextmanager
+    def slot(self, resource_class, read_bytes=0):
+        self.acquire(resource_class, read_bytes)
+        try:
+            yield
+        finally:
+            self.release(resource_class)
+
+
+# Returns the size of the file, used to charge extractions against the read limit
+# and to estimate triage costs
+def get_file_size(full_path):
+    try:
+        return os.path.getsize(full_path)
+    except OSError:
+        return 0
+
+
+# Checks if the file is read with the built-in Matroska reader instead of mkvtoolnix
+def uses_file_source(full_path):
+    return native_demux_enabled or is_remote_path(full_path)
+
+
+# Opens the file source of the local path or remote url
+def open_source(full_path):
+    return open_file_source(
+        full_path, http_block_size, http_cache_blocks, http_read_ahead_blocks
+    )
+
+
+# Returns the identity an edit plan records for the file: its size, modification time
+# and a hash of its first and last plan_fingerprint_bytes, where the mkv headers live.
+# Remote files have no modification time.
+def get_file_identity(full_path):
+    fingerprint = hashlib.sha1()
+    with open_source(full_path) as source:
+        size = source.size
+        fingerprint.update(source.read(0, plan_fingerprint_bytes))
+        if size > plan_fingerprint_bytes:
+            fingerprint.update(
+                source.read(
+                    max(size - plan_fingerprint_bytes, plan_fingerprint_bytes),
+                    plan_fingerprint_bytes,
+                )
+            )
+    return {
+        "size": size,
+        "mtime_ns": None if is_remote_path(full_path) else os.stat(full_path).st_mtime_ns,
+        "fingerprint": fingerprint.hexdigest(),
+    }
+
+
+# Checks the file still matches the identity it was planned with.
+# The modification time isn't compared, as copying to or from a replica may not keep it.
+def matches_file_identity(full_path, identity):
+    try:
+        current = get_file_identity(full_path)
+    except (OSError, ValueError):
+        return False
+    return (
+        current["size"] == identity.get("size")
+        and current["fingerprint"] == identity.get("fingerprint")
+    )
+
+
+# Returns the bytes to charge a command reading the file against the read limit,
+# nothing when its reads are limited directly on the device
+def get_read_charge(read_path, read_device):
+    if not read_path or read_device:
+        return 0
+    return get_file_size(read_path)
+
+
+# execute command with subprocess and return the output,
+# read_path is the file the command reads in full, for the read limit
+def execute_command(command, resource_class=None, read_path=None):
+    if governor and resource_class:
+        read_device = governor.get_read_device(read_path)
+        with governor.slot(resource_class, get_read_charge(read_path, read_device)):
+            return run_command(governor.wrap_command(command, read_device))
+    return run_command(command)
+
+
+# Runs the command, echoing its output as it arrives
+def run_command(command):
     process = None
     try:
         process = subprocess.Popen(command, stdout=subprocess.PIPE)
@@ -282,26 +874,73 @@ def execute_command(command):
     return process
 
 
+# Asynchronously executes the command and returns the finished process
+async def execute_command_async(command, resource_class=None, read_path=None):
+    if governor and resource_class:
+        read_device = governor.get_read_device(read_path)
+        await asyncio.to_thread(
+            governor.acquire, resource_class, get_read_charge(read_path, read_device)
+        )
+        try:
+            return await run_command_async(governor.wrap_command(command, read_device))
+        finally:
+            governor.release(resource_class)
+    return await run_command_async(command)
+
+
+# Asynchronously runs the command, echoing its output as it arrives
+async def run_command_async(command):
+    process = None
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.PIPE
+        )
+        while True:
+            output = await process.stdout.readline()
+            if not output:
+                break
+            sys.stdout.buffer.write(output)
+            sys.stdout.flush()
+        await process.wait()
+    except Exception as e:
+        send_message(
+            f"Error occurred while executing command: {command} \n{e}", error=True
+        )
+    return process
+
+
 # Processes the subtitle file by extracting and converting it
 def process_subtitle_file(file_name, track, full_path, root):
+    if pipeline:
+        prefetched = pipeline.get_prefetched(full_path, track.track_id)
+        if prefetched:
+            print("\t\tUsing prefetched subtitle file.")
+            return prefetched
+
     outputted_file = os.path.join(root, file_name)
-    call = execute_command(
-        [
-            "mkvextract",
-            "tracks",
+    basename = os.path.basename(full_path)
+    if uses_file_source(full_path):
+        extracted = demux_subtitle_track(full_path, track, outputted_file)
+    else:
+        call = execute_command(
+            [
+                "mkvextract",
+                "tracks",
+                full_path,
+                f"{track.track_id}:{outputted_file}",
+            ],
+            "extract",
             full_path,
-            f"{track.track_id}:{outputted_file}",
-        ]
-    )
+        )
+        extracted = call is not None and call.returncode == 0
 
-    if os.path.isfile(outputted_file) and call.returncode == 0:
+    if extracted and os.path.isfile(outputted_file):
         print("\t\tExtraction successful.")
         print("\t\tConverting subtitle for detection.")
 
-        basename = os.path.basename(full_path)
         converted = convert_subtitle_file(outputted_file, basename)
 
-        if os.path.isfile(converted):
+        if converted and os.path.isfile(converted):
             return converted
         else:
             print("\t\tConversion failed.")
@@ -311,46 +950,218 @@ def process_subtitle_file(file_name, track, full_path, root):
         )
 
 
-# Sets the track language using mkvpropedit
-def set_track_language(path, track, language_code):
+# Demuxes the subtitle track with the built-in Matroska reader, only reading a sample
+# of its clusters, returns True if any subtitles were written
+def demux_subtitle_track(full_path, track, outputted_file):
+    try:
+        with governor.slot("extract") if governor else contextlib.nullcontext():
+            with open_source(full_path) as source:
+                count = extract_track(
+                    source, track.track_id, outputted_file, demux_sample_clusters
+                )
+                print(f"\t\tDemuxed {count} subtitles, {source.stats()}")
+    except Exception as e:
+        send_message(
+            f"\t\tFailed to demux track {track.track_id} of {full_path}\n\t\tError: {e}",
+            error=True,
+        )
+        return False
+    return count > 0
+
+
+# Sets the track language using mkvpropedit, or only records the edit in plan mode.
+# The evidence is what decided the language (keyword, elimination, layout, detection
+# or comparison) and the confidence its match percentage.
+def set_track_language(path, track, language_code, evidence, confidence=None):
     track_number = track.track_id + 1
+    current_file_edits[track.track_id] = {
+        "track": track_number,
+        "type": track._track_type,
+        "name": track.track_name,
+        "old": track.language,
+        "new": language_code,
+        "evidence": evidence,
+        "confidence": round(confidence, 2) if confidence is not None else None,
+    }
 
-    try:
-        execute_command(
-            [
-                "mkvpropedit",
-                path,
-                "--edit",
-                f"track:{track_number}",
-                "--set",
-                f"language={language_code}",
-            ]
+    if is_remote_path(path) and not edit_plan:
+        send_message(
+            f"\t\tRemote files can only be edited through --plan and --apply: {path}",
+            error=True,
+        )
+        return
+
+    if edit_plan:
+        current_file_decisions[track.track_id] = language_code
+        send_message(
+            f"\t\tFile: {path}\n\t\tTrack: {track_number} planned: "
+            f"{track.language} -> {language_code} ({evidence})",
+            True,
         )
+        return
+
+    try:
+        command = [
+            "mkvpropedit",
+            path,
+            "--edit",
+            f"track:{track_number}",
+            "--set",
+            f"language={language_code}",
+        ]
+        if pipeline:
+            # recorded once the background write succeeds
+            pipeline.submit_write(command, path, track.track_id, language_code)
+            return
+        if not lock_files_enabled:
+            process = execute_command(command, "write")
+        else:
+            lock_path = acquire_file_lock(path)
+            if not lock_path:
+                failed_write_paths.add(path)
+                send_message(
+                    f"\t\tFile is locked by another host, skipping edit: {path}",
+                    error=True,
+                )
+                return
+            try:
+                process = execute_command(command, "write")
+            finally:
+                release_file_lock(lock_path)
+        if process is None or process.returncode != 0:
+            failed_write_paths.add(path)
+            send_message(
+                f"\t\tFailed to set track {track_number} of {path} to: {language_code}",
+                error=True,
+            )
+            return
+        current_file_decisions[track.track_id] = language_code
         send_message(
             f"\t\tFile: {path}\n\t\tTrack: {track_number} set to: {language_code}",
             True,
         )
     except Exception as e:
+        failed_write_paths.add(path)
         send_message(f"{e} File: {path}", error=True)
 
 
-# Checks the match result and sets the track language if above threshold
-def check_and_set_result(
-    match_result,
-    full_path,
-    track,
-    lang_code,
-    original_subtitle_array,
-    root,
-    tracks,
-):
+# Returns the advisory lock file path for the video file
+# EX: /anime/Show/ep01.mkv -> /anime/Show/.ep01.mkv.lock
+def get_lock_path(full_path):
+    folder, name = os.path.split(full_path)
+    return os.path.join(folder, f".{name}.lock")
+
+
+# Removes the lock file if it's stale. It's first renamed to a name of our own and checked
+# again, so a fresh lock another host created in its place after our check isn't removed.
+# A fresh lock caught by the rename is linked back, which fails rather than replace
+# a lock created in the meantime.
+def break_stale_lock(lock_path):
+    try:
+        if time.time() - os.path.getmtime(lock_path) <= lock_stale_minutes * 60:
+            return False
+        stale_path = f"{lock_path}.stale.{socket.gethostname()}.{os.getpid()}.{time.time_ns()}"
+        os.rename(lock_path, stale_path)
+    except OSError:
+        # released or broken by another host between our attempts
+        return False
+
+    try:
+        if time.time() - os.path.getmtime(stale_path) > lock_stale_minutes * 60:
+            print(f"\t\tRemoving stale lock file: {lock_path}")
+            return True
+        try:
+            os.link(stale_path, lock_path)
+        except FileExistsError:
+            send_message(
+                f"\t\tLock file was replaced while restoring it: {lock_path}", error=True
+            )
+        except OSError:
+            # shares without hard links
+            os.rename(stale_path, lock_path)
+        return False
+    except OSError as e:
+        send_message(f"\t\tFailed to restore lock file: {lock_path}\n\t\tError: {e}")
+        return False
+    finally:
+        try:
+            os.remove(stale_path)
+        except OSError:
+            pass
+
+
+# Creates the lock file next to the video, waiting for another host to release it.
+# Returns the lock path, or None if the lock couldn't be acquired in time.
+def acquire_file_lock(full_path):
+    lock_path = get_lock_path(full_path)
+    waited = 0
+
+    while True:
+        try:
+            descriptor = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if break_stale_lock(lock_path) or not os.path.exists(lock_path):
+                continue
+            if waited >= lock_wait_seconds:
+                return None
+            time.sleep(1)
+            waited += 1
+            continue
+        except OSError as e:
+            send_message(f"\t\tFailed to create lock file: {lock_path}\n\t\tError: {e}")
+            return None
+
+        with os.fdopen(descriptor, "w") as handle:
+            json.dump(
+                {"host": socket.gethostname(), "pid": os.getpid(), "time": time.time()},
+                handle,
+            )
+        return lock_path
+
+
+# Removes the lock file created by acquire_file_lock
+def release_file_lock(lock_path):
+    try:
+        os.remove(lock_path)
+    except OSError as e:
+        send_message(f"\t\tFailed to remove lock file: {lock_path}\n\t\tError: {e}")
+
+
+# Counts a confident detection toward the track's release group rule, whether or not
+# it changes the track. Plan runs don't learn, their decisions may never be applied.
+# Only the detector's confidence counts, a None confidence is ignored.
+def observe_release_rule(full_path, track, language_code, confidence):
+    if release_rules_enabled and not edit_plan:
+        release_rules.observe(full_path, track, language_code, confidence)
+
+
+# Returns the detector's confidence in the detection result, or None when the script
+# pre-classifier decided it, as its percentage is the share of letters in the script
+def get_rule_confidence(match_result):
+    if len(match_result) > 2 and match_result[2] == "script":
+        return None
+    return match_result[1]
+
+
+# Checks the match result and sets the track language if above threshold
+def check_and_set_result(
+    match_result,
+    full_path,
+    track,
+    lang_code,
+    original_subtitle_array,
+    root,
+    tracks,
+    rule_confidence=None,
+):
     file = os.path.basename(full_path)
     match_result_percent = f"{match_result}%"
 
     if match_result >= required_lang_match_percentage:
         send_message(f"\n\t\tFile: {file}\n\t\tMatch: {match_result_percent}")
         print(f"\t\tSubtitle file detected as {lang_code}")
-        set_track_language(full_path, track, lang_code)
+        observe_release_rule(full_path, track, lang_code, rule_confidence)
+        set_track_language(full_path, track, lang_code, "detection", match_result)
     else:
         error_message = (
             f"\n\t\tFile: {file}\n\t\tMatch: {match_result_percent}\n\t\t"
@@ -359,7 +1170,7 @@ def check_and_set_result(
         send_message(error_message, error=True)
         if match_result >= 10:
             remove_signs_and_subs(
-                files,
+                get_directory_files(root),
                 file,
                 original_subtitle_array,
                 tracks,
@@ -371,7 +1182,9 @@ def check_and_set_result(
 
 
 # Checks the match result and sets the track language if above threshold
-def check_and_set_result_two(match_result, full_path, track, lang_code):
+def check_and_set_result_two(
+    match_result, full_path, track, lang_code, rule_confidence=None
+):
     file = os.path.basename(full_path)
     match_result_percent = f"{match_result}%"
 
@@ -381,7 +1194,8 @@ def check_and_set_result_two(match_result, full_path, track, lang_code):
         ).display_name()
         send_message(f"\n\t\tFile: {file}\n\t\tMatch: {match_result_percent}")
         print(f"\t\tSubtitle file detected as {full_language_keyword}")
-        set_track_language(full_path, track, lang_code)
+        observe_release_rule(full_path, track, lang_code, rule_confidence)
+        set_track_language(full_path, track, lang_code, "comparison", match_result)
         return 1
     else:
         send_message(
@@ -438,6 +1252,12 @@ def fast_text_detect(track, extension, root, full_path, tracks):
             if lang_keyword_search:
                 break
 
+    if not lang_keyword_search and track.track_id in layout_decisions:
+        return apply_layout_decision(track, full_path)
+
+    if not lang_keyword_search and apply_release_rule(track, full_path):
+        return True
+
     if not lang_keyword_search:
         print("\n\t\tNo language keyword found in track name.")
         print("\t\tFile will be extracted and detection will be attempted.")
@@ -450,6 +1270,9 @@ def fast_text_detect(track, extension, root, full_path, tracks):
 
             if output_file_with_path:
                 subtitle_lines_array = parse_subtitles(output_file_with_path)
+                cache_track_signature(
+                    full_path, track, clean_subtitles(subtitle_lines_array)
+                )
                 match_result = evaluate_subtitle_lines(subtitle_lines_array)
 
                 if len(match_result) >= 2 and match_result[1] != 0:
@@ -464,9 +1287,17 @@ def fast_text_detect(track, extension, root, full_path, tracks):
                             subtitle_lines_array,
                             root,
                             tracks,
+                            get_rule_confidence(match_result),
                         )
                     else:
                         print("\t\tCorrect language already set.")
+                        if match_result[1] >= required_lang_match_percentage:
+                            observe_release_rule(
+                                full_path,
+                                track,
+                                match_result[0],
+                                get_rule_confidence(match_result),
+                            )
 
         except Exception as e:
             send_message(
@@ -478,17 +1309,23 @@ def fast_text_detect(track, extension, root, full_path, tracks):
         return True
 
 
+# Returns the text of a subtitle line, or None if it has none
+def get_subtitle_text(line):
+    if isinstance(line, str):
+        return line
+    elif hasattr(line, "text"):
+        return line.text
+    return None
+
+
 # Cleans the subtitle lines for better language detection
-def clean_subtitles(lines):
+def clean_subtitles(lines, min_length=5):
     cleaned_lines = []
 
     if lines:
         for line in lines:
-            if isinstance(line, str):
-                text = line
-            elif hasattr(line, "text"):
-                text = line.text
-            else:
+            text = get_subtitle_text(line)
+            if text is None:
                 continue
 
             clean_one = re.sub(r"(^[a-z$&+,:;=?@#|'<>.^*()%!-]*;)", "", text)
@@ -498,36 +1335,317 @@ def clean_subtitles(lines):
             if re.search(r"^(\w\s){3,}", clean_three):  # EX: 'D b b l l b''
                 continue
 
-            if len(clean_three) > 4:
+            if len(clean_three) >= min_length:
                 cleaned_lines.append(clean_three)
 
     return cleaned_lines
 
 
-# Evaluates the subtitle lines using a language detection model
-def evaluate_subtitle_lines(subtitles):
-    cleaned_subtitles = clean_subtitles(subtitles)
-    results = []
+# Unicode script ids used by the script pre-classifier
+SCRIPT_OTHER = 0
+SCRIPT_LATIN = 1
+SCRIPT_CYRILLIC = 2
+SCRIPT_GREEK = 3
+SCRIPT_ARABIC = 4
+SCRIPT_HEBREW = 5
+SCRIPT_HANGUL = 6
+SCRIPT_KANA = 7
+SCRIPT_HAN = 8
+
+# The (start, end, script) codepoint ranges, sorted and non-overlapping
+script_ranges = [
+    (0x0041, 0x005A, SCRIPT_LATIN),
+    (0x0061, 0x007A, SCRIPT_LATIN),
+    (0x00C0, 0x024F, SCRIPT_LATIN),
+    (0x0370, 0x03FF, SCRIPT_GREEK),
+    (0x0400, 0x052F, SCRIPT_CYRILLIC),
+    (0x0590, 0x05FF, SCRIPT_HEBREW),
+    (0x0600, 0x06FF, SCRIPT_ARABIC),
+    (0x0750, 0x077F, SCRIPT_ARABIC),
+    (0x1100, 0x11FF, SCRIPT_HANGUL),
+    (0x1E00, 0x1EFF, SCRIPT_LATIN),
+    (0x1F00, 0x1FFF, SCRIPT_GREEK),
+    # leaves out the katakana middle dot and prolonged sound mark (U+30FB, U+30FC),
+    # Chinese subtitles use them as punctuation too
+    (0x3040, 0x30FA, SCRIPT_KANA),
+    (0x30FD, 0x30FF, SCRIPT_KANA),
+    (0x3130, 0x318F, SCRIPT_HANGUL),
+    (0x31F0, 0x31FF, SCRIPT_KANA),
+    (0x3400, 0x4DBF, SCRIPT_HAN),
+    (0x4E00, 0x9FFF, SCRIPT_HAN),
+    (0xAC00, 0xD7AF, SCRIPT_HANGUL),
+    (0xF900, 0xFAFF, SCRIPT_HAN),
+    (0xFB50, 0xFDFF, SCRIPT_ARABIC),
+    (0xFE70, 0xFEFF, SCRIPT_ARABIC),
+    (0xFF66, 0xFF6F, SCRIPT_KANA),
+    (0xFF71, 0xFF9F, SCRIPT_KANA),
+    (0x20000, 0x2FA1F, SCRIPT_HAN),
+]
 
-    if not cleaned_subtitles:
-        return "", 0
+# Flattened lookup tables for np.searchsorted, gaps between ranges map to SCRIPT_OTHER
+script_range_starts = []
+script_range_ids = []
+for start, end, script in script_ranges:
+    script_range_starts.extend([start, end + 1])
+    script_range_ids.extend([script, SCRIPT_OTHER])
+script_range_starts = np.array(script_range_starts, dtype=np.uint32)
+script_range_ids = np.array(script_range_ids, dtype=np.uint8)
+
+# Scripts that map directly onto a single language (FastText labels)
+single_language_scripts = {
+    SCRIPT_GREEK: "el",
+    SCRIPT_ARABIC: "ar",
+    SCRIPT_HEBREW: "he",
+    SCRIPT_HANGUL: "ko",
+}
+
+# Letters that set each Cyrillic language apart from the others. Belarusian shares
+# letters with both Russian and Ukrainian and Macedonian with Serbian, their own
+# letters are listed so their tracks match more than one language.
+cyrillic_marker_letters = {
+    "uk": "іїєґІЇЄҐ",
+    "sr": "ђјљњћџЂЈЉЊЋЏ",
+    "ru": "ыэёЫЭЁ",
+    "be": "ўЎ",
+    "mk": "ѓќѕЃЌЅ",
+}
+
+# The Cyrillic languages the pre-classifier decides, the rest are left to FastText
+cyrillic_decided_languages = ["uk", "sr", "ru"]
+
+
+# Builds a script histogram over the whole track in a single vectorized pass
+def get_script_histogram(text):
+    codepoints = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    positions = np.searchsorted(script_range_starts, codepoints, side="right") - 1
+    scripts = np.where(positions >= 0, script_range_ids[positions], SCRIPT_OTHER)
+    return np.bincount(scripts, minlength=SCRIPT_HAN + 1)
+
+
+# Narrows a Cyrillic track down to a language using its marker letters.
+# Returns None when the markers are missing or match more than one language
+# (Bulgarian has none of its own), so the track goes to FastText.
+def narrow_cyrillic_language(text):
+    matches = [
+        lang
+        for lang, letters in cyrillic_marker_letters.items()
+        if any(letter in text for letter in letters)
+    ]
+    if len(matches) != 1 or matches[0] not in cyrillic_decided_languages:
+        return None
+    return matches[0]
+
+
+# Determines the language of a track from its Unicode script histogram alone.
+# Returns (language, percentage) when one script dominates, otherwise None
+# so that the track is deferred to FastText.
+def detect_script_language(subtitles):
+    texts = [get_subtitle_text(line) for line in subtitles or []]
+    text = "\n".join(t for t in texts if t)
+    if not text:
+        return None
+
+    histogram = get_script_histogram(text)
+    letter_count = int(histogram[SCRIPT_OTHER + 1 :].sum())
+    if letter_count < script_detection_min_letters:
+        return None
+
+    # Japanese mixes kana with Han, so the two are scored together
+    cjk_count = int(histogram[SCRIPT_KANA] + histogram[SCRIPT_HAN])
+    candidates = {
+        script: int(histogram[script])
+        for script in (SCRIPT_LATIN, SCRIPT_CYRILLIC, *single_language_scripts)
+    }
+    candidates[SCRIPT_HAN] = cjk_count
+
+    dominant_script = max(candidates, key=candidates.get)
+    dominant_percent = (candidates[dominant_script] / letter_count) * 100
+
+    if dominant_percent < script_detection_threshold:
+        return None
+
+    if dominant_script == SCRIPT_LATIN:
+        return None
+    elif dominant_script == SCRIPT_CYRILLIC:
+        language = narrow_cyrillic_language(text)
+    elif dominant_script == SCRIPT_HAN:
+        # a real share of kana means Japanese, Han with at most stray kana means Chinese
+        kana_percent = (int(histogram[SCRIPT_KANA]) / cjk_count) * 100
+        language = "ja" if kana_percent >= script_detection_min_kana_percent else "zh"
+    else:
+        language = single_language_scripts[dominant_script]
+
+    if not language:
+        return None
+    return language, dominant_percent
+
+
+# A bounded LRU memo of cleaned line -> predicted language, shared across
+# tracks and files, optionally backed by SQLite to persist across runs
+class LinePredictionCache:
+    def __init__(self, max_size, database_path=""):
+        self.max_size = max(int(max_size), 0)
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.pending_writes = 0
+        self.connection = None
+        if database_path:
+            try:
+                # only one thread predicts at a time, the pipeline's detection thread
+                self.connection = sqlite3.connect(
+                    database_path, check_same_thread=False
+                )
+                self.connection.execute(
+                    "CREATE TABLE IF NOT EXISTS predictions "
+                    "(model TEXT, line TEXT, label TEXT, PRIMARY KEY (model, line))"
+                )
+            except sqlite3.Error as e:
+                send_message(f"Failed to open line cache: {database_path}\nError: {e}")
+                self.connection = None
+
+    def get(self, line):
+        label = self.entries.get(line)
+        if label is not None:
+            self.entries.move_to_end(line)
+            self.hits += 1
+            return label
+
+        if self.connection:
+            row = self.connection.execute(
+                "SELECT label FROM predictions WHERE model = ? AND line = ?",
+                (detector.name, line),
+            ).fetchone()
+            if row:
+                self.disk_hits += 1
+                self.remember(line, row[0])
+                return row[0]
+
+        self.misses += 1
+        return None
+
+    def put(self, line, label):
+        self.remember(line, label)
+        if self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?)",
+                (detector.name, line, label),
+            )
+            self.pending_writes += 1
+            if self.pending_writes >= 1000:
+                self.commit()
+
+    # Keeps the label in memory, evicting the least recently used lines
+    def remember(self, line, label):
+        if not self.max_size:
+            return
+        self.entries[line] = label
+        self.entries.move_to_end(line)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def commit(self):
+        if self.connection and self.pending_writes:
+            self.connection.commit()
+            self.pending_writes = 0
+
+    def close(self):
+        self.commit()
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+
+    # Prints the hit rate of the cache
+    def print_stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        if not lookups:
+            return
+        hit_percent = round(((self.hits + self.disk_hits) / lookups) * 100, 2)
+        send_message(
+            f"\n\tLine Cache: {self.hits + self.disk_hits} hits of {lookups} lookups "
+            f"({hit_percent}%), {self.disk_hits} from disk, {len(self.entries)} lines cached"
+        )
+
+
+line_cache = LinePredictionCache(line_cache_size, line_cache_path)
 
-    for subtitle in cleaned_subtitles:
+
+# Predicts the language of the cleaned subtitle lines, the lines missing from
+# the cache in one batch. Returns the label of each line, None on failure.
+def predict_subtitle_lines(subtitles):
+    labels = {}
+    missing = []
+    for subtitle in dict.fromkeys(subtitles):
+        result = line_cache.get(subtitle)
+        if result is None:
+            missing.append(subtitle)
+        else:
+            labels[subtitle] = result
+
+    if missing:
         try:
-            result = model.predict(subtitle)
-            result = re.sub(r"__label__", "", result[0][0])
-            print(f'\t\tLanguage Detected: {result} on "{subtitle}"\t')
-            results.append(result)
+            predictions = detector.predict(missing)
         except Exception as e:
             send_message(
-                f"Failed to determine result for subtitle:\n\tSubtitle: {subtitle}\n\tError: {e}",
+                f"Failed to determine results for {len(missing)} subtitle lines\n\tError: {e}",
                 error=True,
             )
+            predictions = []
+        for subtitle, (result, _) in zip(missing, predictions):
+            if not result:
+                continue
+            print(f'\t\tLanguage Detected: {result} on "{subtitle}"\t')
+            line_cache.put(subtitle, result)
+            labels[subtitle] = result
+
+    return labels
+
+
+# Runs the script pre-classifier when it's enabled, returns its
+# (language, percentage, "script") or None when the track is deferred
+def classify_subtitle_script(subtitles):
+    if not script_detection_enabled:
+        return None
+    script_result = detect_script_language(subtitles)
+    if not script_result:
+        script_detection_stats["deferred"] += 1
+        return None
+    script_detection_stats["decided"] += 1
+    print(
+        f"\t\tScript pre-classifier detected {script_result[0]} "
+        f"({round(script_result[1], 2)}% of letters)"
+    )
+    # marked, so its percentage isn't taken for a detector's confidence
+    return (*script_result, "script")
+
 
-    if not results:
+# Evaluates the subtitle lines using a language detection model
+def evaluate_subtitle_lines(subtitles):
+    script_result = classify_subtitle_script(subtitles)
+    if script_result:
+        return script_result
+
+    if detection_mode == "windows":
+        return evaluate_subtitle_windows(subtitles)
+
+    cleaned_subtitles = clean_subtitles(subtitles)
+
+    if not cleaned_subtitles:
+        return "", 0
+
+    # identical lines are predicted once and weighted by their count
+    line_counts = Counter(cleaned_subtitles)
+    labels = predict_subtitle_lines(line_counts)
+    language_counts = Counter()
+    for subtitle, count in line_counts.items():
+        result = labels.get(subtitle)
+        if result:
+            language_counts[result] += count
+
+    if not language_counts:
         return "", 0
 
-    language_counts = {result: results.count(result) for result in results}
     highest_lang_result = max(language_counts, key=language_counts.get)
     highest_lang_result_percent = (
         language_counts[highest_lang_result] / len(cleaned_subtitles)
@@ -536,10 +1654,80 @@ def evaluate_subtitle_lines(subtitles):
     return highest_lang_result, highest_lang_result_percent
 
 
+# Joins the cleaned lines, in order, into windows of about window_size characters,
+# a short remainder is added to the last window
+def get_subtitle_windows(lines, window_size):
+    windows = []
+    current = []
+    length = 0
+    for line in lines:
+        current.append(line)
+        length += len(line) + 1
+        if length >= window_size:
+            windows.append(" ".join(current))
+            current = []
+            length = 0
+
+    if current:
+        if windows and length < window_size / 2:
+            windows[-1] = f"{windows[-1]} {' '.join(current)}"
+        else:
+            windows.append(" ".join(current))
+    return windows
+
+
+# Evaluates the subtitles by classifying windows of joined lines in one batch,
+# each window's language weighted by its probability and length.
+# Short lines are kept, as they only add context to a window.
+def evaluate_subtitle_windows(subtitles):
+    windows = get_subtitle_windows(
+        clean_subtitles(subtitles, min_length=1), detection_window_size
+    )
+    if not windows:
+        return "", 0
+
+    try:
+        predictions = detector.predict(windows)
+    except Exception as e:
+        send_message(
+            f"Failed to determine results for {len(windows)} subtitle windows\n\tError: {e}",
+            error=True,
+        )
+        return "", 0
+
+    language_scores = Counter()
+    total_length = sum(len(window) for window in windows)
+    for window, (result, probability) in zip(windows, predictions):
+        if result:
+            language_scores[result] += probability * len(window)
+
+    if not language_scores:
+        return "", 0
+
+    highest_lang_result = max(language_scores, key=language_scores.get)
+    highest_lang_result_percent = (
+        language_scores[highest_lang_result] / total_length
+    ) * 100
+    print(
+        f"\t\tLanguage Detected: {highest_lang_result} on {len(windows)} windows "
+        f"of ~{detection_window_size} characters "
+        f"({round(highest_lang_result_percent, 2)}% weighted)"
+    )
+    return highest_lang_result, highest_lang_result_percent
+
+
 # Parses the subtitles from the given input file
 # and returns them as a list.
 def parse_subtitles(input_file):
+    if pipeline:
+        prefetched = pipeline.get_parsed(input_file)
+        if prefetched is not None:
+            return prefetched
+
     extension = os.path.splitext(input_file)[1].strip(".")
+    if ass_style_filtering and extension.lower() in ["ass", "ssa"]:
+        return parse_ass_dialogue(input_file)
+
     subtitles = parser.parse(
         input_file,
         subtitle_type=extension,
@@ -548,11 +1736,211 @@ def parse_subtitles(input_file):
     return list(subtitles)
 
 
-# Converts the subtitle file to SRT format using SubtitleEdit
-def convert_subtitle_file(subtitle_file, source_file):
-    if subtitle_file.endswith(".srt"):
-        return subtitle_file
+# Matches the ASS override tags that only appear on signs and karaoke
+ass_sign_tag_pattern = re.compile(
+    r"\\(?:pos|move|org|i?clip|frx|fry|frz|fax|fay)\b|\\(?:k|kf|ko|K)\d|\\p[1-9]"
+)
+
+# Matches ASS override blocks and line breaks
+ass_override_pattern = re.compile(r"\{[^}]*\}")
+ass_line_break_pattern = re.compile(r"\\[Nnh]")
+
+
+# Checks if an ASS style or actor name marks a sign or karaoke event
+def is_sign_style(style_name):
+    if not style_name:
+        return False
+    if contains_sign_keyword(style_name):
+        return True
+    words = re.split(r"[^a-z0-9]+", style_name.lower())
+    return any(keyword in words for keyword in ass_sign_style_keywords)
+
+
+# Returns the Format fields and the lines of an ASS section
+def read_ass_section(lines, section_names):
+    fields = None
+    entries = []
+    in_section = False
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith("[") and stripped.endswith("]"):
+            in_section = stripped.lower() in section_names
+            continue
+        if not in_section or ":" not in stripped:
+            continue
+        key, value = stripped.split(":", 1)
+        if key.lower() == "format":
+            fields = [field.strip().lower() for field in value.split(",")]
+        else:
+            entries.append((key.strip().lower(), value.lstrip()))
+    return fields, entries
+
+
+# Parses the ASS events and returns the text of the dialogue events,
+# leaving out sign, typesetting and karaoke events
+def parse_ass_dialogue(input_file):
+    with open(
+        input_file, encoding=detect_sub_encoding(input_file), errors="replace"
+    ) as f:
+        lines = f.read().splitlines()
 
+    style_fields, style_entries = read_ass_section(
+        lines, ["[v4+ styles]", "[v4 styles]"]
+    )
+    sign_styles = set()
+    if style_fields and "name" in style_fields:
+        name_index = style_fields.index("name")
+        for key, value in style_entries:
+            if key != "style":
+                continue
+            values = value.split(",", len(style_fields) - 1)
+            if len(values) > name_index and is_sign_style(values[name_index]):
+                sign_styles.add(values[name_index].strip().lower())
+
+    event_fields, event_entries = read_ass_section(lines, ["[events]"])
+    if not event_fields or "text" not in event_fields:
+        event_fields = [
+            "layer",
+            "start",
+            "end",
+            "style",
+            "name",
+            "marginl",
+            "marginr",
+            "marginv",
+            "effect",
+            "text",
+        ]
+
+    events = []
+    for key, value in event_entries:
+        if key != "dialogue":
+            continue
+        values = value.split(",", len(event_fields) - 1)
+        if len(values) < len(event_fields):
+            continue
+        events.append(dict(zip(event_fields, values)))
+
+    # Layered signs are drawn as many events sharing the same timing
+    timings = Counter((event.get("start"), event.get("end")) for event in events)
+
+    dialogue = []
+    fallback = []
+    for event in events:
+        raw_text = event.get("text", "")
+        if re.search(r"\\p[1-9]", raw_text):
+            continue
+
+        text = ass_line_break_pattern.sub(" ", raw_text)
+        text = ass_override_pattern.sub("", text).strip()
+        if not text:
+            continue
+        fallback.append(text)
+
+        style = event.get("style", "").strip().lower()
+        if (
+            style in sign_styles
+            or is_sign_style(event.get("name", ""))
+            or ass_sign_tag_pattern.search(raw_text)
+            or timings[(event.get("start"), event.get("end"))]
+            >= ass_layered_event_threshold
+        ):
+            continue
+        dialogue.append(text)
+
+    signs_count = len(fallback) - len(dialogue)
+    if not dialogue:
+        print("\t\tNo dialogue events found, using all ASS events.")
+        ass_filter_stats["fallbacks"] += 1
+        return fallback
+
+    ass_filter_stats["dialogue"] += len(dialogue)
+    ass_filter_stats["signs"] += signs_count
+    print(
+        f"\t\tASS events: {len(dialogue)} dialogue, {signs_count} signs/karaoke skipped."
+    )
+    return dialogue
+
+
+# Checks if the subtitle file has to be converted to SRT before parsing
+def needs_conversion(subtitle_file):
+    extension = os.path.splitext(subtitle_file)[1].strip(".").lower()
+    if extension == "srt":
+        return False
+    return not (ass_style_filtering and extension in ["ass", "ssa"])
+
+
+# The configured Tesseract languages that are installed, read on first use
+native_ocr_languages = None
+
+
+# Returns the configured Tesseract languages that are installed, joined with "+",
+# warning once about the missing ones. Empty if none are installed.
+def get_native_ocr_languages():
+    global native_ocr_languages
+    if native_ocr_languages is None:
+        installed = get_installed_languages()
+        languages = [
+            language for language in tesseract_languages.split("+") if language
+        ]
+        missing = [language for language in languages if language not in installed]
+        if missing:
+            send_message(
+                f"\tTesseract languages not installed, skipping: {', '.join(missing)} "
+                f"(install tesseract-ocr-<lang>)",
+                error=True,
+            )
+        native_ocr_languages = "+".join(
+            language for language in languages if language in installed
+        )
+    return native_ocr_languages
+
+
+# Checks if the image subtitle file can be OCR'd natively with Tesseract
+def can_ocr_natively(subtitle_file):
+    extension = os.path.splitext(subtitle_file)[1].strip(".").lower()
+    return (
+        native_ocr_enabled
+        and extension in ["pgs", "sup", "sub"]
+        and shutil.which("tesseract") is not None
+        and bool(get_native_ocr_languages())
+    )
+
+
+# OCRs a sample of the image subtitle file's bitmaps with Tesseract,
+# returns the SRT file or None to fall back to SubtitleEdit
+def ocr_subtitle_file(subtitle_file):
+    converted_file = f"{os.path.splitext(subtitle_file)[0]}.srt"
+    if governor:
+        governor.acquire("ocr")
+    try:
+        count = ocr_image_subtitles(
+            subtitle_file,
+            converted_file,
+            native_ocr_sample_count,
+            native_ocr_workers,
+            get_native_ocr_languages(),
+            wrap_command=governor.wrap_command if governor else None,
+            min_confidence=native_ocr_min_confidence,
+        )
+    except Exception as e:
+        print(f"\t\tNative OCR failed, falling back to SubtitleEdit: {e}")
+        return None
+    finally:
+        if governor:
+            governor.release("ocr")
+
+    if not count:
+        print(
+            "\t\tNative OCR found no confident text, falling back to SubtitleEdit."
+        )
+        return None
+    print(f"\t\tNative OCR recognized {count} sampled lines.")
+    return converted_file
+
+
+# Returns the SubtitleEdit command that converts the subtitle file to SRT
+def get_conversion_command(subtitle_file):
     processing_options = [
         "srt",
         "/RemoveFormatting",
@@ -569,9 +1957,23 @@ def convert_subtitle_file(subtitle_file, source_file):
         subtitle_file,
     ]
     call.extend(processing_options)
+    return call
+
+
+# Converts the subtitle file to SRT format using SubtitleEdit
+def convert_subtitle_file(subtitle_file, source_file):
+    if not needs_conversion(subtitle_file):
+        return subtitle_file
+
+    if can_ocr_natively(subtitle_file):
+        converted_file = ocr_subtitle_file(subtitle_file)
+        if converted_file:
+            return converted_file
+
+    call = get_conversion_command(subtitle_file)
 
     try:
-        result = execute_command(call)
+        result = execute_command(call, "ocr")
         converted_file = f"{os.path.splitext(subtitle_file)[0]}.srt"
 
         if os.path.isfile(converted_file) and result.returncode == 0:
@@ -592,11 +1994,155 @@ def find_files_by_release_group(release_group, files):
     ]
 
 
+# Returns the number in a statistics tag, or None if it's missing or malformed
+def get_tag_number(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# A track read from the mkvmerge -J header, with the attributes of pymkv's MKVTrack
+class TrackHeader:
+    def __init__(self, track):
+        properties = track.get("properties", {})
+        self.track_id = track["id"]
+        self._track_type = track.get("type")
+        self.track_codec = track.get("codec")
+        self.track_name = properties.get("track_name")
+        self.language = properties.get("language", "und")
+        self.language_ietf = properties.get("language_ietf")
+        self.forced_track = properties.get("forced_track", False)
+        self.default_track = properties.get("default_track", False)
+        # from the statistics tags mkvmerge writes, None when the file has none
+        self.frame_count = get_tag_number(properties.get("tag_number_of_frames"))
+        self.byte_count = get_tag_number(properties.get("tag_number_of_bytes"))
+
+
+# Caches the track headers by path, size and modification time,
+# optionally persisted to a JSON file between runs
+class TrackHeaderCache:
+    def __init__(self, cache_path=""):
+        self.cache_path = cache_path
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+
+        if cache_path and os.path.isfile(cache_path):
+            try:
+                with open(cache_path, "r") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"\tFailed to read the header cache: {cache_path}\n\tError: {e}")
+
+    # Returns the tracks of the file, only reading its headers when it changed.
+    # Remote files are keyed by their size and ETag or last modified time.
+    def get_tracks(self, full_path):
+        source = None
+        try:
+            if is_remote_path(full_path):
+                source = open_source(full_path)
+                key = [source.size, source.validator]
+            else:
+                stat = os.stat(full_path)
+                key = [stat.st_size, stat.st_mtime_ns]
+
+            with self.lock:
+                entry = self.entries.get(full_path)
+            if entry and entry["stat"] == key:
+                self.hits += 1
+                return [TrackHeader(track) for track in entry["tracks"]]
+
+            self.misses += 1
+            if uses_file_source(full_path):
+                source = source or open_source(full_path)
+                file_tracks = MatroskaReader(source).read_tracks()
+            else:
+                file_tracks = self.read_mkvmerge_tracks(full_path)
+        finally:
+            if source:
+                source.close()
+
+        # only keep what the tracks need, so the cache stays small
+        tracks = [
+            {
+                "id": track["id"],
+                "type": track.get("type"),
+                "codec": track.get("codec"),
+                "properties": {
+                    name: value
+                    for name, value in track.get("properties", {}).items()
+                    if name
+                    in [
+                        "track_name",
+                        "language",
+                        "language_ietf",
+                        "forced_track",
+                        "default_track",
+                        "tag_number_of_frames",
+                        "tag_number_of_bytes",
+                    ]
+                },
+            }
+            for track in file_tracks
+        ]
+        with self.lock:
+            self.entries[full_path] = {"stat": key, "tracks": tracks}
+            self.dirty = True
+        return [TrackHeader(track) for track in tracks]
+
+    # Returns the tracks mkvmerge -J reports for the file
+    @staticmethod
+    def read_mkvmerge_tracks(full_path):
+        result = subprocess.run(["mkvmerge", "-J", full_path], capture_output=True)
+        if result.returncode != 0:
+            raise ValueError(f"mkvmerge -J failed with code {result.returncode}")
+        info = json.loads(result.stdout.decode("utf-8", errors="replace"))
+        if not info.get("container", {}).get("recognized", False):
+            raise ValueError("Not a file recognized by mkvmerge")
+        return info.get("tracks", [])
+
+    # Writes the cache file, if one is configured and anything changed
+    def save(self):
+        if not self.cache_path or not self.dirty:
+            return
+        try:
+            temp_path = f"{self.cache_path}.tmp"
+            with self.lock:
+                with open(temp_path, "w") as f:
+                    json.dump(self.entries, f)
+                self.dirty = False
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            print(f"\tFailed to write the header cache: {self.cache_path}\n\tError: {e}")
+
+
+header_cache = TrackHeaderCache(header_cache_path)
+
+
 # Gets the MKV tracks from the specified file
 def get_mkv_tracks(full_path):
-    mkv = pymkv.MKVFile(full_path)
-    tracks = mkv.get_track()
-    return tracks
+    return header_cache.get_tracks(full_path)
+
+
+# Reads the tracks of the files in parallel, returns the tracks by path
+def read_track_headers(full_paths):
+    file_tracks = {}
+    if not full_paths:
+        return file_tracks
+    with ThreadPoolExecutor(max_workers=max(header_read_workers, 1)) as executor:
+        futures = {
+            full_path: executor.submit(header_cache.get_tracks, full_path)
+            for full_path in full_paths
+        }
+        for full_path, future in futures.items():
+            try:
+                file_tracks[full_path] = future.result()
+            except Exception as e:
+                print(f"\tFailed to read tracks of {os.path.basename(full_path)}: {e}")
+    return file_tracks
 
 
 # Removes all non-subtitle tracks from the list
@@ -614,8 +2160,194 @@ def print_similar_releases(comparision_releases):
         print("\t\tNo comparision releases found.")
 
 
+# The line signatures of extracted tracks, by (file path, track id)
+track_signatures = OrderedDict()
+
+# The maximum number of cached track signatures
+track_signatures_limit = 10000
+
+
+# Returns the sorted 64-bit hashes of the unique lines and how often each occurs,
+# used to count how many lines two tracks share before extracting the second one
+def get_line_signature(lines):
+    line_counts = Counter(lines)
+    if not line_counts:
+        return None
+    hashes = np.array(
+        [
+            int.from_bytes(
+                hashlib.blake2b(line.encode("utf-8"), digest_size=8).digest(), "little"
+            )
+            for line in line_counts
+        ],
+        dtype=np.uint64,
+    )
+    counts = np.fromiter(line_counts.values(), dtype=np.int64, count=len(line_counts))
+    order = np.argsort(hashes)
+    return hashes[order], counts[order]
+
+
+# Counts the lines two signatures share, the same multiset intersection
+# that removing the shared lines makes
+def count_shared_lines(signature, other_signature):
+    (hashes, counts), (other_hashes, other_counts) = signature, other_signature
+    _, indices, other_indices = np.intersect1d(
+        hashes, other_hashes, assume_unique=True, return_indices=True
+    )
+    return int(np.minimum(counts[indices], other_counts[other_indices]).sum())
+
+
+# Caches the signature of a track's cleaned lines for later comparisons
+def cache_track_signature(full_path, track, cleaned_lines):
+    signature = get_line_signature(cleaned_lines)
+    if signature is None:
+        return
+    key = (full_path, track.track_id)
+    track_signatures[key] = signature
+    track_signatures.move_to_end(key)
+    while len(track_signatures) > track_signatures_limit:
+        track_signatures.popitem(last=False)
+
+
+# Extracts and cleans the subtitle lines of a comparison track
+def get_comparison_lines(comparison_track, comparison_full_path):
+    extension = set_extension(comparison_track)
+    output_file_with_path = process_subtitle_file(
+        f"lang_comparison.{extension}",
+        comparison_track,
+        comparison_full_path,
+        subtitle_location,
+    )
+    if not output_file_with_path:
+        return None
+
+    lines = clean_subtitles(parse_subtitles(output_file_with_path))
+    cache_track_signature(comparison_full_path, comparison_track, lines)
+    return lines
+
+
+# Compares the lines of an unknown track against other subtitle tracks.
+# The lines are kept as a multiset, and the remaining lines are detected the same
+# way a track is: the script pre-classifier first, then windows or single lines.
+# Single lines are predicted once, removing the lines shared with a comparison
+# track updates the per-language counts directly.
+class SubtitleComparison:
+    def __init__(self, lines):
+        self.ordered_lines = list(lines)
+        self.lines = Counter(self.ordered_lines)
+        self.total = sum(self.lines.values())
+        # predicted on the first line mode result
+        self.labels = None
+        self.language_counts = Counter()
+        self.signature = get_line_signature(self.lines)
+
+    # Checks if the comparison track can't share enough lines, before extracting it.
+    # Every shared line is one of its subtitle events, so its frame count from the
+    # header bounds them, and a track already extracted is counted exactly.
+    def can_skip(self, comparison_full_path, comparison_track):
+        frame_count = comparison_track.frame_count
+        if frame_count is not None and (
+            min(frame_count, self.total) < comparison_min_shared_lines
+        ):
+            return True
+
+        comparison_signature = track_signatures.get(
+            (comparison_full_path, comparison_track.track_id)
+        )
+        if self.signature is None or comparison_signature is None:
+            return False
+        return (
+            count_shared_lines(self.signature, comparison_signature)
+            < comparison_min_shared_lines
+        )
+
+    # Removes the lines shared with the comparison track, returns how many were removed
+    def remove_shared_lines(self, comparison_lines):
+        shared = self.lines & Counter(comparison_lines)
+        for line, count in shared.items():
+            print(f"\t\tDuplicate removed from original: {line}")
+            self.lines[line] -= count
+            if self.labels and self.labels.get(line):
+                self.language_counts[self.labels[line]] -= count
+            self.total -= count
+        self.lines += Counter()  # drop the lines that reached zero
+        if shared:
+            self.signature = get_line_signature(self.lines)
+        return sum(shared.values())
+
+    # Returns the remaining lines in their original order
+    def get_remaining_lines(self):
+        remaining = Counter(self.lines)
+        lines = []
+        for line in self.ordered_lines:
+            if remaining[line] > 0:
+                remaining[line] -= 1
+                lines.append(line)
+        return lines
+
+    # Returns the majority language and its percentage of the remaining lines
+    def result(self):
+        if script_detection_enabled or detection_mode == "windows":
+            remaining_lines = self.get_remaining_lines()
+            script_result = classify_subtitle_script(remaining_lines)
+            if script_result:
+                return script_result
+            if detection_mode == "windows":
+                return evaluate_subtitle_windows(remaining_lines)
+
+        if self.labels is None:
+            self.labels = predict_subtitle_lines(self.lines)
+            for line, count in self.lines.items():
+                if self.labels.get(line):
+                    self.language_counts[self.labels[line]] += count
+        language_counts = +self.language_counts
+        if not self.total or not language_counts:
+            return "", 0
+        highest_lang_result = max(language_counts, key=language_counts.get)
+        return (
+            highest_lang_result,
+            (language_counts[highest_lang_result] / self.total) * 100,
+        )
+
+
+# Compares the original track against one comparison track,
+# returns True if the original track's language was set
+def compare_with_track(
+    comparison, comparison_track, comparison_full_path, full_path, track
+):
+    if comparison.can_skip(comparison_full_path, comparison_track):
+        print("\t\tSkipping, too few shared lines.")
+        return False
+
+    comparison_lines = get_comparison_lines(comparison_track, comparison_full_path)
+    if comparison_lines is None:
+        return False
+
+    duplicates_removed = comparison.remove_shared_lines(comparison_lines)
+    if duplicates_removed > 1:
+        print("\t\t-- Comparison Attempt --")
+        print("\t\tEnough duplicates found between original and comparison.")
+        print("\t\tRetesting original with duplicates removed.")
+        match_result = comparison.result()
+        if match_result[1] != 0:
+            if standardize_tag(match_result[0]) != standardize_tag(track.language):
+                set_result = check_and_set_result_two(
+                    match_result[1],
+                    full_path,
+                    track,
+                    match_result[0],
+                    get_rule_confidence(match_result),
+                )
+                print("\t\t-- Comparison Attempt --")
+                if set_result == 1:
+                    return True
+    else:
+        print("\t\tNot enough duplicates found in track.")
+    return False
+
+
 # Checks the internal subtitle tracks for comparision
-def check_tracks(tracks, comparision_full_path, original_files_results, track):
+def check_tracks(tracks, comparision_full_path, comparison, track):
     send_message("\t\tChecking internal subtitle tracks for a comparision.")
 
     # The number of pgs subs that can be used for comparision, per file.
@@ -633,91 +2365,245 @@ def check_tracks(tracks, comparision_full_path, original_files_results, track):
                     print("\n\t\tSkipping PGS, limit reached.")
                     continue
 
-            extension = set_extension(comparision_track)
-            output_file_with_path = process_subtitle_file(
-                f"lang_comparison.{extension}",
+            if compare_with_track(
+                comparison,
                 comparision_track,
                 comparision_full_path,
-                subtitle_location,
-            )
-            if output_file_with_path is not None:
-                comparision_subtitle_lines_array = parse_subtitles(
-                    output_file_with_path
-                )
-                comparision_subtitle_lines_array = clean_subtitles(
-                    comparision_subtitle_lines_array
-                )
-                duplicates_removed = 0
-                removed = []
-                for result in comparision_subtitle_lines_array[:]:
-                    if result in original_files_results:
-                        original_files_results.remove(result)
-                        print(f"\t\tDuplicate removed from original: {result}")
-                        removed.append(result)
-                        duplicates_removed += 1
-                if duplicates_removed > 1:
-                    print("\t\t-- Comparision Attempt --")
-                    print(
-                        "\t\tEnough duplicates found between original and comparision."
-                    )
-                    print("\t\tRetesting original with duplicates removed.")
-                    match_result = evaluate_subtitle_lines(original_files_results)
-                    if len(match_result) >= 2 and match_result[1] != 0:
-                        if standardize_tag(match_result[0]) != standardize_tag(
-                            track.language
-                        ):
-                            set_result = check_and_set_result_two(
-                                match_result[1],
-                                comparision_full_path,
-                                track,
-                                match_result[0],
-                            )
-                            print("\t\t-- Comparision Attempt --")
-                            if set_result == 1:
-                                return True
-                else:
-                    print("\t\tNot enough duplicates found in track.")
+                comparision_full_path,
+                track,
+            ):
+                return True
     send_message("\t\tLanguage could not be determined through internal tracks.")
     send_message("\t\tChecking externally...")
     return False
 
 
-# Removes unwanted characters and subtitles from the original files
-def remove_signs_and_subs(
-    files, original_file, original_files_results, tracks, root, track, file, full_path
-):
-    original_files_results = clean_subtitles(original_files_results)
-    tracks.remove(track)
-
-    if not check_tracks(
-        tracks, os.path.join(root, file), original_files_results, track
-    ):
-        original_file_releaser = re.search(r"-(?:.(?!-))+$", original_file)
-        original_file_releaser = re.sub(
-            r"([-\.])(mkv)", "", original_file_releaser.group()
-        )
-        original_file_releaser = re.sub(r"-", "", original_file_releaser).lower()
-
-        if original_file_releaser:
-            comparision_releases = find_files_by_release_group(
-                original_file_releaser, files
+# Parses the release group from the end of the file name
+# EX: Show.S01E01.1080p.WEB-GROUP.mkv -> group
+def get_release_group(file_name):
+    release_group = re.search(r"-(?:.(?!-))+$", file_name)
+    if not release_group:
+        return ""
+    release_group = re.sub(r"([-\.])(mkv)", "", release_group.group())
+    return re.sub(r"-", "", release_group).lower()
+
+
+# The languages release groups give their tracks, learned from past detections.
+# Each release group, track name and codec counts its consistent detections,
+# once there are enough its rule sets later tracks like it without extraction.
+# A conflicting detection, including one from a spot check, revokes the rule.
+class ReleaseRuleStore:
+    def __init__(self, rules_path=""):
+        self.rules_path = rules_path
+        self.rules = {}
+        self.lock = threading.Lock()
+        self.dirty = False
+
+        if rules_path and os.path.isfile(rules_path):
+            try:
+                with open(rules_path, "r") as f:
+                    for rule in json.load(f):
+                        self.rules[self.get_key(rule)] = rule
+            except (OSError, ValueError, KeyError) as e:
+                print(f"\tFailed to read the release rules: {rules_path}\n\tError: {e}")
+
+    @staticmethod
+    def get_key(rule):
+        return rule["release_group"], rule["track_name"], rule["codec"]
+
+    # Returns the release group, track name and codec of the track, or None without a release group
+    @staticmethod
+    def get_track_key(full_path, track):
+        release_group = get_release_group(os.path.basename(full_path))
+        if not release_group:
+            return None
+        return release_group, str(track.track_name), str(track.track_codec)
+
+    @staticmethod
+    def is_active(rule):
+        return rule["detections"] >= release_rule_min_detections
+
+    @staticmethod
+    def get_confidence(rule):
+        if not rule["detections"]:
+            return 0
+        return rule["confidence_total"] / rule["detections"]
+
+    # Returns the active rule for the track, or None
+    def get_rule(self, full_path, track):
+        key = self.get_track_key(full_path, track)
+        with self.lock:
+            rule = self.rules.get(key)
+        if rule and self.is_active(rule):
+            return rule
+        return None
+
+    # Counts a use of the rule, returns True when this use should be spot checked
+    def needs_spot_check(self, rule):
+        with self.lock:
+            rule["uses"] += 1
+            self.dirty = True
+            return (
+                release_rule_spot_check_interval > 0
+                and rule["uses"] % release_rule_spot_check_interval == 0
             )
 
-            if comparision_releases:
-                send_discord_message(
-                    f"\n\t\t- Checking Similar Releases to [{original_file_releaser}] -"
-                )
-                comparision_releases.remove(original_file)
+    def record_applied(self, rule):
+        with self.lock:
+            rule["applied"] += 1
+            self.dirty = True
 
-                # limit comparision releases to 3
-                if len(comparision_releases) > 3:
-                    print("\t\tLimiting comparision releases to 3.")
-                    comparision_releases = comparision_releases[:3]
+    # Learns from a detected track language, a conflicting detection starts the count over
+    def observe(self, full_path, track, language_code, confidence):
+        key = self.get_track_key(full_path, track)
+        if not key or confidence is None:
+            return
 
-                print("\n")
-                print_similar_releases(comparision_releases)
+        with self.lock:
+            rule = self.rules.get(key)
+            if rule and standardize_tag(rule["language"]) != standardize_tag(
+                language_code
+            ):
+                print(
+                    f"\t\tRelease rule conflict for {key}: {rule['language']} "
+                    f"detected as {language_code}, starting over."
+                )
+                rule.update(
+                    {
+                        "language": language_code,
+                        "detections": 0,
+                        "confidence_total": 0,
+                        "conflicts": rule["conflicts"] + 1,
+                    }
+                )
+            if confidence < release_rule_min_confidence:
+                self.dirty = self.dirty or bool(rule)
+                return
+            if not rule:
+                rule = {
+                    "release_group": key[0],
+                    "track_name": key[1],
+                    "codec": key[2],
+                    "language": language_code,
+                    "detections": 0,
+                    "confidence_total": 0,
+                    "uses": 0,
+                    "applied": 0,
+                    "spot_checks": 0,
+                    "conflicts": 0,
+                }
+                self.rules[key] = rule
+            if self.is_active(rule):
+                # a detection of an active rule's track is a spot check
+                rule["spot_checks"] += 1
+            rule["detections"] += 1
+            rule["confidence_total"] += confidence
+            rule["updated"] = str(datetime.now())
+            self.dirty = True
+
+    # Returns the rules sorted by release group and track name
+    def get_rules(self):
+        with self.lock:
+            return [self.rules[key] for key in sorted(self.rules)]
+
+    # Writes the rules to the rules file, if one is configured and anything changed
+    def save(self):
+        if not self.rules_path or not self.dirty:
+            return
+        self.export(self.rules_path)
 
-                # The number of pgs subs that can be used for comparision, per file.
+    # Writes the rules as a JSON list, which can be used as the release_rules_path of another host
+    def export(self, output_path):
+        try:
+            temp_path = f"{output_path}.tmp"
+            with self.lock:
+                with open(temp_path, "w") as f:
+                    json.dump([self.rules[key] for key in sorted(self.rules)], f, indent=1)
+                self.dirty = False
+            os.replace(temp_path, output_path)
+        except OSError as e:
+            print(f"\tFailed to write the release rules: {output_path}\n\tError: {e}")
+
+    # Prints every rule with its state, confidence and usage
+    def print_rules(self):
+        rules = self.get_rules()
+        send_message(f"\n\t--- Release Rules [{len(rules)}] ---")
+        for rule in rules:
+            state = "active" if self.is_active(rule) else "learning"
+            send_message(
+                f"\t{rule['release_group']} | {rule['track_name']} | {rule['codec']} -> "
+                f"{rule['language']} ({state})\n\t\tDetections: {rule['detections']}, "
+                f"Confidence: {round(self.get_confidence(rule), 2)}%, "
+                f"Applied: {rule['applied']}, Spot Checks: {rule['spot_checks']}, "
+                f"Conflicts: {rule['conflicts']}"
+            )
+
+
+release_rules = ReleaseRuleStore(release_rules_path)
+
+
+# Sets the track language from its release group rule, spot checking the rule
+# every so often. Returns True if the track was settled by the rule.
+def apply_release_rule(track, full_path):
+    if not release_rules_enabled:
+        return False
+    rule = release_rules.get_rule(full_path, track)
+    if not rule:
+        return False
+    if release_rules.needs_spot_check(rule):
+        print("\n\t\tSpot checking the release group rule with full detection.")
+        return False
+
+    release_rules.record_applied(rule)
+    print("\n\t\tNo language keyword found in track name.")
+    if standardize_tag(track.language) == standardize_tag(rule["language"]):
+        print("\t\tCorrect language already set.")
+        return True
+    send_message(
+        f"\t\tFile: {full_path}\n\t\t\tTrack determined to be {rule['language']} "
+        f"through the {rule['release_group']} release group rule."
+    )
+    set_track_language(
+        full_path,
+        track,
+        rule["language"],
+        "rule",
+        release_rules.get_confidence(rule),
+    )
+    return True
+
+
+# Removes unwanted characters and subtitles from the original files
+def remove_signs_and_subs(
+    files, original_file, original_files_results, tracks, root, track, file, full_path
+):
+    comparison = SubtitleComparison(clean_subtitles(original_files_results))
+    other_tracks = [t for t in tracks if t is not track]
+
+    if not check_tracks(other_tracks, os.path.join(root, file), comparison, track):
+        original_file_releaser = get_release_group(original_file)
+
+        if original_file_releaser:
+            comparision_releases = find_files_by_release_group(
+                original_file_releaser, files
+            )
+
+            if comparision_releases:
+                send_discord_message(
+                    f"\n\t\t- Checking Similar Releases to [{original_file_releaser}] -"
+                )
+                if original_file in comparision_releases:
+                    comparision_releases.remove(original_file)
+
+                # limit comparision releases to 3
+                if len(comparision_releases) > 3:
+                    print("\t\tLimiting comparision releases to 3.")
+                    comparision_releases = comparision_releases[:3]
+
+                print("\n")
+                print_similar_releases(comparision_releases)
+
+                # The number of pgs subs that can be used for comparision, per file.
                 # Since OCR'ing can take a long time, and end up in an endless loop
                 # of OCR'ing all the PGS subs in a 24 episode season.
                 pgs_limit = 4
@@ -727,82 +2613,30 @@ def remove_signs_and_subs(
                     for f in reversed(comparision_releases):
                         print(f"\n\t\tFile: {f}")
                         comparision_full_path = os.path.join(root, f)
-                        tracks = get_mkv_tracks(comparision_full_path)
-                        tracks = remove_all_tracks_but_subtitles(tracks)
-
-                        print(f"\n\t\t--- Tracks [{len(tracks)}] ---")
-
-                        for comparision_track in tracks:
-                            if comparision_track._track_type == "subtitles":
-                                print_track_info(comparision_track)
-
-                                if comparision_track.track_codec == "HDMV PGS":
-                                    pgs_count += 1
-                                    if pgs_count > pgs_limit:
-                                        print("\n\t\tSkipping PGS, limit reached.")
-                                        continue
-
-                                extension = set_extension(comparision_track)
-                                output_file_with_path = process_subtitle_file(
-                                    f"lang_comparison.{extension}",
-                                    comparision_track,
-                                    comparision_full_path,
-                                    subtitle_location,
-                                )
-
-                                if output_file_with_path:
-                                    comparision_subtitle_lines_array = parse_subtitles(
-                                        output_file_with_path
-                                    )
-                                    comparision_subtitle_lines_array = clean_subtitles(
-                                        comparision_subtitle_lines_array
-                                    )
-                                    duplicates_removed = 0
-                                    removed = []
-
-                                    for result in comparision_subtitle_lines_array[:]:
-                                        if result in original_files_results:
-                                            original_files_results.remove(result)
-                                            print(
-                                                f"\t\tDuplicate removed from original: {result}"
-                                            )
-                                            removed.append(result)
-                                            duplicates_removed += 1
-
-                                    if duplicates_removed > 1:
-                                        print("\t\t-- Comparison Attempt --")
-                                        print(
-                                            "\t\tEnough duplicates found between original and comparison."
-                                        )
-                                        print(
-                                            "\t\tRetesting original with duplicates removed."
-                                        )
-
-                                        match_result = evaluate_subtitle_lines(
-                                            original_files_results
-                                        )
-
-                                        if (
-                                            len(match_result) >= 2
-                                            and match_result[1] != 0
-                                        ):
-                                            if standardize_tag(
-                                                track.language
-                                            ) != standardize_tag(match_result[0]):
-                                                set_result = check_and_set_result_two(
-                                                    match_result[1],
-                                                    full_path,
-                                                    track,
-                                                    match_result[0],
-                                                )
-                                                print("\t\t-- Comparison Attempt --")
-
-                                                if set_result == 1:
-                                                    return
-                                    else:
-                                        print(
-                                            "\t\tNot enough duplicates found in track."
-                                        )
+                        comparision_tracks = get_mkv_tracks(comparision_full_path)
+                        comparision_tracks = remove_all_tracks_but_subtitles(
+                            comparision_tracks
+                        )
+
+                        print(f"\n\t\t--- Tracks [{len(comparision_tracks)}] ---")
+
+                        for comparision_track in comparision_tracks:
+                            print_track_info(comparision_track)
+
+                            if comparision_track.track_codec == "HDMV PGS":
+                                pgs_count += 1
+                                if pgs_count > pgs_limit:
+                                    print("\n\t\tSkipping PGS, limit reached.")
+                                    continue
+
+                            if compare_with_track(
+                                comparison,
+                                comparision_track,
+                                comparision_full_path,
+                                full_path,
+                                track,
+                            ):
+                                return
 
                 except Exception as e:
                     send_message(str(e), error=True)
@@ -813,6 +2647,20 @@ def remove_signs_and_subs(
         send_message("\t\tSuccessfully set through internal subs")
 
 
+# Returns the mkv files in the directory, used for similar release comparisons
+def get_directory_files(root):
+    # remote folders can't be listed
+    if is_remote_path(root):
+        return []
+    try:
+        files = os.listdir(root)
+    except OSError as e:
+        send_message(f"\t\tFailed to list directory: {root}\n\t\tError: {e}")
+        return []
+    clean_and_sort(files, root, [])
+    return files
+
+
 # Cleans and sorts the files and directories
 def clean_and_sort(files, root, dirs):
     remove_hidden_files(files, root)
@@ -830,6 +2678,151 @@ def clean_and_sort(files, root, dirs):
             files.remove(file)
 
 
+# Walks the path, cleaning and sorting each directory and keeping only this host's shard
+def walk_path(scan_path):
+    for root, dirs, files in os.walk(scan_path):
+        clean_and_sort(files, root, dirs)
+        if shard_count and root == scan_path:
+            filter_shard(files, dirs)
+        yield root, dirs, files
+
+
+# Returns when the file arrived in the library, or None if it's gone: its birth time
+# where the platform reports one (a copy or download creates a new file, while a
+# chmod, move or mkvpropedit edit doesn't), otherwise its modification time.
+# The change time isn't used, as chmod, chown and moves bump it too.
+def get_file_change_time(full_path):
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        return None
+    return getattr(stat, "st_birthtime", None) or stat.st_mtime
+
+
+# Returns the rank of the directory in priority_directories, lower is scanned first.
+# Folder names match anywhere along the directory's path, other entries are
+# resolved relative to the scanned path and match the directories inside them,
+# and with include_parents, the directories leading to them.
+def get_directory_priority(root, include_parents=False):
+    root = os.path.abspath(root)
+    folder_names = root.split(os.sep)
+    for rank, directory in enumerate(priority_directories):
+        if os.sep not in directory.rstrip(os.sep):
+            if directory.rstrip(os.sep) in folder_names:
+                return rank
+            continue
+        directory = os.path.abspath(os.path.join(path, directory))
+        if root == directory or root.startswith(directory + os.sep):
+            return rank
+        if include_parents and directory.startswith(root + os.sep):
+            return rank
+    return len(priority_directories)
+
+
+# Returns the heap entry of the directory, keyed by its priority, then its newest file
+# when scanning newest first, or None when none of its files are left to scan
+def get_scan_entry(sequence, root, dirs, files, cutoff):
+    change_times = {}
+    for file in files:
+        change_time = get_file_change_time(os.path.join(root, file))
+        if change_time is None or (cutoff and change_time < cutoff):
+            continue
+        change_times[file] = change_time
+    if not change_times:
+        return None
+
+    if scan_order == "newest":
+        files = sorted(change_times, key=lambda f: (-change_times[f], f))
+        order_key = -max(change_times.values())
+    else:
+        files = [file for file in files if file in change_times]
+        order_key = sequence
+    return get_directory_priority(root), order_key, sequence, root, dirs, files
+
+
+# Yields the root, dirs and files of each directory of the path in the scan order.
+# Unless the plain walk order is kept, a walker thread stats the files of each directory
+# as the walk finds it and pushes it onto a heap, while the directories found so far are
+# processed in order. Recent imports don't wait for the walk of the whole library,
+# the order only holds among the directories already found.
+def iter_scan_directories():
+    if scan_order == "walk" and not priority_directories and not fresh_days:
+        yield from walk_path(path)
+        return
+
+    cutoff = time.time() - fresh_days * 86400 if fresh_days else None
+    heap = []
+    condition = threading.Condition()
+    walk_state = {"done": False, "stopped": False, "error": None}
+
+    def walk():
+        try:
+            for sequence, (root, dirs, files) in enumerate(walk_path(path)):
+                if walk_state["stopped"]:
+                    return
+                # the priority directories are walked first, so they're found first
+                dirs.sort(
+                    key=lambda d: get_directory_priority(os.path.join(root, d), True)
+                )
+                entry = get_scan_entry(sequence, root, dirs, files, cutoff)
+                if entry:
+                    with condition:
+                        heapq.heappush(heap, entry)
+                        condition.notify()
+        except Exception as e:
+            walk_state["error"] = e
+        finally:
+            with condition:
+                walk_state["done"] = True
+                condition.notify()
+
+    threading.Thread(target=walk, daemon=True).start()
+    scanned = 0
+    try:
+        while True:
+            with condition:
+                while not heap and not walk_state["done"]:
+                    condition.wait()
+                if not heap:
+                    break
+                _, _, _, root, dirs, files = heapq.heappop(heap)
+            scanned += 1
+            yield root, dirs, files
+    finally:
+        walk_state["stopped"] = True
+
+    if walk_state["error"]:
+        raise walk_state["error"]
+    print(f"\n\tScanned {scanned} directories.")
+
+
+# Checks if the track name contains the language name or code, without side effects
+def track_name_matches_language(track_name, lang_code):
+    if not track_name:
+        return False
+
+    full_language_keyword = Language.make(
+        language=standardize_tag(lang_code)
+    ).display_name()
+
+    track_name = str(track_name)
+
+    return bool(
+        re.search(full_language_keyword, track_name, re.IGNORECASE)
+        or re.search(rf"\b{lang_code}\b", track_name, re.IGNORECASE)
+    )
+
+
+# Returns the first language code found in the track name, or None
+def find_language_keyword(track_name):
+    for code in lang_codes:
+        if track_name_matches_language(
+            track_name, code
+        ) or track_name_matches_language(track_name, code[:-1]):
+            return code
+    return None
+
+
 # Checks if the track name contains a language keyword
 def contains_language_keyword(track, lang_code, full_path):
     if not track.track_name:
@@ -839,18 +2832,12 @@ def contains_language_keyword(track, lang_code, full_path):
         language=standardize_tag(lang_code)
     ).display_name()
 
-    track_name = str(track.track_name)
-
-    if re.search(
-        full_language_keyword,
-        track_name,
-        re.IGNORECASE,
-    ) or re.search(rf"\b{lang_code}\b", track_name, re.IGNORECASE):
+    if track_name_matches_language(track.track_name, lang_code):
         if standardize_tag(track.language) != standardize_tag(lang_code):
             send_message(
                 f"\t\tFile: {full_path}\n\t\t\t{full_language_keyword} keyword found in track name."
             )
-            set_track_language(full_path, track, lang_code)
+            set_track_language(full_path, track, lang_code, "keyword", 100)
         else:
             print(
                 f"\t\tFile: {full_path}\n\t\t\t{full_language_keyword} keyword found in track name."
@@ -870,6 +2857,14 @@ if discord_webhook_url != "":
         send_message(f"Path: {path}")
     elif file:
         send_message(f"File: {file}")
+    elif worklist_path:
+        send_message(f"Worklist: {worklist_path}")
+    elif apply_plan_path:
+        send_message(f"Applying Plan: {apply_plan_path}")
+    elif list_rules or export_rules_path:
+        send_message(f"Release Rules: {release_rules_path}")
+    elif merge_journal_paths:
+        send_message(f"Merging Journals: {merge_journal_paths}")
     else:
         exit()
 
@@ -882,29 +2877,222 @@ def contains_sign_keyword(track_name):
     return False
 
 
-# The main start function that processes files
-def start(files, root, dirs):
-    clean_subtitle_location()  # clean out the subs_test folder
+# Returns the track layout signature used to cluster files of one release
+def get_track_layout_signature(file, tracks):
+    layout = tuple(
+        (
+            track._track_type,
+            track.track_codec,
+            str(track.track_name),
+            track.language,
+            bool(track.forced_track),
+        )
+        for track in tracks
+    )
+    return get_release_group(file), layout
+
+
+# Clusters the files by release group and track layout,
+# returns the clusters in the order of their first file
+def cluster_files_by_layout(files, root, file_tracks):
+    clusters = {}
     for file in files:
-        full_path = os.path.join(root, file)
-        file_without_extension = os.path.splitext(full_path)[0]
+        tracks = file_tracks.get(file)
+        if tracks is None:
+            # files we couldn't read go through on their own
+            clusters[(file,)] = [file]
+            continue
+        signature = get_track_layout_signature(file, tracks)
+        clusters.setdefault(signature, []).append(file)
+    return list(clusters.values())
+
+
+# Reads the tracks of every mkv file in the directory ahead of processing
+def read_directory_tracks(files, root):
+    full_paths = [
+        os.path.join(root, file)
+        for file in files
+        if file.endswith(".mkv") and os.path.isfile(os.path.join(root, file))
+    ]
+    return {
+        os.path.basename(full_path): tracks
+        for full_path, tracks in read_track_headers(full_paths).items()
+    }
+
+
+# Applies the language decided for this track by the season layout sample
+def apply_layout_decision(track, full_path):
+    language_code = layout_decisions[track.track_id]
+    print("\n\t\tNo language keyword found in track name.")
+    if standardize_tag(track.language) == standardize_tag(language_code):
+        print("\t\tCorrect language already set.")
+        return True
+    send_message(
+        f"\t\tFile: {full_path}\n\t\t\tTrack determined to be {language_code} "
+        f"through the season layout sample."
+    )
+    set_track_language(
+        full_path,
+        track,
+        language_code,
+        "layout",
+        layout_confidences.get(track.track_id),
+    )
+    return True
+
+
+# Raised to stop the run cleanly at a checkpoint between files
+class StopRun(Exception):
+    pass
+
+
+# Asks the run to stop at the next file (container restarts send SIGTERM)
+def request_stop(signum, frame):
+    global stop_requested
+    stop_requested = True
+    print(f"\n\tReceived signal {signum}, stopping after the current file.")
+
+
+# Processes a single file, using the already read tracks if given
+def process_file(file, root, tracks=None, wait_for_writes=False):
+    full_path = os.path.join(root, file)
+    current_file_decisions.clear()
+    current_file_edits.clear()
+
+    if stop_requested:
+        raise StopRun("Stop requested")
+
+    if max_runtime is not None and datetime.now() - startTime >= max_runtime:
+        raise StopRun(f"Max runtime of {max_runtime} reached")
+
+    if journal and journal.is_completed(full_path):
+        print(f"\n\tAlready completed in the journal, skipping: {full_path}")
+        return journal.get_decisions(full_path)
+
+    if pipeline:
+        pipeline.file_started(full_path)
 
-        if os.path.isfile(full_path):
-            print(f"\n\tPath: {root}")
-            print(f"\tFile: {file}")
+    failed = False
+    if is_remote_path(full_path) or os.path.isfile(full_path):
+        print(f"\n\tPath: {root}")
+        print(f"\tFile: {file}")
+        with profiler.profile_file(full_path) if profiler else contextlib.nullcontext():
             try:
                 if file.endswith(".mkv"):
-                    tracks = get_mkv_tracks(full_path)
+                    if tracks is None:
+                        tracks = get_mkv_tracks(full_path)
                     track_counts = count_tracks(tracks)
                     print(f"\n\t\t--- Tracks [{len(tracks)}] ---")
                     handle_tracks(tracks, track_counts, root, full_path)
             except Exception as e:
+                failed = True
                 send_message(f"\tError with file: {file} ERROR: {e}", error=True)
-        else:
-            send_message(
-                f"\n\tNot a valid file (do you have mkvtoolnix installed?): {full_path}\n",
-                error=True,
+    else:
+        failed = True
+        send_message(
+            f"\n\tNot a valid file (do you have mkvtoolnix installed?): {full_path}\n",
+            error=True,
+        )
+
+    if full_path in failed_write_paths:
+        failed_write_paths.discard(full_path)
+        failed = True
+    # otherwise the background writes are settled when the journal checkpoints
+    write_result = None
+    if wait_for_writes:
+        pipeline.wait_for_writes()
+        write_result = pipeline.take_write_result(full_path)
+    if write_result:
+        current_file_decisions.update(write_result["decisions"])
+        items_changed.extend(write_result["changes"])
+        errors.extend(write_result["errors"])
+        failed = failed or write_result["failed"]
+
+    if edit_plan and current_file_edits:
+        edit_plan.record_file(full_path, current_file_edits)
+    if journal:
+        journal.record_file(full_path, current_file_decisions, failed)
+    return dict(current_file_decisions)
+
+
+# Runs full detection on a sample of the cluster, and if every sampled file
+# agrees, applies the sample's decisions to the remaining members
+def process_layout_cluster(cluster, root, file_tracks):
+    sample_size = max(layout_sample_size, 1)
+    samples = cluster[:sample_size]
+    members = cluster[sample_size:]
+
+    sample_decisions = []
+    for file in samples:
+        # the sample's decisions are applied to the members, so only written ones count
+        sample_decisions.append(
+            process_file(file, root, file_tracks.get(file), bool(pipeline and members))
+        )
+        for track_id, edit in current_file_edits.items():
+            if edit["confidence"] is None:
+                continue
+            layout_confidences[track_id] = min(
+                layout_confidences.get(track_id, edit["confidence"]),
+                edit["confidence"],
             )
+
+    if not members:
+        layout_confidences.clear()
+        return
+
+    inferred = sample_decisions[0]
+    agreed = inferred and all(
+        decisions == inferred for decisions in sample_decisions[1:]
+    )
+    if agreed:
+        print(
+            f"\n\tLayout sample of {len(samples)} files agreed, "
+            f"applying to {len(members)} similar files."
+        )
+        layout_decisions.update(inferred)
+    elif pipeline:
+        # members only need extracting when the sample didn't settle them
+        pipeline.set_upcoming(
+            [(os.path.join(root, file), file_tracks.get(file)) for file in members]
+        )
+    try:
+        for file in members:
+            process_file(file, root, file_tracks.get(file))
+    finally:
+        layout_decisions.clear()
+        layout_confidences.clear()
+
+
+# The main start function that processes files
+def start(files, root, dirs):
+    clean_subtitle_location()  # clean out the subs_test folder
+    use_layout_inference = season_layout_inference and len(files) > layout_sample_size
+
+    file_tracks = {}
+    if use_layout_inference or pipeline:
+        file_tracks = read_directory_tracks(files, root)
+
+    if use_layout_inference:
+        clusters = cluster_files_by_layout(files, root, file_tracks)
+    else:
+        clusters = [[file] for file in files]
+
+    if pipeline:
+        # cluster members are prefetched once their layout sample is known
+        pipeline.set_upcoming(
+            [
+                (os.path.join(root, file), file_tracks.get(file))
+                for cluster in clusters
+                for file in cluster[: max(layout_sample_size, 1)]
+            ]
+        )
+
+    try:
+        for cluster in clusters:
+            process_layout_cluster(cluster, root, file_tracks)
+    finally:
+        if pipeline:
+            pipeline.clear_prefetched()
     clean_subtitle_location()  # clean out the subs_test folder
 
 
@@ -945,17 +3133,283 @@ def clean_subtitle_location():
         files = os.listdir(subtitle_location)
         if files:
             for file in files:
-                remove_file(os.path.join(subtitle_location, file), silent=True)
+                file_path = os.path.join(subtitle_location, file)
+                # the prefetch folder is managed by the pipeline
+                if os.path.isfile(file_path):
+                    remove_file(file_path, silent=True)
+
+
+# Checks if the track will need its subtitles extracted for detection
+def track_needs_extraction(track):
+    return (
+        track._track_type == "subtitles"
+        and track._track_type in track_types_to_check
+        and track.language in subtitle_languages_to_check
+        and str(track.track_name) != "None"
+        and bool(set_extension(track))
+        and not find_language_keyword(track.track_name)
+    )
 
 
-def handle_tracks(tracks, track_counts, root, full_path):
+# Overlaps the disk-bound extraction, the SubtitleEdit conversion and the
+# mkvpropedit writes of upcoming files with detection of the current file.
+# Detection itself runs in a worker thread that drives the normal start() flow.
+class AsyncPipeline:
+    def __init__(self, limits, prefetch_depth):
+        self.limits = limits
+        self.prefetch_depth = prefetch_depth
+        self.loop = None
+        self.semaphores = {}
+        self.writes = None
+        # path -> the decisions, changes and errors of its finished background writes
+        self.write_results = {}
+        self.upcoming = []
+        self.prefetches = {}
+        # numbers the prefetch folders, only ever increased by the detection thread
+        self.prefetch_count = 0
+        self.parsed = {}
+        self.prefetch_folder = os.path.join(subtitle_location, "prefetch")
+
+    # Runs the given blocking function in a worker thread while the
+    # event loop handles prefetching and background writes
+    async def run(self, function, *args):
+        self.loop = asyncio.get_running_loop()
+        self.semaphores = {
+            name: asyncio.Semaphore(max(int(limit), 1))
+            for name, limit in self.limits.items()
+        }
+        self.writes = asyncio.Queue()
+        writer = asyncio.create_task(self.write_worker())
+        try:
+            return await asyncio.to_thread(function, *args)
+        finally:
+            await self.writes.join()
+            writer.cancel()
+
+    # Executes queued mkvpropedit writes in the background. The decision is only
+    # recorded once its write succeeds, a skipped or failed write fails the file.
+    async def write_worker(self):
+        while True:
+            command, full_path, track_id, language_code = await self.writes.get()
+            result = self.write_results.setdefault(
+                full_path, {"decisions": {}, "changes": [], "errors": [], "failed": False}
+            )
+            lock_path = None
+            try:
+                if lock_files_enabled:
+                    lock_path = await asyncio.to_thread(acquire_file_lock, full_path)
+                    if not lock_path:
+                        self.record_failure(
+                            result,
+                            f"\t\tFile is locked by another host, skipping edit: {full_path}",
+                        )
+                        continue
+                async with self.semaphores["disk"]:
+                    process = await execute_command_async(command, "write")
+                if process is None or process.returncode != 0:
+                    self.record_failure(
+                        result,
+                        f"\t\tFailed to set track {track_id + 1} of {full_path} to: {language_code}",
+                    )
+                    continue
+                message = f"\t\tFile: {full_path}\n\t\tTrack: {track_id + 1} set to: {language_code}"
+                # the summary lists are the detection thread's, so it's kept with the result
+                send_message(message)
+                result["decisions"][track_id] = language_code
+                result["changes"].append(message)
+            except Exception as e:
+                self.record_failure(result, f"{e} File: {full_path}")
+            finally:
+                if lock_path:
+                    release_file_lock(lock_path)
+                self.writes.task_done()
+
+    @staticmethod
+    def record_failure(result, message):
+        send_message(message)
+        result["errors"].append(message)
+        result["failed"] = True
+
+    # Queues a write of the track language from the detection thread
+    def submit_write(self, command, full_path, track_id, language_code):
+        self.loop.call_soon_threadsafe(
+            self.writes.put_nowait, (command, full_path, track_id, language_code)
+        )
+
+    # Returns the results of the file's finished background writes, None if it had none
+    def take_write_result(self, full_path):
+        return self.write_results.pop(full_path, None)
+
+    # Sets the processing order of the files in the current directory
+    def set_upcoming(self, upcoming):
+        self.upcoming = upcoming
+
+    # Starts prefetching the files after the one that is now being detected
+    def file_started(self, full_path):
+        paths = [path for path, _ in self.upcoming]
+        if full_path not in paths:
+            return
+        index = paths.index(full_path)
+        for path, tracks in self.upcoming[index + 1 : index + 1 + self.prefetch_depth]:
+            if path not in self.prefetches and tracks:
+                self.prefetch_count += 1
+                self.prefetches[path] = asyncio.run_coroutine_threadsafe(
+                    self.prefetch(path, tracks, self.prefetch_count), self.loop
+                )
+
+    # Extracts, converts and parses the tracks of an upcoming file into its own folder
+    async def prefetch(self, full_path, tracks, folder_number):
+        results = {}
+        folder = os.path.join(self.prefetch_folder, str(folder_number))
+        os.makedirs(folder, exist_ok=True)
+
+        for track in tracks:
+            if not track_needs_extraction(track):
+                continue
+
+            outputted_file = os.path.join(
+                folder, f"lang_test_{track.track_id}.{set_extension(track)}"
+            )
+            if uses_file_source(full_path):
+                async with self.semaphores["disk"]:
+                    extracted = await asyncio.to_thread(
+                        demux_subtitle_track, full_path, track, outputted_file
+                    )
+                if not extracted:
+                    continue
+            else:
+                async with self.semaphores["disk"]:
+                    process = await execute_command_async(
+                        [
+                            "mkvextract",
+                            "tracks",
+                            full_path,
+                            f"{track.track_id}:{outputted_file}",
+                        ],
+                        "extract",
+                        full_path,
+                    )
+                if process is None or process.returncode != 0:
+                    continue
+            if not os.path.isfile(outputted_file):
+                continue
+
+            if needs_conversion(outputted_file):
+                converted_file = None
+                if can_ocr_natively(outputted_file):
+                    async with self.semaphores["ocr"]:
+                        converted_file = await asyncio.to_thread(
+                            ocr_subtitle_file, outputted_file
+                        )
+                if not converted_file:
+                    async with self.semaphores["ocr"]:
+                        process = await execute_command_async(
+                            get_conversion_command(outputted_file), "ocr"
+                        )
+                    converted_file = f"{os.path.splitext(outputted_file)[0]}.srt"
+                    if process is None or process.returncode != 0:
+                        continue
+                    if not os.path.isfile(converted_file):
+                        continue
+                outputted_file = converted_file
+
+            try:
+                async with self.semaphores["cpu"]:
+                    self.parsed[outputted_file] = await asyncio.to_thread(
+                        parse_subtitles, outputted_file
+                    )
+            except Exception as e:
+                print(f"\t\tFailed to parse prefetched subtitle: {e}")
+
+            results[track.track_id] = outputted_file
+        return results
+
+    # Returns the prefetched subtitle file for the track, waiting for it if needed
+    def get_prefetched(self, full_path, track_id):
+        future = self.prefetches.get(full_path)
+        if not future:
+            return None
+        try:
+            return future.result().pop(track_id, None)
+        except Exception as e:
+            print(f"\t\tPrefetch failed: {e}")
+            return None
+
+    # Returns the parsed lines of a prefetched subtitle file
+    def get_parsed(self, subtitle_file):
+        return self.parsed.pop(subtitle_file, None)
+
+    # Blocks the detection thread until the queued writes are done,
+    # once the run is over they already are
+    def wait_for_writes(self):
+        if self.loop.is_running():
+            asyncio.run_coroutine_threadsafe(self.writes.join(), self.loop).result()
+
+    # Waits for outstanding prefetches and removes their files
+    def clear_prefetched(self):
+        for future in self.prefetches.values():
+            try:
+                future.result()
+            except Exception:
+                pass
+        self.prefetches.clear()
+        self.parsed.clear()
+        self.upcoming = []
+        if os.path.isdir(self.prefetch_folder):
+            shutil.rmtree(self.prefetch_folder, ignore_errors=True)
+
+
+# Returns the language the subtitle track resolves to by process of elimination
+# of the other tracks, or None, without side effects
+def get_elimination_language(track, track_counts, total_tracks):
     jpn_audio_count = track_counts["jpn_audio"]
     eng_audio_count = track_counts["eng_audio"]
     jpn_subtitle_count = track_counts["jpn_subtitle"]
     eng_subtitle_count = track_counts["eng_subtitle"]
     unknown_audio_count = track_counts["unknown_audio"]
     unknown_subtitle_count = track_counts["unknown_subtitle"]
+
+    if contains_sign_keyword(track.track_name):
+        if total_tracks > 0 and total_tracks % 2 == 0:
+            if unknown_audio_count == 0 and unknown_subtitle_count == 1:
+                if (
+                    total_tracks
+                    - (
+                        jpn_audio_count
+                        + eng_audio_count
+                        + jpn_subtitle_count
+                        + eng_subtitle_count
+                    )
+                    == unknown_subtitle_count
+                ):
+                    return "eng"
+
+    elif eng_audio_count == 0:
+        if jpn_subtitle_count == 0 and jpn_audio_count == 1:
+            if eng_subtitle_count == 0 and eng_audio_count == 0:
+                if unknown_audio_count == 0 and unknown_subtitle_count == 1:
+                    if (
+                        total_tracks - (jpn_audio_count + jpn_subtitle_count)
+                        == unknown_subtitle_count
+                    ):
+                        return "eng"
+    return None
+
+
+# Counts a track language found by keyword, so later tracks of the file
+# can be determined through elimination
+def update_track_counts(track_counts, lang_code):
+    track_counts["unknown_audio"] -= 1
+    if lang_code == "eng":
+        track_counts["eng_audio"] += 1
+    elif lang_code == "jpn":
+        track_counts["jpn_audio"] += 1
+
+
+def handle_tracks(tracks, track_counts, root, full_path):
     total_tracks = sum(track_counts.values())
+    # updated as audio tracks are resolved by keyword
+    track_counts = dict(track_counts)
 
     # helps avoid processing too many pgs subs
     subtitle_count = 0
@@ -986,47 +3440,23 @@ def handle_tracks(tracks, track_counts, root, full_path):
                 )
                 continue
 
-            done = False
-
             print("\n\t\tChecking track...")
-            sign = contains_sign_keyword(track.track_name)
-
-            if sign:
+            if contains_sign_keyword(track.track_name):
                 print("\t\tTrack name contains a Signs keyword.")
-                if total_tracks > 0 and total_tracks % 2 == 0:
-                    if unknown_audio_count == 0 and unknown_subtitle_count == 1:
-                        if (
-                            total_tracks
-                            - (
-                                jpn_audio_count
-                                + eng_audio_count
-                                + jpn_subtitle_count
-                                + eng_subtitle_count
-                            )
-                            == unknown_subtitle_count
-                        ):
-                            send_message(
-                                "\tTrack determined to be English through process of elimination."
-                            )
-                            set_track_language(full_path, track, "eng")
-                            done = True
-
-            elif eng_audio_count == 0:
+            elif track_counts["eng_audio"] == 0:
                 print("\t\tNo recognized name track.")
-                if jpn_subtitle_count == 0 and jpn_audio_count == 1:
-                    if eng_subtitle_count == 0 and eng_audio_count == 0:
-                        if unknown_audio_count == 0 and unknown_subtitle_count == 1:
-                            if (
-                                total_tracks - (jpn_audio_count + jpn_subtitle_count)
-                                == unknown_subtitle_count
-                            ):
-                                send_message(
-                                    "\tTrack determined to be English through process of elimination."
-                                )
-                                set_track_language(full_path, track, "eng")
-                                done = True
 
-            if not done:
+            elimination_language = get_elimination_language(
+                track, track_counts, total_tracks
+            )
+            if elimination_language:
+                send_message(
+                    "\tTrack determined to be English through process of elimination."
+                )
+                set_track_language(
+                    full_path, track, elimination_language, "elimination", 100
+                )
+            else:
                 print(
                     "\t\tLanguage could not be determined through process of elimination."
                 )
@@ -1034,7 +3464,7 @@ def handle_tracks(tracks, track_counts, root, full_path):
 
         elif track._track_type == "audio":
             # skip if there are no unknown audio tracks
-            if unknown_audio_count == 0:
+            if track_counts["unknown_audio"] == 0:
                 continue
 
             # skip if the language is not in the list of languages to check
@@ -1058,29 +3488,648 @@ def handle_tracks(tracks, track_counts, root, full_path):
                     # update our counts because any upcoming uknown subtitle tracks
                     # could now be determined through elimination
                     track.language = code
-                    unknown_audio_count -= 1
-                    if code == "eng":
-                        eng_audio_count += 1
-                    elif code == "jpn":
-                        jpn_audio_count += 1
+                    update_track_counts(track_counts, code)
                     break
 
 
+# Returns the action a full run would take on each checked track, mirroring
+# handle_tracks and fast_text_detect without side effects.
+# Actions: elimination, keyword, rule, extract, ocr, unnamed, unsupported, unresolved
+def triage_tracks(tracks, full_path):
+    track_counts = count_tracks(tracks)
+    total_tracks = sum(track_counts.values())
+    actions = []
+
+    for track in tracks:
+        if track._track_type not in track_types_to_check:
+            continue
+
+        language = None
+        if track._track_type == "subtitles":
+            if track.language not in subtitle_languages_to_check:
+                continue
+            if str(track.track_name) == "None":
+                action = "unnamed"
+            else:
+                language = get_elimination_language(track, track_counts, total_tracks)
+                if language:
+                    action = "elimination"
+                else:
+                    language = find_language_keyword(track.track_name)
+                    rule = (
+                        release_rules.get_rule(full_path, track)
+                        if release_rules_enabled
+                        else None
+                    )
+                    if language:
+                        action = "keyword"
+                    elif rule:
+                        action = "rule"
+                        language = rule["language"]
+                    elif not set_extension(track):
+                        action = "unsupported"
+                    elif track.track_codec in ["HDMV PGS", "VobSub"]:
+                        action = "ocr"
+                    else:
+                        action = "extract"
+
+        elif track._track_type == "audio":
+            if track_counts["unknown_audio"] == 0:
+                continue
+            if track.language not in audio_languages_to_check:
+                continue
+            if not track.track_name:
+                continue
+            language = find_language_keyword(track.track_name)
+            if language:
+                action = "keyword"
+                update_track_counts(track_counts, language)
+            else:
+                action = "unresolved"
+        else:
+            continue
+
+        actions.append((track, action, language))
+    return actions
+
+
+# Estimates the seconds a full run would spend on the file's track actions,
+# each extraction reads the whole file
+def estimate_triage_cost(actions, file_size):
+    cost = 0
+    for _, action, _ in actions:
+        cost += triage_cost_seconds.get(action, 0)
+        if action in ["extract", "ocr"]:
+            cost += (file_size / (1024**3)) * triage_cost_seconds.get("read_per_gb", 0)
+    return round(cost, 2)
+
+
+# Returns the mkv files of the path or file, in the order a full run walks them
+def get_triage_files():
+    full_paths = []
+    if path:
+        if not os.path.isdir(path):
+            send_message(f"\n\tNot a valid path: {path}\n", error=True)
+            return full_paths
+        for root, dirs, files in iter_scan_directories():
+            full_paths.extend(
+                os.path.abspath(os.path.join(root, file)) for file in files
+            )
+    elif file:
+        if is_remote_path(file):
+            full_paths.append(file)
+        elif os.path.isfile(file):
+            full_paths.append(os.path.abspath(file))
+        else:
+            send_message("\n\tFile does not exist.\n", error=True)
+    return full_paths
+
+
+# Reads only the track headers of the library, and writes the files
+# a full run would change or extract to the worklist with their estimated cost
+def run_triage(output_path):
+    full_paths = get_triage_files()
+    print(f"\n\tReading the track headers of {len(full_paths)} files...")
+    file_tracks = read_track_headers(full_paths)
+    header_cache.save()
+
+    action_counts = Counter()
+    files_with_unknown = 0
+    files_with_images = 0
+    files_needing_extraction = 0
+    pending_files = 0
+    total_cost = 0
+
+    output_folder = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(output_folder, exist_ok=True)
+    with open(output_path, "w") as f:
+        for full_path in full_paths:
+            tracks = file_tracks.get(full_path)
+            if tracks is None:
+                continue
+
+            actions = triage_tracks(tracks, full_path)
+            action_counts.update(action for _, action, _ in actions)
+            if any(
+                track._track_type == "subtitles"
+                and track.language in subtitle_languages_to_check
+                for track in tracks
+            ):
+                files_with_unknown += 1
+            if any(action == "ocr" for _, action, _ in actions):
+                files_with_images += 1
+
+            pending = [
+                entry
+                for entry in actions
+                if entry[1] in ["elimination", "keyword", "rule", "extract", "ocr"]
+            ]
+            if not pending:
+                continue
+            if any(action in ["extract", "ocr"] for _, action, _ in pending):
+                files_needing_extraction += 1
+
+            cost = estimate_triage_cost(pending, get_file_size(full_path))
+            total_cost += cost
+            pending_files += 1
+            f.write(
+                json.dumps(
+                    {
+                        "path": full_path,
+                        "estimated_seconds": cost,
+                        "tracks": [
+                            {
+                                "id": track.track_id,
+                                "type": track._track_type,
+                                "codec": track.track_codec,
+                                "name": track.track_name,
+                                "language": track.language,
+                                "action": action,
+                                "resolved_language": language,
+                            }
+                            for track, action, language in pending
+                        ],
+                    }
+                )
+                + "\n"
+            )
+
+    send_message("\n\t--- Triage ---")
+    send_message(f"\tFiles Scanned: {len(file_tracks)} of {len(full_paths)}")
+    send_message(f"\tFiles with und/zxx subtitles: {files_with_unknown}")
+    send_message(f"\tFiles with image subtitles to OCR: {files_with_images}")
+    send_message(f"\tFiles needing extraction: {files_needing_extraction}")
+    send_message(f"\tFiles in the worklist: {pending_files}")
+    for action, count in sorted(action_counts.items()):
+        send_message(f"\t\tTracks by {action}: {count}")
+    send_message(f"\tEstimated Cost: {timedelta(seconds=round(total_cost))}")
+    send_message(f"\tWorklist: {output_path}")
+    send_message(
+        f"\tHeader Cache: {header_cache.hits} hits, {header_cache.misses} misses"
+    )
+
+
+# Reads the worklist written by a triage run, returns the files grouped by directory
+def read_worklist(worklist_file):
+    directories = {}
+    with open(worklist_file, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                print(f"\tSkipping unreadable worklist line: {line.strip()}")
+                continue
+            full_path = entry.get("path")
+            if not full_path or not (
+                is_remote_path(full_path) or os.path.isfile(full_path)
+            ):
+                print(f"\tSkipping missing worklist file: {full_path}")
+                continue
+            root, file_name = os.path.split(full_path)
+            directories.setdefault(root, []).append(file_name)
+    return [(root, sorted(files)) for root, files in directories.items()]
+
+
 # Prints the list section with title and items
 def print_list_section(title, items):
-    if not items:
-        return
-    send_message(f"\n\t--- {title} ---")
+    printed_title = False
     for it in items:
+        if not printed_title:
+            send_message(f"\n\t--- {title} ---")
+            printed_title = True
         send_message(f"{it}\n")
 
 
-if __name__ == "__main__":
+# An append-only JSONL journal of the completed files and their decisions.
+# Entries are fsynced in batches, a resumed run skips the files already in it,
+# and the end-of-run summary is read back from it.
+class RunJournal:
+    def __init__(self, journal_path, fsync_batch):
+        # the walk changes directory, so relative paths are resolved up front
+        self.journal_path = os.path.abspath(journal_path)
+        self.fsync_batch = max(int(fsync_batch), 1)
+        self.completed = {}
+        self.pending = []
+        self.handle = None
+
+    # Opens the journal, keeping the previous entries only when resuming
+    def open(self, resume):
+        folder = os.path.dirname(self.journal_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        if resume and os.path.isfile(self.journal_path):
+            for entry in self.read_entries():
+                if entry.get("type") != "file":
+                    continue
+                if entry.get("failed"):
+                    # failed files are processed again
+                    self.completed.pop(entry["path"], None)
+                    continue
+                self.completed[entry["path"]] = {
+                    int(track_id): language
+                    for track_id, language in entry["decisions"].items()
+                }
+            print(f"\tResuming, {len(self.completed)} files already completed.")
+            mode = "a"
+        else:
+            if resume:
+                print("\tNo journal found to resume from, starting from the top.")
+            elif os.path.isfile(self.journal_path):
+                self.rotate()
+            mode = "w"
+
+        self.handle = open(self.journal_path, mode, encoding="utf-8")
+        self.write_entries(
+            [
+                {
+                    "type": "run_start",
+                    "time": str(datetime.now()),
+                    "resume": resume,
+                    "path": path,
+                    "file": file,
+                }
+            ]
+        )
+
+    # Moves the journal of an unfinished run aside instead of truncating it,
+    # so a run started without --resume doesn't throw away its checkpoint
+    def rotate(self):
+        status = "interrupted"
+        for entry in self.read_entries():
+            if entry.get("type") == "run_start":
+                status = "interrupted"
+            elif entry.get("type") == "run_end":
+                status = entry.get("status")
+        if status == "complete":
+            return
+
+        name, extension = os.path.splitext(self.journal_path)
+        rotated_path = f"{name}.{datetime.now().strftime('%Y%m%d-%H%M%S')}{extension}"
+        os.replace(self.journal_path, rotated_path)
+        print(
+            f"\tThe previous run didn't finish ({status}), its journal was moved to: {rotated_path}"
+        )
+        print("\tMove it back and pass --resume to continue it instead.")
+
+    # Reads the entries back, skipping a torn final line from an interrupted run
+    def read_entries(self):
+        with open(self.journal_path, "r", encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def is_completed(self, full_path):
+        return full_path in self.completed
+
+    def get_decisions(self, full_path):
+        return dict(self.completed.get(full_path, {}))
+
+    # Moves the file's messages into the journal and checkpoints every batch.
+    # Failed files are recorded but not completed, so a resumed run retries them.
+    def record_file(self, full_path, decisions, failed=False):
+        self.pending.append(
+            {
+                "type": "file",
+                "time": str(datetime.now()),
+                "path": full_path,
+                "decisions": dict(decisions),
+                "failed": failed,
+                "changes": list(items_changed),
+                "errors": list(errors),
+            }
+        )
+        items_changed.clear()
+        errors.clear()
+
+        if len(self.pending) >= self.fsync_batch:
+            self.checkpoint()
+
+    # Writes and fsyncs the pending entries, once their background writes are done
+    # and have settled which decisions were made and whether the file failed
+    def checkpoint(self):
+        if not self.pending:
+            return
+        if pipeline:
+            pipeline.wait_for_writes()
+        for entry in self.pending:
+            write_result = pipeline.take_write_result(entry["path"]) if pipeline else None
+            if write_result:
+                entry["decisions"].update(write_result["decisions"])
+                entry["changes"].extend(write_result["changes"])
+                entry["errors"].extend(write_result["errors"])
+                entry["failed"] = entry["failed"] or write_result["failed"]
+            if not entry["failed"]:
+                self.completed[entry["path"]] = dict(entry["decisions"])
+        self.write_entries(self.pending)
+        self.pending = []
+
+    def write_entries(self, entries):
+        for entry in entries:
+            self.handle.write(json.dumps(entry) + "\n")
+        self.handle.flush()
+        os.fsync(self.handle.fileno())
+
+    # Records the end of the run along with any messages not tied to a file
+    def close(self, status):
+        self.checkpoint()
+        self.write_entries(
+            [
+                {
+                    "type": "run_end",
+                    "time": str(datetime.now()),
+                    "status": status,
+                    "changes": list(items_changed),
+                    "errors": list(errors),
+                }
+            ]
+        )
+        items_changed.clear()
+        errors.clear()
+        self.handle.close()
+
+    # Yields the given message type of every entry in the journal
+    def iter_messages(self, key):
+        for entry in self.read_entries():
+            yield from entry.get(key, [])
+
+
+# A JSONL edit plan written by a read-only run, one line per file with its identity
+# and the track edits to make, applied later in bulk with --apply.
+# Local files are recorded relative to the root they were scanned at, so the plan of
+# a replica can be applied to the original library with --apply-root.
+class EditPlan:
+    def __init__(self, plan_path, scan_root=None):
+        self.plan_path = plan_path
+        self.scan_root = scan_root
+        self.handle = None
+        self.file_count = 0
+        self.edit_count = 0
+
+    # Opens the plan, appending to it only when resuming, as the journal skips
+    # the files already planned
+    def open(self, resume):
+        folder = os.path.dirname(self.plan_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        mode = "a" if resume and os.path.isfile(self.plan_path) else "w"
+        self.handle = open(self.plan_path, mode, encoding="utf-8")
+
+    # Returns the root and the path relative to it a file is recorded under,
+    # remote files are recorded by their url alone
+    def get_plan_location(self, full_path):
+        if is_remote_path(full_path):
+            return None, full_path
+        full_path = os.path.abspath(full_path)
+        root = self.scan_root
+        if not root or os.path.commonpath([root, full_path]) != root:
+            root = os.path.dirname(full_path)
+        return root, os.path.relpath(full_path, root)
+
+    def record_file(self, full_path, edits):
+        if not is_remote_path(full_path):
+            full_path = os.path.abspath(full_path)
+        try:
+            identity = get_file_identity(full_path)
+        except (OSError, ValueError) as e:
+            send_message(
+                f"\t\tFailed to read the identity of: {full_path}\n\t\tError: {e}",
+                error=True,
+            )
+            return
+        root, relative_path = self.get_plan_location(full_path)
+        self.handle.write(
+            json.dumps(
+                {
+                    "root": root,
+                    "path": relative_path,
+                    "identity": identity,
+                    "edits": [edits[track_id] for track_id in sorted(edits)],
+                }
+            )
+            + "\n"
+        )
+        self.handle.flush()
+        self.file_count += 1
+        self.edit_count += len(edits)
+
+    def close(self):
+        self.handle.close()
+        send_message(
+            f"\n\tPlan: {self.edit_count} edits on {self.file_count} files "
+            f"written to {self.plan_path}"
+        )
+
+
+# Reads the edit plan, returns its entries sorted by directory and file name,
+# so the edits are applied in disk order. A file planned twice keeps its last entry.
+def read_edit_plan(plan_file):
+    entries = {}
+    with open(plan_file, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                print(f"\tSkipping unreadable plan line: {line.strip()}")
+                continue
+            if entry.get("path") and entry.get("edits"):
+                entries[get_planned_path(entry)] = entry
+    return [entries[full_path] for full_path in sorted(entries, key=os.path.split)]
+
+
+# Returns the path the plan entry is applied to: under --apply-root when given,
+# otherwise under the root it was scanned at. Remote urls go through get_local_path.
+def get_planned_path(entry):
+    if entry.get("root") is None:
+        return get_local_path(entry["path"])
+    return os.path.join(apply_root or entry["root"], entry["path"])
+
+
+# Returns the local path of a planned remote file through remote_path_mappings,
+# local paths and unmapped urls are returned as they are
+def get_local_path(full_path):
+    for prefix, local_folder in remote_path_mappings.items():
+        if full_path.startswith(prefix):
+            return os.path.join(
+                local_folder, urllib.parse.unquote(full_path[len(prefix) :])
+            )
+    return full_path
+
+
+# Verifies the planned file is unchanged and applies all of its edits with one
+# mkvpropedit call, returns applied, changed, locked, unmapped or failed
+def apply_file_edits(entry):
+    full_path = get_planned_path(entry)
+    if is_remote_path(full_path):
+        send_message(
+            f"\t\tNo remote_path_mappings entry for the remote file: {full_path}",
+            error=True,
+        )
+        return "unmapped"
+
+    lock_path = None
+    if lock_files_enabled:
+        lock_path = acquire_file_lock(full_path)
+        if not lock_path:
+            send_message(
+                f"\t\tFile is locked by another host, skipping edit: {full_path}",
+                error=True,
+            )
+            return "locked"
+
+    try:
+        if not matches_file_identity(full_path, entry["identity"]):
+            send_message(
+                f"\t\tFile changed since it was planned, skipping: {full_path}",
+                error=True,
+            )
+            return "changed"
+
+        command = ["mkvpropedit", full_path]
+        for edit in entry["edits"]:
+            command += [
+                "--edit",
+                f"track:{edit['track']}",
+                "--set",
+                f"language={edit['new']}",
+            ]
+        call = execute_command(command, "write")
+        if not call or call.returncode != 0:
+            send_message(f"\t\tFailed to apply the plan to: {full_path}", error=True)
+            return "failed"
+
+        for edit in entry["edits"]:
+            send_message(
+                f"\t\tFile: {full_path}\n\t\tTrack: {edit['track']} set to: "
+                f"{edit['new']} ({edit['evidence']})",
+                True,
+            )
+        return "applied"
+    finally:
+        if lock_path:
+            release_file_lock(lock_path)
+
+
+# Applies the edit plan in bulk, many files at a time, in directory order
+def apply_edit_plan(plan_file):
+    entries = read_edit_plan(plan_file)
+    edit_count = sum(len(entry["edits"]) for entry in entries)
+    print(f"\n\tApplying {edit_count} edits to {len(entries)} files...")
+
+    with ThreadPoolExecutor(max_workers=max(apply_workers, 1)) as executor:
+        results = Counter(executor.map(apply_file_edits, entries))
+
+    print_list_section("Errors", errors)
+    print_list_section("Items Changed", items_changed)
+    send_message("\n\t--- Apply ---")
+    send_message(f"\tFiles Applied: {results['applied']} of {len(entries)}")
+    send_message(f"\tFiles Changed Since Planning: {results['changed']}")
+    send_message(f"\tFiles Locked: {results['locked']}")
+    send_message(f"\tRemote Files Without a Mapping: {results['unmapped']}")
+    send_message(f"\tFiles Failed: {results['failed']}")
+
+
+# Prints how often the script pre-classifier decided a track without FastText
+def print_script_detection_stats():
+    total = script_detection_stats["decided"] + script_detection_stats["deferred"]
+    if not total:
+        return
+    decided_percent = round((script_detection_stats["decided"] / total) * 100, 2)
+    send_message(
+        f"\n\tScript Pre-Classifier: decided {script_detection_stats['decided']} of "
+        f"{total} evaluations ({decided_percent}%), deferred "
+        f"{script_detection_stats['deferred']} to FastText"
+    )
+
+
+# Prints how many ASS events were skipped as signs or karaoke
+def print_ass_filter_stats():
+    total = ass_filter_stats["dialogue"] + ass_filter_stats["signs"]
+    if not total and not ass_filter_stats["fallbacks"]:
+        return
+    skipped_percent = round((ass_filter_stats["signs"] / total) * 100, 2) if total else 0
+    send_message(
+        f"\n\tASS Style Filter: skipped {ass_filter_stats['signs']} of {total} "
+        f"events as signs/karaoke ({skipped_percent}%), "
+        f"{ass_filter_stats['fallbacks']} tracks had no dialogue events"
+    )
+
+
+# Checks if the key belongs to this host's shard, using a hash that is stable across hosts
+def in_shard(key):
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return int(digest, 16) % shard_count == shard_index
+
+
+# Keeps only this shard's series folders and loose files at the top of the path.
+# Loose files are split by release group so similar releases stay on one host.
+def filter_shard(files, dirs):
+    dirs[:] = [d for d in dirs if in_shard(d)]
+    files[:] = [f for f in files if in_shard(get_release_group(f) or f)]
+
+
+# Combines the journals of several shards into one report
+def merge_journals(journal_paths, output_path=None):
+    output = open(output_path, "w", encoding="utf-8") if output_path else None
+    merged_errors = []
+    merged_changes = []
+
+    try:
+        for shard_journal_path in journal_paths:
+            if not os.path.isfile(shard_journal_path):
+                send_message(f"\n\tJournal not found: {shard_journal_path}", error=True)
+                continue
+
+            completed_files = 0
+            failed_files = 0
+            status = "interrupted"
+            for entry in RunJournal(shard_journal_path, 1).read_entries():
+                if entry.get("type") == "file" and entry.get("failed"):
+                    failed_files += 1
+                elif entry.get("type") == "file":
+                    completed_files += 1
+                elif entry.get("type") == "run_end":
+                    status = entry.get("status")
+                merged_errors.extend(entry.get("errors", []))
+                merged_changes.extend(entry.get("changes", []))
+                if output:
+                    entry["journal"] = os.path.basename(shard_journal_path)
+                    output.write(json.dumps(entry) + "\n")
+
+            send_message(
+                f"\n\tJournal: {shard_journal_path}\n\tFiles Completed: "
+                f"{completed_files}\n\tFiles Failed: {failed_files}\n\tLast Status: {status}"
+            )
+    finally:
+        if output:
+            output.close()
+
+    print_list_section("Errors", merged_errors)
+    print_list_section("Items Changed", merged_changes)
+
+
+# Processes the path or file given on the command line
+def run():
+    try:
+        run_path_or_file()
+    except StopRun as e:
+        send_message(f"\n\t{e}, stopping.")
+        return "cutoff"
+    return "complete"
+
+
+# Walks the path or processes the single file
+def run_path_or_file():
     if path:
         if os.path.isdir(path):
             os.chdir(path)
-            for root, dirs, files in os.walk(path):
-                clean_and_sort(files, root, dirs)
+            for root, dirs, files in iter_scan_directories():
                 print(f"\nCurrent Path: {root}\nDirectories: {dirs}")
                 print(f"Files: {files}")
                 start(files, root, dirs)
@@ -1088,14 +4137,103 @@ if __name__ == "__main__":
             send_message(f"\n\tNot a valid path: {path}\n", error=True)
     elif file:
         send_message(f"\n\tFile: {file}")
-        if os.path.isfile(file):
+        if is_remote_path(file) or os.path.isfile(file):
             start([os.path.basename(file)], os.path.dirname(file), [])
         else:
             send_message("\n\tFile does not exist.\n", error=True)
+    elif worklist_path:
+        for root, files in read_worklist(worklist_path):
+            print(f"\nCurrent Path: {root}")
+            print(f"Files: {files}")
+            start(files, root, [])
+
+
+if __name__ == "__main__" and merge_journal_paths:
+    merge_journals(merge_journal_paths, merge_output_path)
+    exit()
+
+if __name__ == "__main__" and (list_rules or export_rules_path):
+    if list_rules:
+        release_rules.print_rules()
+    if export_rules_path:
+        release_rules.export(export_rules_path)
+        send_message(
+            f"\n\tExported {len(release_rules.get_rules())} release rules to {export_rules_path}"
+        )
+    exit()
+
+if __name__ == "__main__" and apply_plan_path:
+    if resource_governor_enabled:
+        governor = ResourceGovernor()
+    apply_edit_plan(apply_plan_path)
+    send_message(f"\nTotal Execution Time: {datetime.now() - startTime}")
+    exit()
+
+if __name__ == "__main__" and triage_output_path:
+    run_triage(triage_output_path)
+    send_message(f"\nTotal Execution Time: {datetime.now() - startTime}")
+    exit()
+
+if __name__ == "__main__":
+    journal = RunJournal(journal_path, journal_fsync_batch)
+    journal.open(resume)
+    if plan_output_path:
+        edit_plan = EditPlan(plan_output_path, os.path.abspath(path) if path else None)
+        edit_plan.open(resume)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    if resource_governor_enabled:
+        governor = ResourceGovernor()
+
+    if profile_enabled:
+        # load langcodes' lazily imported name data first,
+        # unmarshalling it with allocations traced takes minutes
+        Language.get("en").display_name()
+        profiler = FileProfiler(
+            profile_output_path,
+            profile_sample_interval,
+            profile_slowest_files,
+            profile_top_entries,
+            {
+                "items_changed": lambda: len(items_changed),
+                "errors": lambda: len(errors),
+                "track_signatures": lambda: len(track_signatures),
+                "line_cache": lambda: len(line_cache.entries),
+                "header_cache": lambda: len(header_cache.entries),
+                "release_rules": lambda: len(release_rules.rules),
+            },
+            async_pipeline,
+        )
+        profiler.start()
+
+    status = "interrupted"
+    try:
+        if async_pipeline:
+            pipeline = AsyncPipeline(async_pipeline_limits, async_prefetch_depth)
+            status = asyncio.run(pipeline.run(run))
+        else:
+            status = run()
+    finally:
+        if profiler:
+            profiler.stop()
+        # the journal settles the last background writes of the pipeline
+        journal.close(status)
+        pipeline = None
+        if edit_plan:
+            edit_plan.close()
+        line_cache.commit()
+        header_cache.save()
+        release_rules.save()
 
     # Print summary
-    print_list_section("Errors", errors)
-    print_list_section("Items Changed", items_changed)
+    print_list_section("Errors", journal.iter_messages("errors"))
+    print_list_section("Items Changed", journal.iter_messages("changes"))
+    print_script_detection_stats()
+    print_ass_filter_stats()
+    line_cache.print_stats()
+    line_cache.close()
+    if profiler:
+        print("\n".join(profiler.get_report()))
 
     # Print execution time
     execution_time = datetime.now() - startTime
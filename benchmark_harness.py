@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+# End-to-end throughput harness for anime_lang_track_corrector.py.
+#
+# Generates a synthetic library of fake .mkv files (JSON track layouts with
+# subtitle payloads) and puts fake mkvmerge, mkvextract, mkvpropedit, xvfb-run
+# and mono executables first on the PATH. The fakes emit canned JSON and
+# subtitle files with configurable latencies and log every spawn, so the
+# orchestration overhead of a run can be measured without a real library.
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+# Script Execution Location
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The script being benchmarked
+SCRIPT_PATH = os.path.join(ROOT_DIR, "anime_lang_track_corrector.py")
+
+# The subtitle lines used to build the synthetic tracks, by language
+sample_lines = {
+    "eng": [
+        "I can't believe you came all this way.",
+        "We have to get out of here before they find us.",
+        "Do you really think that's going to work?",
+        "Listen to me, this is important.",
+        "I will protect everyone, no matter what.",
+        "What are you talking about?",
+        "That was the best day of my life.",
+        "Let's go home together.",
+    ],
+    "spa": [
+        "No puedo creer que hayas venido hasta aquí.",
+        "Tenemos que salir de aquí antes de que nos encuentren.",
+        "¿De verdad crees que eso va a funcionar?",
+        "Escúchame, esto es importante.",
+        "Protegeré a todos, pase lo que pase.",
+    ],
+    "jpn": [
+        "ここまで来てくれたなんて信じられない。",
+        "見つかる前にここから出なきゃ。",
+        "本当にうまくいくと思ってるの？",
+        "聞いて、これは大事なことなんだ。",
+    ],
+}
+
+# The sign lines used to build the signs tracks
+sign_lines = ["Episode Title", "Class 2-B", "Tokyo Station", "Next Episode"]
+
+# The source of the fake executables, {tool} and {python} are filled in
+fake_tool_header = """#!{python}
+import json, os, sys, time
+
+# Logs the spawn and the bytes the tool wrote to the stats log
+def log(written=0):
+    with open(os.environ["BENCH_STATS_LOG"], "a") as handle:
+        handle.write(json.dumps({{"tool": "{tool}", "bytes_written": written}}) + "\\n")
+
+time.sleep(float(os.environ.get("BENCH_LATENCY_{env_tool}", "0")))
+"""
+
+fake_tool_bodies = {
+    "mkvmerge": """
+if sys.argv[1] == "-V":
+    log()
+    print("mkvmerge v80.0 ('benchmark')")
+    sys.exit(0)
+data = json.load(open(sys.argv[-1]))
+tracks = []
+for i, t in enumerate(data["tracks"]):
+    properties = {
+        k: v
+        for k, v in t.items()
+        if k in ("language", "track_name", "forced_track", "default_track")
+    }
+    if "payload" in t:
+        # the statistics tags mkvmerge writes, one frame per subtitle event
+        payload = t["payload"]
+        properties["tag_number_of_frames"] = str(payload.count("-->") + payload.count("Dialogue:"))
+        properties["tag_number_of_bytes"] = str(len(payload.encode("utf-8")))
+    tracks.append({"id": i, "type": t["type"], "codec": t["codec"], "properties": properties})
+container = {"type": "Matroska", "recognized": True, "supported": True, "properties": {}}
+log()
+print(json.dumps({"container": container, "tracks": tracks}))
+""",
+    "mkvextract": """
+data = json.load(open(sys.argv[2]))
+written = 0
+for spec in sys.argv[3:]:
+    track_id, output = spec.split(":", 1)
+    payload = data["tracks"][int(track_id)].get("payload", "")
+    with open(output, "w", encoding="utf-8") as handle:
+        written += handle.write(payload)
+log(written)
+""",
+    "mkvpropedit": """
+path = sys.argv[1]
+data = json.load(open(path))
+args = sys.argv[2:]
+track_index = None
+for option, value in zip(args[::2], args[1::2]):
+    if option == "--edit":
+        track_index = int(value.split(":")[1]) - 1
+    elif option == "--set":
+        key, new_value = value.split("=", 1)
+        data["tracks"][track_index][key] = new_value
+with open(path, "w") as handle:
+    json.dump(data, handle)
+log()
+""",
+    "xvfb-run": """
+args = sys.argv[1:]
+if args and args[0] == "-a":
+    args = args[1:]
+log()
+os.execvp(args[0], args)
+""",
+    "mono": """
+import re
+source = sys.argv[sys.argv.index("/convert") + 1]
+output = os.path.splitext(source)[0] + ".srt"
+lines = []
+for line in open(source, encoding="utf-8", errors="ignore"):
+    if line.startswith("Dialogue:"):
+        text = line.split(",", 9)[9].strip()
+        lines.append(re.sub(r"\\{[^}]*\\}", "", text).replace("\\\\N", " "))
+    elif not source.endswith((".ass", ".ssa")) and "-->" not in line:
+        lines.append(line.strip())
+written = 0
+with open(output, "w", encoding="utf-8") as handle:
+    for number, text in enumerate([line for line in lines if line], 1):
+        written += handle.write(
+            f"{number}\\n00:00:{number % 60:02d},000 --> 00:00:{number % 60:02d},500\\n{text}\\n\\n"
+        )
+log(written)
+""",
+}
+
+
+# Builds an SRT payload from the lines
+def make_srt(lines):
+    return "".join(
+        f"{number}\n00:00:{number % 60:02d},000 --> 00:00:{number % 60:02d},900\n{text}\n\n"
+        for number, text in enumerate(lines, 1)
+    )
+
+
+# Builds an ASS payload from the lines, all in the given style
+def make_ass(lines, style):
+    header = (
+        "[Script Info]\nScriptType: v4.00+\n\n"
+        "[V4+ Styles]\nFormat: Name, Fontname, Fontsize\n"
+        "Style: Default,Arial,20\nStyle: Signs,Arial,20\n\n"
+        "[Events]\nFormat: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+    )
+    events = "".join(
+        f"Dialogue: 0,0:00:{number % 60:02d}.00,0:00:{number % 60:02d}.50,{style},,0,0,0,,{text}\n"
+        for number, text in enumerate(lines)
+    )
+    return header + events
+
+
+# Returns the track layout of one synthetic episode
+def make_episode_tracks(language, subtitle_lines):
+    lines = sample_lines[language]
+    dialogue = (lines * (subtitle_lines // len(lines) + 1))[:subtitle_lines]
+    signs = [f"{{\\pos(640,80)}}{line}" for line in sign_lines] + lines[:2]
+    return [
+        {"type": "video", "codec": "AVC/H.264/MPEG-4p10", "language": "und"},
+        {"type": "audio", "codec": "AAC", "language": "jpn"},
+        {
+            "type": "subtitles",
+            "codec": "SubRip/SRT",
+            "language": "und",
+            "track_name": "Full Subs",
+            "payload": make_srt(dialogue),
+        },
+        {
+            "type": "subtitles",
+            "codec": "SubStationAlpha",
+            "language": "und",
+            "track_name": "Signs & Songs",
+            "payload": make_ass(signs, "Signs"),
+        },
+    ]
+
+
+# Generates the synthetic library, one folder per series
+def generate_library(library_path, series_count, episodes, subtitle_lines):
+    languages = list(sample_lines)
+    file_count = 0
+    for series in range(series_count):
+        language = languages[series % len(languages)]
+        folder = os.path.join(library_path, f"Series {series + 1:03d}", "Season 01")
+        os.makedirs(folder, exist_ok=True)
+        for episode in range(1, episodes + 1):
+            name = f"Series {series + 1:03d} - S01E{episode:02d} [1080p]-GRP{series % 3}.mkv"
+            with open(os.path.join(folder, name), "w", encoding="utf-8") as handle:
+                json.dump({"tracks": make_episode_tracks(language, subtitle_lines)}, handle)
+            file_count += 1
+    return file_count
+
+
+# Writes the fake executables into the bin folder
+def write_fake_tools(bin_path):
+    os.makedirs(bin_path, exist_ok=True)
+    for tool, body in fake_tool_bodies.items():
+        tool_path = os.path.join(bin_path, tool)
+        header = fake_tool_header.format(
+            python=sys.executable,
+            tool=tool,
+            env_tool=tool.replace("-", "_").upper(),
+        )
+        with open(tool_path, "w", encoding="utf-8") as handle:
+            handle.write(header + body)
+        os.chmod(tool_path, 0o755)
+
+
+# Creates a stand-in SubtitleEdit folder, the script only checks that it's populated
+def write_fake_subtitle_edit(se_path):
+    os.makedirs(se_path, exist_ok=True)
+    for name in ("SubtitleEdit.exe", "readme.txt"):
+        open(os.path.join(se_path, name), "w").close()
+
+
+# Reads the spawn counts and the bytes written by the fakes
+def read_stats(stats_log):
+    spawns = Counter()
+    bytes_written = 0
+    if os.path.isfile(stats_log):
+        with open(stats_log, "r", encoding="utf-8") as handle:
+            for line in handle:
+                entry = json.loads(line)
+                spawns[entry["tool"]] += 1
+                bytes_written += entry["bytes_written"]
+    return spawns, bytes_written
+
+
+# Runs the script against the synthetic library and returns the report
+def run_benchmark(options):
+    work_path = options.work_dir or tempfile.mkdtemp(prefix="altc_bench_")
+    library_path = os.path.join(work_path, "library")
+    bin_path = os.path.join(work_path, "bin")
+    se_path = os.path.join(work_path, "se")
+    stats_log = os.path.join(work_path, "stats.jsonl")
+    journal_path = os.path.join(work_path, "journal.jsonl")
+    output_log = os.path.join(work_path, "output.txt")
+
+    if os.path.isdir(library_path):
+        shutil.rmtree(library_path)
+    if os.path.isfile(stats_log):
+        os.remove(stats_log)
+
+    file_count = generate_library(
+        library_path, options.series, options.episodes, options.subtitle_lines
+    )
+    write_fake_tools(bin_path)
+    write_fake_subtitle_edit(se_path)
+
+    env = dict(os.environ)
+    env["PATH"] = bin_path + os.pathsep + env.get("PATH", "")
+    env["BENCH_STATS_LOG"] = stats_log
+    env["BENCH_LATENCY_MKVMERGE"] = str(options.mkvmerge_latency)
+    env["BENCH_LATENCY_MKVEXTRACT"] = str(options.mkvextract_latency)
+    env["BENCH_LATENCY_MKVPROPEDIT"] = str(options.mkvpropedit_latency)
+    env["BENCH_LATENCY_XVFB_RUN"] = "0"
+    env["BENCH_LATENCY_MONO"] = str(options.mono_latency)
+
+    command = [
+        sys.executable,
+        SCRIPT_PATH,
+        "-p",
+        library_path,
+        "-j",
+        journal_path,
+        "-se",
+        se_path,
+        *options.script_args,
+    ]
+
+    print(f"Library: {library_path} ({file_count} files)")
+    print(f"Command: {' '.join(command)}")
+
+    start_time = time.perf_counter()
+    with open(output_log, "w", encoding="utf-8") as output:
+        result = subprocess.run(command, env=env, stdout=output, stderr=subprocess.STDOUT)
+    elapsed = time.perf_counter() - start_time
+
+    spawns, bytes_written = read_stats(stats_log)
+    total_spawns = sum(spawns.values())
+
+    report = {
+        "files": file_count,
+        "seconds": round(elapsed, 3),
+        "files_per_second": round(file_count / elapsed, 3) if elapsed else 0,
+        "spawns": dict(spawns),
+        "spawns_per_file": round(total_spawns / file_count, 2) if file_count else 0,
+        "bytes_written_to_temp": bytes_written,
+        "edits": spawns.get("mkvpropedit", 0),
+        "return_code": result.returncode,
+        "output_log": output_log,
+    }
+
+    if not options.keep and not options.work_dir:
+        shutil.rmtree(work_path, ignore_errors=True)
+        report["output_log"] = None
+    return report
+
+
+# Prints the report
+def print_report(report):
+    print("\n--- Benchmark Report ---")
+    print(f"\tFiles: {report['files']}")
+    print(f"\tTime: {report['seconds']}s")
+    print(f"\tFiles/s: {report['files_per_second']}")
+    print(f"\tSpawns/File: {report['spawns_per_file']}")
+    for tool, count in sorted(report["spawns"].items()):
+        print(f"\t\t{tool}: {count}")
+    print(f"\tBytes Written to Temp: {report['bytes_written_to_temp']}")
+    print(f"\tEdits: {report['edits']}")
+    print(f"\tReturn Code: {report['return_code']}")
+    if report["output_log"]:
+        print(f"\tOutput Log: {report['output_log']}")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(
+        description="Benchmarks anime_lang_track_corrector.py end-to-end against fake mkvtoolnix/SubtitleEdit binaries."
+    )
+    p.add_argument("--series", type=int, default=4, help="The number of series folders to generate.")
+    p.add_argument("--episodes", type=int, default=12, help="The number of episodes per series.")
+    p.add_argument("--subtitle-lines", type=int, default=300, help="The number of dialogue lines per full subtitle track.")
+    p.add_argument("--mkvmerge-latency", type=float, default=0.0, help="Seconds each fake mkvmerge call takes.")
+    p.add_argument("--mkvextract-latency", type=float, default=0.05, help="Seconds each fake mkvextract call takes.")
+    p.add_argument("--mkvpropedit-latency", type=float, default=0.02, help="Seconds each fake mkvpropedit call takes.")
+    p.add_argument("--mono-latency", type=float, default=0.5, help="Seconds each fake SubtitleEdit conversion takes.")
+    p.add_argument("--work-dir", help="The folder to generate the library in, kept after the run.")
+    p.add_argument("--keep", action="store_true", help="Keep the generated temporary folder and output log.")
+    p.add_argument("--json", help="The path to also write the report to as JSON.")
+    p.add_argument(
+        "script_args",
+        nargs=argparse.REMAINDER,
+        help="Extra arguments passed to the script, after --. EX: -- -ap",
+    )
+    options = p.parse_args()
+    if options.script_args and options.script_args[0] == "--":
+        options.script_args = options.script_args[1:]
+
+    report = run_benchmark(options)
+    print_report(report)
+
+    if options.json:
+        with open(options.json, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=4)
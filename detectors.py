@@ -0,0 +1,238 @@
+import math
+import os
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+# Script Execution Location
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The fastText label prefix
+LABEL_PREFIX = "__label__"
+
+
+# Reads a labeled corpus in fastText's format, one "__label__xx text" per line
+def read_labeled_corpus(corpus_path):
+    corpus = []
+    with open(corpus_path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            parts = line.strip().split(" ", 1)
+            if len(parts) == 2 and parts[0].startswith(LABEL_PREFIX):
+                corpus.append((parts[0], parts[1].strip()))
+    return corpus
+
+
+# A language detector backend, predicting a batch of lines at a time
+class DetectorBackend(ABC):
+    # The name the predictions of this backend are cached under
+    name = ""
+
+    # Returns a (label, probability) pair for each line, labels without the __label__ prefix
+    @abstractmethod
+    def predict(self, lines):
+        pass
+
+
+# Detects with a fastText model, either the full lid.176.bin or the quantized lid.176.ftz
+class FastTextDetector(DetectorBackend):
+    def __init__(self, model_path):
+        import fasttext
+
+        self.name = os.path.basename(model_path)
+        self.model = fasttext.load_model(model_path)
+
+    def predict(self, lines):
+        # fastText treats a newline as the end of the input
+        lines = [line.replace("\n", " ") for line in lines]
+        if not lines:
+            return []
+        labels, probabilities = self.model.predict(lines, k=1)
+        return [
+            (
+                label[0][len(LABEL_PREFIX) :] if label else "",
+                float(probability[0]) if len(probability) else 0.0,
+            )
+            for label, probability in zip(labels, probabilities)
+        ]
+
+
+# The bits each codepoint takes in a packed n-gram key, up to 3 codepoints fit a uint64
+CODEPOINT_BITS = 21
+
+
+# Returns the character n-grams of a batch of texts as packed keys, per n from 1 to max_n,
+# as (text indexes, keys) arrays. Each word is padded with a space on both sides, and
+# n-grams never span two words. Runs over the whole batch at once with numpy.
+def get_ngram_keys(texts, max_n=3):
+    # " word word " per text, one space both pads and separates the words
+    padded = [f" {' '.join(text.lower().split())} " for text in texts]
+    codepoints = np.frombuffer(
+        "".join(padded).encode("utf-32-le"), dtype=np.uint32
+    ).astype(np.uint64)
+    text_indexes = np.repeat(
+        np.arange(len(padded)), [len(text) for text in padded]
+    )
+    is_space = codepoints == ord(" ")
+
+    ngram_keys = []
+    for n in range(1, max_n + 1):
+        count = len(codepoints) - n + 1
+        if count <= 0:
+            ngram_keys.append((np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint64)))
+            continue
+        # within one text, no space inside the n-gram, and not only the padding
+        valid = text_indexes[:count] == text_indexes[n - 1 :]
+        for k in range(1, n - 1):
+            valid &= ~is_space[k : k + count]
+        if n == 1:
+            valid &= ~is_space
+        keys = np.zeros(count, dtype=np.uint64)
+        for k in range(n):
+            keys = (keys << np.uint64(CODEPOINT_BITS)) | codepoints[k : k + count]
+        ngram_keys.append((text_indexes[:count][valid], keys[valid]))
+    return ngram_keys
+
+
+# Builds naive Bayes character n-gram profiles from (label, text, weight) samples,
+# keeping the most frequent n-grams of each language. Returns per n the sorted keys
+# of the kept n-grams and their log probability in each language.
+def build_ngram_profiles(samples, max_ngrams_per_language=3000, max_n=3):
+    languages = sorted({label for label, _, _ in samples})
+    language_indexes = np.array(
+        [languages.index(label) for label, _, _ in samples], dtype=np.int64
+    )
+    sample_weights = np.array([weight for _, _, weight in samples], dtype=np.float64)
+    ngram_keys = get_ngram_keys([text for _, text, _ in samples], max_n)
+
+    # the weighted count of every n-gram in every language, over all n
+    all_keys = []
+    all_counts = []
+    for n, (text_indexes, keys) in enumerate(ngram_keys, start=1):
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(
+            inverse * len(languages) + language_indexes[text_indexes],
+            weights=sample_weights[text_indexes],
+            minlength=len(unique_keys) * len(languages),
+        ).reshape(len(unique_keys), len(languages))
+        all_keys.append((n, unique_keys))
+        all_counts.append(counts)
+    counts = np.vstack(all_counts) if all_counts else np.zeros((0, len(languages)))
+
+    # the vocabulary is the most frequent n-grams of each language
+    kept = np.zeros(len(counts), dtype=bool)
+    for language_index in range(len(languages)):
+        column = counts[:, language_index]
+        top = min(max_ngrams_per_language, int((column > 0).sum()))
+        if top:
+            kept[np.argpartition(-column, top - 1)[:top]] = True
+    vocabulary_size = int(kept.sum())
+    totals = counts.sum(axis=0)
+    weights = np.log((counts + 1) / (totals + vocabulary_size)).astype(np.float32)
+
+    profiles = {"max_n": max_n, "languages": languages}
+    offset = 0
+    for n, unique_keys in all_keys:
+        n_kept = kept[offset : offset + len(unique_keys)]
+        profiles[f"keys_{n}"] = unique_keys[n_kept]
+        profiles[f"weights_{n}"] = weights[offset : offset + len(unique_keys)][n_kept]
+        offset += len(unique_keys)
+    return profiles
+
+
+# Writes the n-gram profiles to a .npz file
+def save_ngram_profiles(profiles, profile_path):
+    with open(profile_path, "wb") as f:
+        np.savez(f, **profiles)
+
+
+# Builds the n-gram profiles from a fastText model's own dictionary, each word
+# weighted by its frequency and spread over the languages the model predicts for it
+def build_ngram_profiles_from_model(model_path, languages):
+    import fasttext
+
+    model = fasttext.load_model(model_path)
+    words, frequencies = model.get_words(include_freq=True)
+    words, frequencies = zip(
+        *[(word, count) for word, count in zip(words, frequencies) if word != "</s>"]
+    )
+    labels, probabilities = model.predict(list(words), k=3)
+
+    samples = []
+    for word, count, word_labels, word_probabilities in zip(
+        words, frequencies, labels, probabilities
+    ):
+        for label, probability in zip(word_labels, word_probabilities):
+            label = label[len(LABEL_PREFIX) :]
+            if label in languages:
+                samples.append((label, word, math.log1p(count) * float(probability)))
+    return build_ngram_profiles(samples)
+
+
+# A naive Bayes detector over character n-grams that doesn't need fastText to predict,
+# built from the fastText model's dictionary on first use or trained on a labeled corpus.
+# Each batch is scored in one pass with numpy. It's less accurate than fastText,
+# see evaluate_detectors.py for how it compares on your subtitles.
+class NgramDetector(DetectorBackend):
+    def __init__(self, profile_path, model_path=None, languages=None):
+        self.name = f"ngram:{os.path.basename(profile_path)}"
+
+        if not os.path.isfile(profile_path):
+            if not model_path or not languages:
+                raise FileNotFoundError(f"N-gram profile not found: {profile_path}")
+            print(f"\tBuilding n-gram profiles from {model_path}...")
+            save_ngram_profiles(
+                build_ngram_profiles_from_model(model_path, languages), profile_path
+            )
+
+        with np.load(profile_path) as profiles:
+            self.max_n = int(profiles["max_n"])
+            self.languages = [str(language) for language in profiles["languages"]]
+            self.keys = [profiles[f"keys_{n}"] for n in range(1, self.max_n + 1)]
+            self.weights = [profiles[f"weights_{n}"] for n in range(1, self.max_n + 1)]
+
+    def predict(self, lines):
+        if not lines:
+            return []
+        scores = np.zeros((len(lines), len(self.languages)), dtype=np.float32)
+        found = np.zeros(len(lines), dtype=np.int64)
+        for n, (line_indexes, keys) in enumerate(
+            get_ngram_keys(lines, self.max_n), start=1
+        ):
+            vocabulary = self.keys[n - 1]
+            if not len(vocabulary) or not len(keys):
+                continue
+            positions = np.minimum(
+                np.searchsorted(vocabulary, keys), len(vocabulary) - 1
+            )
+            known = vocabulary[positions] == keys
+            line_indexes = line_indexes[known]
+            if not len(line_indexes):
+                continue
+            # the n-grams come in line order, so each line's rows are summed in one run
+            starts = np.flatnonzero(
+                np.concatenate(([True], line_indexes[1:] != line_indexes[:-1]))
+            )
+            scored_lines = line_indexes[starts]
+            counts = np.diff(np.append(starts, len(line_indexes)))
+            scores[scored_lines] += np.add.reduceat(
+                self.weights[n - 1][positions[known]], starts, axis=0
+            )
+            found[scored_lines] += counts
+
+        best = scores.argmax(axis=1)
+        # the naive Bayes posterior, overconfident but fine for ranking
+        best_scores = scores[np.arange(len(lines)), best][:, np.newaxis]
+        probabilities = 1 / np.exp(scores - best_scores).sum(axis=1)
+        return [
+            (self.languages[language], float(probability)) if count else ("", 0.0)
+            for language, probability, count in zip(best, probabilities, found)
+        ]
+
+
+# Loads the detector backend by name: fasttext, or ngram
+def load_detector(backend, model_path, profile_path, languages):
+    if backend == "fasttext":
+        return FastTextDetector(model_path)
+    elif backend == "ngram":
+        return NgramDetector(profile_path, model_path, languages)
+    raise ValueError(f"Unknown detector backend: {backend}")
@@ -0,0 +1,210 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from detectors import (
+    LABEL_PREFIX,
+    build_ngram_profiles,
+    load_detector,
+    read_labeled_corpus,
+    save_ngram_profiles,
+)
+from settings import *
+
+# Script Execution Location
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The backends evaluated by default, as backend:file, skipping the files that don't exist.
+# The n-gram profiles are built from lid.176.ftz when missing.
+default_backend_specs = [
+    "fasttext:lid.176.ftz",
+    "fasttext:lid.176.bin",
+    "ngram:ngram_profiles.npz",
+]
+
+
+# Returns the path of a model or profile file, relative to the script folder
+def resolve_path(file_name):
+    if os.path.isabs(file_name):
+        return file_name
+    return os.path.join(ROOT_DIR, file_name)
+
+
+# Loads the backend of the spec, EX: fasttext:lid.176.bin or ngram:ngram_profiles.npz
+def load_backend_spec(spec):
+    backend, _, file_name = spec.partition(":")
+    if backend == "fasttext":
+        return load_detector(backend, resolve_path(file_name), None, None)
+    elif backend == "ngram":
+        return load_detector(
+            backend,
+            resolve_path("lid.176.ftz"),
+            resolve_path(file_name or ngram_profile_name),
+            detector_languages,
+        )
+    raise ValueError(f"Unknown detector backend: {backend}")
+
+
+# Runs one backend over the corpus in this process and prints its results as JSON,
+# the parent measures the peak RSS of this process
+def run_worker(spec, corpus_path, batch_size):
+    corpus = read_labeled_corpus(corpus_path)
+    texts = [text for _, text in corpus]
+    gold = [label[len(LABEL_PREFIX) :] for label, _ in corpus]
+
+    started = time.perf_counter()
+    detector = load_backend_spec(spec)
+    load_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    predictions = []
+    for i in range(0, len(texts), batch_size):
+        predictions.extend(detector.predict(texts[i : i + batch_size]))
+    predict_seconds = time.perf_counter() - started
+
+    labels = [label for label, _ in predictions]
+    kept = [i for i, label in enumerate(gold) if label in detector_languages]
+    print(
+        json.dumps(
+            {
+                "lines": len(texts),
+                "correct": sum(1 for i, label in enumerate(labels) if label == gold[i]),
+                "kept_lines": len(kept),
+                "kept_correct": sum(1 for i in kept if labels[i] == gold[i]),
+                "load_seconds": load_seconds,
+                "predict_seconds": predict_seconds,
+            }
+        )
+    )
+
+
+# Runs the backend in its own process, returns its results and peak RSS in MB
+def evaluate_backend(spec, corpus_path, batch_size):
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.abspath(__file__),
+            corpus_path,
+            "--worker",
+            spec,
+            "--batch-size",
+            str(batch_size),
+        ],
+        stdout=subprocess.PIPE,
+    )
+    output = process.stdout.read()
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise RuntimeError(f"Worker exited with code {process.returncode}")
+
+    result = json.loads(output.decode("utf-8").strip().splitlines()[-1])
+    # ru_maxrss is in kilobytes on Linux
+    result["peak_rss_mb"] = usage.ru_maxrss / 1024
+    return result
+
+
+# Returns the percentage, or 0 when there is nothing to divide by
+def percent(part, whole):
+    return round(part / whole * 100, 2) if whole else 0
+
+
+# Evaluates every backend over the labeled corpus and prints a report,
+# recommending the fastest backend that meets the accuracy bar
+def evaluate_detectors(corpus_path, specs, batch_size, min_accuracy):
+    corpus_size = len(read_labeled_corpus(corpus_path))
+    if not corpus_size:
+        print(f"No labeled lines found in: {corpus_path}")
+        return
+
+    results = []
+    for spec in specs:
+        backend, _, file_name = spec.partition(":")
+        if backend == "fasttext" and not os.path.isfile(resolve_path(file_name)):
+            print(f"\tSkipping {spec}, model not found.")
+            continue
+        print(f"\tEvaluating {spec}...")
+        try:
+            results.append((spec, evaluate_backend(spec, corpus_path, batch_size)))
+        except Exception as e:
+            print(f"\tFailed to evaluate {spec}: {e}")
+
+    print("\n--- Detector Evaluation ---")
+    print(f"\tCorpus: {corpus_path} ({corpus_size} lines)")
+    for spec, result in results:
+        lines_per_second = (
+            result["lines"] / result["predict_seconds"] if result["predict_seconds"] else 0
+        )
+        result["accuracy"] = percent(result["kept_correct"], result["kept_lines"])
+        result["lines_per_second"] = lines_per_second
+        print(f"\n\t{spec}")
+        print(f"\t\tAccuracy: {percent(result['correct'], result['lines'])}%")
+        print(f"\t\tAccuracy on expected languages: {result['accuracy']}%")
+        print(f"\t\tLines/s: {round(lines_per_second)}")
+        print(f"\t\tLoad Time: {round(result['load_seconds'], 3)}s")
+        print(f"\t\tPeak RSS: {round(result['peak_rss_mb'], 1)} MB")
+
+    passing = [
+        (spec, result) for spec, result in results if result["accuracy"] >= min_accuracy
+    ]
+    if passing:
+        spec, result = max(passing, key=lambda item: item[1]["lines_per_second"])
+        print(
+            f"\n\tFastest backend with at least {min_accuracy}% accuracy on expected languages: {spec}"
+        )
+    else:
+        print(f"\n\tNo backend reached {min_accuracy}% accuracy on expected languages.")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(
+        description="Compares the accuracy, lines/s and peak RSS of the language detector backends."
+    )
+    p.add_argument(
+        "corpus", help="A labeled corpus of subtitle lines, __label__xx text per line."
+    )
+    p.add_argument(
+        "-b",
+        "--backends",
+        nargs="+",
+        default=default_backend_specs,
+        help="The backends to evaluate, EX: fasttext:lid.176.bin ngram:ngram_profiles.npz",
+    )
+    p.add_argument(
+        "--min-accuracy",
+        type=float,
+        default=95,
+        help="The accuracy on expected languages a backend needs to be recommended.",
+    )
+    p.add_argument(
+        "--batch-size", type=int, default=1000, help="The lines predicted per batch."
+    )
+    p.add_argument(
+        "--ngram-corpus",
+        help="A labeled corpus to train the n-gram profiles on first, keep it apart from the evaluation corpus.",
+    )
+    p.add_argument("--worker", help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.corpus, args.batch_size)
+        sys.exit()
+
+    if args.ngram_corpus:
+        samples = [
+            (label[len(LABEL_PREFIX) :], text, 1)
+            for label, text in read_labeled_corpus(args.ngram_corpus)
+        ]
+        for spec in args.backends:
+            backend, _, file_name = spec.partition(":")
+            if backend == "ngram":
+                save_ngram_profiles(
+                    build_ngram_profiles(samples),
+                    resolve_path(file_name or ngram_profile_name),
+                )
+                print(f"\tTrained the n-gram profiles of {spec} on {args.ngram_corpus}")
+
+    evaluate_detectors(args.corpus, args.backends, args.batch_size, args.min_accuracy)
@@ -0,0 +1,885 @@
+import argparse
+import functools
+import http.server
+import json
+import mmap
+import os
+import re
+import threading
+import urllib.error
+import urllib.request
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from langcodes import Language
+
+# Matroska element ids
+EBML_HEADER = 0x1A45DFA3
+SEGMENT = 0x18538067
+SEEK_HEAD = 0x114D9B74
+SEEK = 0x4DBB
+SEEK_ID = 0x53AB
+SEEK_POSITION = 0x53AC
+INFO = 0x1549A966
+TIMECODE_SCALE = 0x2AD7B1
+TRACKS = 0x1654AE6B
+TRACK_ENTRY = 0xAE
+TRACK_NUMBER = 0xD7
+TRACK_UID = 0x73C5
+TRACK_TYPE = 0x83
+TRACK_NAME = 0x536E
+TRACK_LANGUAGE = 0x22B59C
+TRACK_LANGUAGE_IETF = 0x22B59D
+CODEC_ID = 0x86
+CODEC_PRIVATE = 0x63A2
+FLAG_DEFAULT = 0x88
+FLAG_FORCED = 0x55AA
+CLUSTER = 0x1F43B675
+CLUSTER_TIMECODE = 0xE7
+SIMPLE_BLOCK = 0xA3
+BLOCK_GROUP = 0xA0
+BLOCK = 0xA1
+BLOCK_DURATION = 0x9B
+CUES = 0x1C53BB6B
+CUE_POINT = 0xBB
+CUE_TRACK_POSITIONS = 0xB7
+CUE_TRACK = 0xF7
+CUE_CLUSTER_POSITION = 0xF1
+TAGS = 0x1254C367
+TAG = 0x7373
+TARGETS = 0x63C0
+TAG_TRACK_UID = 0x63C5
+SIMPLE_TAG = 0x67C8
+TAG_NAME = 0x45A3
+TAG_STRING = 0x4487
+
+# The statistics tags mkvmerge writes for each track, by the property name mkvmerge -J uses
+statistics_tags = {
+    "NUMBER_OF_FRAMES": "tag_number_of_frames",
+    "NUMBER_OF_BYTES": "tag_number_of_bytes",
+}
+
+# The Matroska track types, as mkvmerge names them
+track_types = {1: "video", 2: "audio", 0x11: "subtitles"}
+
+# The codec names mkvmerge reports for the common codec ids, others keep their codec id
+codec_names = {
+    "V_MPEG4/ISO/AVC": "AVC/H.264/MPEG-4p10",
+    "V_MPEGH/ISO/HEVC": "HEVC/H.265/MPEG-H",
+    "V_AV1": "AV1",
+    "V_VP9": "VP9",
+    "A_AAC": "AAC",
+    "A_AC3": "AC-3",
+    "A_EAC3": "E-AC-3",
+    "A_DTS": "DTS",
+    "A_TRUEHD": "TrueHD",
+    "A_FLAC": "FLAC",
+    "A_OPUS": "Opus",
+    "A_VORBIS": "Vorbis",
+    "S_TEXT/UTF8": "SubRip/SRT",
+    "S_TEXT/SSA": "SubStationAlpha",
+    "S_TEXT/ASS": "SubStationAlpha",
+    "S_HDMV/PGS": "HDMV PGS",
+    "S_VOBSUB": "VobSub",
+    "S_TEXT/WEBVTT": "WebVTT",
+}
+
+# The subtitle codec ids the reader can demux
+demuxable_codec_ids = ["S_TEXT/UTF8", "S_TEXT/SSA", "S_TEXT/ASS", "S_HDMV/PGS"]
+
+# The events section written when an ASS track's header doesn't have one
+ass_events_header = (
+    "[Events]\nFormat: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+)
+
+# The PGS timestamp clock rate
+PGS_CLOCK_RATE = 90000
+
+
+# Checks if the path is a remote http(s) url
+def is_remote_path(path):
+    return bool(re.match(r"^https?://", str(path), re.IGNORECASE))
+
+
+# Random access to the bytes of a file, wherever it lives
+class FileSource(ABC):
+    name = ""
+    size = 0
+    # Changes when the file does (an ETag or modification time), if known
+    validator = None
+
+    # Returns up to length bytes from the offset
+    @abstractmethod
+    def read(self, offset, length):
+        pass
+
+    # Hints that the (offset, length) ranges are about to be read
+    def prefetch(self, ranges):
+        pass
+
+    def close(self):
+        pass
+
+    def stats(self):
+        return {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# A local file, memory mapped so reads only touch the pages they need
+class LocalFileSource(FileSource):
+    def __init__(self, path):
+        self.name = path
+        self.handle = open(path, "rb")
+        stat = os.fstat(self.handle.fileno())
+        self.size = stat.st_size
+        self.validator = str(stat.st_mtime_ns)
+        # an empty file can't be mapped
+        self.map = (
+            mmap.mmap(self.handle.fileno(), 0, access=mmap.ACCESS_READ)
+            if self.size
+            else None
+        )
+        self.bytes_read = 0
+
+    def read(self, offset, length):
+        if not self.map or length <= 0:
+            return b""
+        data = self.map[offset : offset + length]
+        self.bytes_read += len(data)
+        return data
+
+    def close(self):
+        if self.map:
+            self.map.close()
+        self.handle.close()
+
+    def stats(self):
+        return {"bytes_read": self.bytes_read}
+
+
+# A remote file read with HTTP Range requests, in fixed size blocks kept in an LRU cache.
+# Missing blocks a few apart are fetched together in one request, and sequential
+# reads fetch the following blocks ahead of time.
+class HttpRangeSource(FileSource):
+    def __init__(
+        self,
+        url,
+        block_size=262144,
+        cache_blocks=64,
+        read_ahead_blocks=4,
+        max_gap_blocks=1,
+        timeout=30,
+    ):
+        self.name = url
+        self.url = url
+        self.block_size = max(int(block_size), 4096)
+        self.cache_blocks = max(int(cache_blocks), 1)
+        self.read_ahead_blocks = max(int(read_ahead_blocks), 0)
+        self.max_gap_blocks = max(int(max_gap_blocks), 0)
+        self.timeout = timeout
+        self.blocks = OrderedDict()
+        self.lock = threading.Lock()
+        self.last_block = None
+        self.requests = 0
+        self.bytes_fetched = 0
+        self.bytes_read = 0
+        self.size, self.validator = self.read_size()
+        self.block_count = -(-self.size // self.block_size)
+
+    # Returns the size and validator of the file, from a HEAD request or,
+    # for servers that don't answer those, a one byte range request
+    def read_size(self):
+        try:
+            request = urllib.request.Request(self.url, method="HEAD")
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                self.requests += 1
+                size = response.headers.get("Content-Length")
+                if size is not None:
+                    return int(size), self.get_validator(response)
+        except urllib.error.HTTPError as e:
+            if e.code not in [403, 405, 501]:
+                raise
+
+        request = urllib.request.Request(self.url, headers={"Range": "bytes=0-0"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            self.requests += 1
+            content_range = response.headers.get("Content-Range", "")
+            if response.status != 206 or "/" not in content_range:
+                raise ValueError(f"Server doesn't support range requests: {self.url}")
+            return int(content_range.rsplit("/", 1)[1]), self.get_validator(response)
+
+    @staticmethod
+    def get_validator(response):
+        return response.headers.get("ETag") or response.headers.get("Last-Modified")
+
+    # Fetches the bytes from start to end (inclusive) with one range request
+    def fetch_range(self, start, end):
+        request = urllib.request.Request(
+            self.url, headers={"Range": f"bytes={start}-{end}"}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if response.status != 206:
+                raise ValueError(f"Server doesn't support range requests: {self.url}")
+            data = response.read()
+        self.requests += 1
+        self.bytes_fetched += len(data)
+        return data
+
+    # Fetches the missing blocks, coalescing blocks at most max_gap_blocks apart
+    # into one request, returns them by index
+    def fetch_blocks(self, indexes):
+        fetched = {}
+        runs = []
+        for index in sorted(set(indexes)):
+            if runs and index - runs[-1][1] <= self.max_gap_blocks + 1:
+                runs[-1][1] = index
+            else:
+                runs.append([index, index])
+
+        for first, last in runs:
+            start = first * self.block_size
+            end = min((last + 1) * self.block_size, self.size) - 1
+            data = self.fetch_range(start, end)
+            for index in range(first, last + 1):
+                offset = (index - first) * self.block_size
+                fetched[index] = data[offset : offset + self.block_size]
+        return fetched
+
+    # Returns the blocks by index, from the cache or fetched along with the read-ahead
+    def get_blocks(self, indexes, read_ahead=0):
+        with self.lock:
+            blocks = {}
+            missing = []
+            for index in indexes:
+                if index in self.blocks:
+                    self.blocks.move_to_end(index)
+                    blocks[index] = self.blocks[index]
+                else:
+                    missing.append(index)
+
+            if missing:
+                last = max(indexes)
+                missing += [
+                    index
+                    for index in range(last + 1, min(last + 1 + read_ahead, self.block_count))
+                    if index not in self.blocks
+                ]
+                for index, data in self.fetch_blocks(missing).items():
+                    if index in indexes:
+                        blocks[index] = data
+                    self.blocks[index] = data
+                    self.blocks.move_to_end(index)
+                while len(self.blocks) > self.cache_blocks:
+                    self.blocks.popitem(last=False)
+            return blocks
+
+    def read(self, offset, length):
+        length = min(length, self.size - offset)
+        if offset < 0 or length <= 0:
+            return b""
+        first = offset // self.block_size
+        last = (offset + length - 1) // self.block_size
+
+        # only read ahead when continuing from the previous read
+        sequential = self.last_block is not None and first in [
+            self.last_block,
+            self.last_block + 1,
+        ]
+        self.last_block = last
+        blocks = self.get_blocks(
+            list(range(first, last + 1)),
+            self.read_ahead_blocks if sequential else 0,
+        )
+
+        data = b"".join(blocks[index] for index in range(first, last + 1))
+        start = offset - first * self.block_size
+        self.bytes_read += length
+        return data[start : start + length]
+
+    # Fetches the blocks of all the ranges at once, so nearby ranges share requests
+    def prefetch(self, ranges):
+        indexes = set()
+        for offset, length in ranges:
+            length = min(length, self.size - offset)
+            if length <= 0:
+                continue
+            first = offset // self.block_size
+            last = (offset + length - 1) // self.block_size
+            indexes.update(range(first, last + 1))
+        # more blocks than the cache holds would only evict each other
+        indexes = sorted(indexes)[: self.cache_blocks]
+        if indexes:
+            self.get_blocks(indexes)
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "bytes_fetched": self.bytes_fetched,
+            "bytes_read": self.bytes_read,
+        }
+
+
+# Opens the file source of the path: remote http(s) urls are read with range requests,
+# anything else is a local file
+def open_file_source(path, block_size=262144, cache_blocks=64, read_ahead_blocks=4):
+    if is_remote_path(path):
+        return HttpRangeSource(path, block_size, cache_blocks, read_ahead_blocks)
+    return LocalFileSource(path)
+
+
+# Reads an EBML variable length integer from the bytes,
+# returns its value (None for the reserved unknown size) and length
+def read_vint(data, position, keep_marker=False):
+    first = data[position]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        mask >>= 1
+        length += 1
+    if length > 8:
+        raise ValueError(f"Invalid EBML integer at {position}")
+
+    value = first if keep_marker else first & (mask - 1)
+    for byte in data[position + 1 : position + length]:
+        value = (value << 8) | byte
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        return None, length
+    return value, length
+
+
+# Reads the element header from the bytes, returns its id, data position and size
+def read_element_header(data, position):
+    element_id, id_length = read_vint(data, position, keep_marker=True)
+    size, size_length = read_vint(data, position + id_length)
+    return element_id, position + id_length + size_length, size
+
+
+# Yields the id, data position and size of the child elements in the bytes
+def iter_children(data, start=0, end=None):
+    end = len(data) if end is None else end
+    position = start
+    while position < end:
+        element_id, data_start, size = read_element_header(data, position)
+        if size is None:
+            size = end - data_start
+        yield element_id, data_start, size
+        position = data_start + size
+
+
+# Yields the id, offset, data offset and size of the elements in the file between the offsets
+def iter_source_elements(source, start, end):
+    offset = start
+    while offset < end:
+        header = source.read(offset, 12)
+        if len(header) < 2:
+            break
+        element_id, data_start, size = read_element_header(header, 0)
+        if size is None:
+            size = end - offset - data_start
+        yield element_id, offset, offset + data_start, size
+        offset += data_start + size
+
+
+def read_uint(data):
+    return int.from_bytes(data, "big")
+
+
+def read_string(data):
+    return bytes(data).rstrip(b"\0").decode("utf-8", errors="replace")
+
+
+# Returns the ISO 639-2 code of the IETF language tag, as mkvmerge reports it when a
+# track has both, or the legacy code when the tag has none
+def get_legacy_language(language_ietf, legacy_language):
+    try:
+        return Language.get(language_ietf).to_alpha3(variant="B")
+    except (LookupError, ValueError):
+        return legacy_language
+
+
+# A minimal Matroska reader, enough for the track headers and the blocks of a subtitle track.
+# The SeekHead is used to find the Tracks and Cues without reading the clusters before them.
+class MatroskaReader:
+    def __init__(self, source):
+        self.source = source
+        self.timecode_scale = 1000000
+        self.positions = {}
+        self.first_cluster = None
+
+        header = source.read(0, 12)
+        if len(header) < 4 or read_element_header(header, 0)[0] != EBML_HEADER:
+            raise ValueError(f"Not a Matroska file: {source.name}")
+        _, data_start, size = read_element_header(header, 0)
+
+        self.segment_start = None
+        for element_id, _, offset, size in iter_source_elements(
+            source, data_start + size, source.size
+        ):
+            if element_id == SEGMENT:
+                self.segment_start = offset
+                self.segment_end = min(offset + size, source.size)
+                break
+        if self.segment_start is None:
+            raise ValueError(f"No Matroska segment found: {source.name}")
+
+        self.read_positions()
+        if INFO in self.positions:
+            info = self.read_element(self.positions[INFO])
+            for element_id, position, size in iter_children(info):
+                if element_id == TIMECODE_SCALE:
+                    self.timecode_scale = read_uint(info[position : position + size])
+
+    # Finds the offsets of the top level elements through the SeekHead,
+    # scanning the elements before the first cluster for any it doesn't list
+    def read_positions(self):
+        for element_id, offset, data_offset, size in iter_source_elements(
+            self.source, self.segment_start, self.segment_end
+        ):
+            if element_id == SEEK_HEAD:
+                seek_head = self.source.read(data_offset, size)
+                for child_id, position, child_size in iter_children(seek_head):
+                    if child_id != SEEK:
+                        continue
+                    seek_id = None
+                    seek_position = None
+                    for entry_id, entry_position, entry_size in iter_children(
+                        seek_head, position, position + child_size
+                    ):
+                        value = seek_head[entry_position : entry_position + entry_size]
+                        if entry_id == SEEK_ID:
+                            seek_id = read_uint(value)
+                        elif entry_id == SEEK_POSITION:
+                            seek_position = self.segment_start + read_uint(value)
+                    if seek_id and seek_position is not None:
+                        self.positions.setdefault(seek_id, seek_position)
+            elif element_id == CLUSTER:
+                self.first_cluster = offset
+                break
+            else:
+                self.positions.setdefault(element_id, offset)
+
+            if TRACKS in self.positions and INFO in self.positions:
+                break
+
+    # Returns the data of the element starting at the offset
+    def read_element(self, offset):
+        header = self.source.read(offset, 12)
+        _, data_start, size = read_element_header(header, 0)
+        if size is None:
+            size = self.segment_end - offset - data_start
+        return self.source.read(offset + data_start, size)
+
+    # Returns the tracks in the shape of mkvmerge -J, ids in file order
+    def read_tracks(self):
+        if TRACKS not in self.positions:
+            raise ValueError(f"No tracks found: {self.source.name}")
+        data = self.read_element(self.positions[TRACKS])
+        track_tags = self.read_statistics_tags()
+
+        tracks = []
+        for element_id, position, size in iter_children(data):
+            if element_id != TRACK_ENTRY:
+                continue
+            entry = {"language": "eng", "default_track": True, "forced_track": False}
+            for child_id, child_position, child_size in iter_children(
+                data, position, position + size
+            ):
+                value = data[child_position : child_position + child_size]
+                if child_id == TRACK_NUMBER:
+                    entry["number"] = read_uint(value)
+                elif child_id == TRACK_UID:
+                    entry["uid"] = read_uint(value)
+                elif child_id == TRACK_TYPE:
+                    entry["type"] = track_types.get(read_uint(value), "other")
+                elif child_id == CODEC_ID:
+                    entry["codec_id"] = read_string(value)
+                elif child_id == CODEC_PRIVATE:
+                    entry["codec_private"] = bytes(value)
+                elif child_id == TRACK_NAME:
+                    entry["track_name"] = read_string(value)
+                elif child_id == TRACK_LANGUAGE:
+                    entry["language"] = read_string(value)
+                elif child_id == TRACK_LANGUAGE_IETF:
+                    entry["language_ietf"] = read_string(value)
+                elif child_id == FLAG_DEFAULT:
+                    entry["default_track"] = bool(read_uint(value))
+                elif child_id == FLAG_FORCED:
+                    entry["forced_track"] = bool(read_uint(value))
+
+            entry.update(track_tags.get(entry.get("uid"), {}))
+            if entry.get("language_ietf"):
+                entry["language"] = get_legacy_language(
+                    entry["language_ietf"], entry["language"]
+                )
+            codec_id = entry.get("codec_id", "")
+            tracks.append(
+                {
+                    "id": len(tracks),
+                    "type": entry.get("type", "other"),
+                    "codec": codec_names.get(codec_id, codec_id),
+                    "codec_id": codec_id,
+                    "codec_private": entry.get("codec_private", b""),
+                    "properties": {
+                        name: entry[name]
+                        for name in [
+                            "number",
+                            "track_name",
+                            "language",
+                            "language_ietf",
+                            "default_track",
+                            "forced_track",
+                            *statistics_tags.values(),
+                        ]
+                        if name in entry
+                    },
+                }
+            )
+        return tracks
+
+    # Returns the statistics tags of each track by its uid, in the shape of mkvmerge -J
+    def read_statistics_tags(self):
+        if TAGS not in self.positions:
+            return {}
+        data = self.read_element(self.positions[TAGS])
+
+        track_tags = {}
+        for element_id, position, size in iter_children(data):
+            if element_id != TAG:
+                continue
+            track_uid = None
+            values = {}
+            for child_id, child_position, child_size in iter_children(
+                data, position, position + size
+            ):
+                if child_id == TARGETS:
+                    for target_id, target_position, target_size in iter_children(
+                        data, child_position, child_position + child_size
+                    ):
+                        if target_id == TAG_TRACK_UID:
+                            track_uid = read_uint(
+                                data[target_position : target_position + target_size]
+                            )
+                elif child_id == SIMPLE_TAG:
+                    name = None
+                    value = None
+                    for tag_id, tag_position, tag_size in iter_children(
+                        data, child_position, child_position + child_size
+                    ):
+                        if tag_id == TAG_NAME:
+                            name = read_string(data[tag_position : tag_position + tag_size])
+                        elif tag_id == TAG_STRING:
+                            value = read_string(data[tag_position : tag_position + tag_size])
+                    if name in statistics_tags and value is not None:
+                        values[statistics_tags[name]] = value
+            if track_uid is not None and values:
+                track_tags.setdefault(track_uid, {}).update(values)
+        return track_tags
+
+    # Returns the offsets of the clusters the Cues list for the track number, in file order
+    def read_cue_clusters(self, track_number):
+        if CUES not in self.positions:
+            return []
+        data = self.read_element(self.positions[CUES])
+
+        clusters = set()
+        for element_id, position, size in iter_children(data):
+            if element_id != CUE_POINT:
+                continue
+            for child_id, child_position, child_size in iter_children(
+                data, position, position + size
+            ):
+                if child_id != CUE_TRACK_POSITIONS:
+                    continue
+                cue_track = None
+                cluster_position = None
+                for entry_id, entry_position, entry_size in iter_children(
+                    data, child_position, child_position + child_size
+                ):
+                    value = data[entry_position : entry_position + entry_size]
+                    if entry_id == CUE_TRACK:
+                        cue_track = read_uint(value)
+                    elif entry_id == CUE_CLUSTER_POSITION:
+                        cluster_position = read_uint(value)
+                if cue_track == track_number and cluster_position is not None:
+                    clusters.add(self.segment_start + cluster_position)
+        return sorted(clusters)
+
+    # Yields the offset of every cluster, in file order
+    def iter_cluster_offsets(self):
+        if self.first_cluster is not None:
+            start = self.first_cluster
+        else:
+            start = self.segment_start
+        for element_id, offset, _, _ in iter_source_elements(
+            self.source, start, self.segment_end
+        ):
+            if element_id == CLUSTER:
+                yield offset
+
+    # Returns the (start ms, duration ms, payload) of the track's blocks in the cluster
+    def read_cluster_blocks(self, offset, track_number):
+        data = self.read_element(offset)
+        cluster_timecode = 0
+        blocks = []
+        for element_id, position, size in iter_children(data):
+            if element_id == CLUSTER_TIMECODE:
+                cluster_timecode = read_uint(data[position : position + size])
+            elif element_id == SIMPLE_BLOCK:
+                block = self.read_block(data[position : position + size], track_number)
+                if block:
+                    blocks.append((cluster_timecode + block[0], None, block[1]))
+            elif element_id == BLOCK_GROUP:
+                block = None
+                duration = None
+                for child_id, child_position, child_size in iter_children(
+                    data, position, position + size
+                ):
+                    value = data[child_position : child_position + child_size]
+                    if child_id == BLOCK:
+                        block = self.read_block(value, track_number)
+                    elif child_id == BLOCK_DURATION:
+                        duration = read_uint(value)
+                if block:
+                    blocks.append((cluster_timecode + block[0], duration, block[1]))
+
+        scale = self.timecode_scale / 1000000
+        return [
+            (
+                timecode * scale,
+                duration * scale if duration is not None else None,
+                payload,
+            )
+            for timecode, duration, payload in blocks
+        ]
+
+    # Returns the relative timecode and payload of the block if it belongs to the track.
+    # Subtitle blocks aren't laced, laced blocks are skipped.
+    @staticmethod
+    def read_block(data, track_number):
+        block_track, length = read_vint(data, 0)
+        if block_track != track_number:
+            return None
+        timecode = int.from_bytes(data[length : length + 2], "big", signed=True)
+        flags = data[length + 2]
+        if flags & 0x06:
+            return None
+        return timecode, bytes(data[length + 3 :])
+
+    # Returns the (start ms, duration ms, payload) blocks of the track. When sampling, only
+    # that many clusters are read, spread across the ones the Cues list for the track.
+    # Without Cues every cluster's header is read to find them.
+    def read_track_blocks(self, track_number, sample_clusters=0):
+        all_offsets = self.read_cue_clusters(track_number)
+        if not all_offsets:
+            all_offsets = list(self.iter_cluster_offsets())
+        indexes = range(len(all_offsets))
+        if sample_clusters and len(all_offsets) > sample_clusters:
+            step = len(all_offsets) / sample_clusters
+            indexes = [int(i * step) for i in range(sample_clusters)]
+        cluster_offsets = [all_offsets[i] for i in indexes]
+
+        # fetch the sampled clusters in as few requests as possible,
+        # each one ends before the next cluster starts
+        self.source.prefetch(
+            [
+                (all_offsets[i], all_offsets[i + 1] - all_offsets[i])
+                if i + 1 < len(all_offsets)
+                else (all_offsets[i], 12)
+                for i in indexes
+            ]
+        )
+
+        blocks = []
+        for offset in cluster_offsets:
+            blocks.extend(self.read_cluster_blocks(offset, track_number))
+        blocks.sort(key=lambda block: block[0])
+
+        # blocks without a duration last until the next one
+        return [
+            (
+                start,
+                duration
+                if duration is not None
+                else (blocks[i + 1][0] - start if i + 1 < len(blocks) else 2000),
+                payload,
+            )
+            for i, (start, duration, payload) in enumerate(blocks)
+        ]
+
+
+# Formats the milliseconds as an SRT timestamp, EX: 00:01:02,345
+def format_srt_timestamp(milliseconds):
+    milliseconds = int(round(milliseconds))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
+
+
+# Formats the milliseconds as an ASS timestamp, EX: 0:01:02.34
+def format_ass_timestamp(milliseconds):
+    centiseconds = int(round(milliseconds / 10))
+    hours, centiseconds = divmod(centiseconds, 360000)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    seconds, centiseconds = divmod(centiseconds, 100)
+    return f"{hours}:{minutes:02d}:{seconds:02d}.{centiseconds:02d}"
+
+
+def write_srt(output_file, blocks):
+    with open(output_file, "w", encoding="utf-8") as f:
+        for number, (start, duration, payload) in enumerate(blocks, 1):
+            text = read_string(payload).strip()
+            f.write(
+                f"{number}\n{format_srt_timestamp(start)} --> "
+                f"{format_srt_timestamp(start + duration)}\n{text}\n\n"
+            )
+
+
+# Writes the ASS/SSA track: its header from the codec private data, and a Dialogue
+# event for each block (ReadOrder, Layer, Style, Name, MarginL, MarginR, MarginV, Effect, Text)
+def write_ass(output_file, codec_private, blocks):
+    header = read_string(codec_private).replace("\r\n", "\n").rstrip("\n") + "\n"
+    if "[Events]" not in header:
+        header += "\n" + ass_events_header
+
+    events = []
+    for start, duration, payload in blocks:
+        fields = read_string(payload).split(",", 8)
+        if len(fields) < 9:
+            continue
+        read_order = int(fields[0]) if fields[0].strip().isdigit() else len(events)
+        events.append(
+            (
+                read_order,
+                f"Dialogue: {fields[1]},{format_ass_timestamp(start)},"
+                f"{format_ass_timestamp(start + duration)},{','.join(fields[2:])}",
+            )
+        )
+    events.sort()
+
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.write(header)
+        for _, event in events:
+            f.write(event + "\n")
+
+
+# Writes the PGS track as a .sup file, each block's segments prefixed with
+# the "PG" magic and the block's timestamp
+def write_sup(output_file, blocks):
+    with open(output_file, "wb") as f:
+        for start, _, payload in blocks:
+            timestamp = int(start * PGS_CLOCK_RATE / 1000).to_bytes(4, "big")
+            position = 0
+            while position + 3 <= len(payload):
+                segment_size = int.from_bytes(payload[position + 1 : position + 3], "big")
+                f.write(b"PG" + timestamp + bytes(4))
+                f.write(payload[position : position + 3 + segment_size])
+                position += 3 + segment_size
+
+
+# Demuxes the subtitle track (by mkvmerge track id) to the output file, reading
+# only a sample of its clusters when sample_clusters is set. Returns the blocks written.
+def extract_track(source, track_id, output_file, sample_clusters=0):
+    reader = MatroskaReader(source)
+    tracks = reader.read_tracks()
+    if not 0 <= track_id < len(tracks):
+        raise ValueError(f"No track {track_id} in: {source.name}")
+    track = tracks[track_id]
+    if track["codec_id"] not in demuxable_codec_ids:
+        raise ValueError(f"Can't demux {track['codec_id']} tracks")
+
+    blocks = reader.read_track_blocks(track["properties"]["number"], sample_clusters)
+    if track["codec_id"] == "S_TEXT/UTF8":
+        write_srt(output_file, blocks)
+    elif track["codec_id"] == "S_HDMV/PGS":
+        write_sup(output_file, blocks)
+    else:
+        write_ass(output_file, track["codec_private"], blocks)
+    return len(blocks)
+
+
+# Serves the folder over HTTP with support for single byte range requests,
+# for testing the range source against a local server
+class RangeRequestHandler(http.server.SimpleHTTPRequestHandler):
+    def send_head(self):
+        range_header = self.headers.get("Range")
+        match = re.match(r"bytes=(\d*)-(\d*)$", range_header or "")
+        path = self.translate_path(self.path)
+        if not match or not os.path.isfile(path):
+            return super().send_head()
+
+        size = os.path.getsize(path)
+        start = int(match.group(1)) if match.group(1) else max(size - int(match.group(2)), 0)
+        end = int(match.group(2)) if match.group(1) and match.group(2) else size - 1
+        end = min(end, size - 1)
+        if start > end:
+            self.send_error(416)
+            return None
+
+        handle = open(path, "rb")
+        handle.seek(start)
+        self.send_response(206)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        self.range_length = end - start + 1
+        return handle
+
+    def copyfile(self, source, outputfile):
+        length = getattr(self, "range_length", None)
+        if length is None:
+            return super().copyfile(source, outputfile)
+        outputfile.write(source.read(length))
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(
+        description="Reads the tracks and subtitles of local or remote (http range) Matroska files."
+    )
+    commands = p.add_subparsers(dest="command", required=True)
+    tracks_command = commands.add_parser("tracks", help="Print the tracks of the file.")
+    tracks_command.add_argument("input", help="The mkv file path or http(s) url.")
+    extract_command = commands.add_parser(
+        "extract", help="Demux a text or PGS subtitle track."
+    )
+    extract_command.add_argument("input", help="The mkv file path or http(s) url.")
+    extract_command.add_argument("track", type=int, help="The track id, as mkvmerge numbers it.")
+    extract_command.add_argument("output", help="The subtitle file to write.")
+    extract_command.add_argument(
+        "-s",
+        "--samples",
+        type=int,
+        default=0,
+        help="The clusters to sample through the Cues, 0 for all.",
+    )
+    serve_command = commands.add_parser(
+        "serve", help="Serve a folder with range request support, for testing."
+    )
+    serve_command.add_argument("folder", help="The folder to serve.")
+    serve_command.add_argument("-p", "--port", type=int, default=8000)
+    args = p.parse_args()
+
+    if args.command == "serve":
+        handler = functools.partial(RangeRequestHandler, directory=args.folder)
+        server = http.server.ThreadingHTTPServer(("", args.port), handler)
+        print(f"Serving {args.folder} on port {args.port}")
+        server.serve_forever()
+    elif args.command == "tracks":
+        with open_file_source(args.input) as source:
+            tracks = MatroskaReader(source).read_tracks()
+            for track in tracks:
+                track.pop("codec_private")
+            print(json.dumps(tracks, indent=1))
+            print(f"Source: {source.stats()}")
+    else:
+        with open_file_source(args.input) as source:
+            count = extract_track(source, args.track, args.output, args.samples)
+            print(f"Wrote {count} blocks to {args.output}")
+            print(f"Source: {source.stats()}")
@@ -0,0 +1,614 @@
+import argparse
+import os
+import re
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# HDMV PGS segment types
+PGS_PALETTE_SEGMENT = 0x14
+PGS_OBJECT_SEGMENT = 0x15
+PGS_COMPOSITION_SEGMENT = 0x16
+PGS_END_SEGMENT = 0x80
+
+# The PGS timestamp clock rate
+PGS_CLOCK_RATE = 90000
+
+# The blank border added around each bitmap, Tesseract struggles with text touching the edge
+image_border = 10
+
+# The image subtitle extensions, as written by mkvextract
+pgs_extensions = ["pgs", "sup"]
+vobsub_extensions = ["sub", "idx"]
+
+
+# A decoded-on-demand bitmap shown at a point in the track
+class DisplaySet:
+    def __init__(self, start, objects, luma, alpha):
+        self.start = start
+        self.end = None
+        # (decode function, decode arguments, x, y) for each object
+        self.objects = objects
+        self.luma = luma
+        self.alpha = alpha
+
+    # Decodes the objects and composes them onto a single grayscale image,
+    # dark text on a white background
+    def render(self):
+        decoded = []
+        for decode, arguments, x, y in self.objects:
+            indices = decode(*arguments)
+            if indices.size:
+                decoded.append((indices, x, y))
+        if not decoded:
+            return None
+
+        left = min(x for _, x, _ in decoded)
+        top = min(y for _, _, y in decoded)
+        right = max(x + indices.shape[1] for indices, x, _ in decoded)
+        bottom = max(y + indices.shape[0] for indices, _, y in decoded)
+
+        ink = np.zeros((bottom - top, right - left), dtype=np.float32)
+        for indices, x, y in decoded:
+            height, width = indices.shape
+            ink[y - top : y - top + height, x - left : x - left + width] = (
+                self.luma[indices] * self.alpha[indices] / 255.0
+            )
+
+        image = np.full(
+            (ink.shape[0] + image_border * 2, ink.shape[1] + image_border * 2),
+            255,
+            dtype=np.uint8,
+        )
+        image[
+            image_border : image_border + ink.shape[0],
+            image_border : image_border + ink.shape[1],
+        ] = (255 - ink).clip(0, 255).astype(np.uint8)
+        return image
+
+
+# Decodes a PGS object's run-length encoded bitmap into palette indices
+def decode_pgs_rle(data, width, height):
+    bitmap = np.zeros((height, width), dtype=np.uint8)
+    row = bytearray()
+    y = 0
+    position = 0
+    length = len(data)
+
+    try:
+        while position < length and y < height:
+            value = data[position]
+            position += 1
+            if value:
+                row.append(value)
+                continue
+
+            flags = data[position]
+            position += 1
+            if not flags:
+                row = row[:width]
+                bitmap[y, : len(row)] = np.frombuffer(bytes(row), dtype=np.uint8)
+                row = bytearray()
+                y += 1
+                continue
+
+            run = flags & 0x3F
+            if flags & 0x40:
+                run = (run << 8) | data[position]
+                position += 1
+            color = 0
+            if flags & 0x80:
+                color = data[position]
+                position += 1
+            row.extend(bytes((color,)) * run)
+    except IndexError:
+        raise ValueError("Truncated PGS object data")
+    return bitmap
+
+
+# Returns the luma and alpha lookup tables of a PGS palette definition segment
+def read_pgs_palette(segment):
+    luma = np.zeros(256, dtype=np.float32)
+    alpha = np.zeros(256, dtype=np.float32)
+    for position in range(2, len(segment) - 4, 5):
+        entry = segment[position]
+        luma[entry] = segment[position + 1]
+        alpha[entry] = segment[position + 4]
+    return luma, alpha
+
+
+# Reads the display sets of a PGS (.sup) file, without decoding their bitmaps
+def read_pgs_display_sets(data):
+    display_sets = []
+    palettes = {}
+    objects = {}
+    composition = None
+    last_set = None
+    position = 0
+
+    while position + 13 <= len(data):
+        if data[position : position + 2] != b"PG":
+            raise ValueError(f"Invalid PGS segment at offset {position}")
+        pts = int.from_bytes(data[position + 2 : position + 6], "big")
+        segment_type = data[position + 10]
+        size = int.from_bytes(data[position + 11 : position + 13], "big")
+        segment = data[position + 13 : position + 13 + size]
+        position += 13 + size
+
+        if segment_type == PGS_COMPOSITION_SEGMENT:
+            if len(segment) < 11:
+                continue
+            # Epoch starts reset the objects and palettes
+            if segment[7] & 0x80:
+                palettes.clear()
+                objects.clear()
+            placements = []
+            offset = 11
+            for _ in range(segment[10]):
+                if offset + 8 > len(segment):
+                    break
+                placements.append(
+                    (
+                        int.from_bytes(segment[offset : offset + 2], "big"),
+                        int.from_bytes(segment[offset + 4 : offset + 6], "big"),
+                        int.from_bytes(segment[offset + 6 : offset + 8], "big"),
+                    )
+                )
+                offset += 16 if segment[offset + 3] & 0x80 else 8
+            composition = (pts / PGS_CLOCK_RATE, segment[9], placements)
+
+            # The next composition ends the previous display set
+            if last_set and last_set.end is None:
+                last_set.end = pts / PGS_CLOCK_RATE
+        elif segment_type == PGS_PALETTE_SEGMENT and segment:
+            palettes[segment[0]] = read_pgs_palette(segment)
+        elif segment_type == PGS_OBJECT_SEGMENT and len(segment) >= 4:
+            object_id = int.from_bytes(segment[0:2], "big")
+            if segment[3] & 0x80:
+                if len(segment) < 11:
+                    continue
+                objects[object_id] = (
+                    int.from_bytes(segment[7:9], "big"),
+                    int.from_bytes(segment[9:11], "big"),
+                    bytearray(segment[11:]),
+                )
+            elif object_id in objects:
+                objects[object_id][2].extend(segment[4:])
+        elif segment_type == PGS_END_SEGMENT and composition:
+            start, palette_id, placements = composition
+            composition = None
+            if not placements or palette_id not in palettes:
+                continue
+            if any(object_id not in objects for object_id, _, _ in placements):
+                continue
+            luma, alpha = palettes[palette_id]
+            last_set = DisplaySet(
+                start,
+                [
+                    (
+                        decode_pgs_rle,
+                        (
+                            bytes(objects[object_id][2]),
+                            objects[object_id][0],
+                            objects[object_id][1],
+                        ),
+                        x,
+                        y,
+                    )
+                    for object_id, x, y in placements
+                ],
+                luma,
+                alpha,
+            )
+            display_sets.append(last_set)
+
+    return display_sets
+
+
+# Decodes one interlaced field of a VobSub bitmap into palette indices
+def decode_vobsub_field(data, offset, width, line_count):
+    lines = []
+    position = offset * 2
+
+    # Reads the nibble at the position
+    def nibble(index):
+        value = data[index >> 1]
+        return value & 0x0F if index & 1 else value >> 4
+
+    try:
+        for _ in range(line_count):
+            row = bytearray()
+            while len(row) < width:
+                value = nibble(position)
+                position += 1
+                if value < 0x4:
+                    value = (value << 4) | nibble(position)
+                    position += 1
+                    if value < 0x10:
+                        value = (value << 4) | nibble(position)
+                        position += 1
+                        if value < 0x40:
+                            value = (value << 4) | nibble(position)
+                            position += 1
+                run = value >> 2
+                if not run:
+                    run = width - len(row)
+                row.extend(bytes((value & 0x3,)) * min(run, width - len(row)))
+            # Each line starts on a byte boundary
+            position += position & 1
+            lines.append(row)
+    except IndexError:
+        raise ValueError("Truncated VobSub bitmap data")
+    return lines
+
+
+# Decodes a VobSub subpicture into palette indices
+def decode_vobsub_bitmap(data, top_offset, bottom_offset, width, height):
+    top = decode_vobsub_field(data, top_offset, width, (height + 1) // 2)
+    bottom = decode_vobsub_field(data, bottom_offset, width, height // 2)
+    bitmap = np.zeros((height, width), dtype=np.uint8)
+    for y in range(height):
+        field = top if y % 2 == 0 else bottom
+        bitmap[y] = np.frombuffer(bytes(field[y // 2]), dtype=np.uint8)
+    return bitmap
+
+
+# Parses the control sequences of a VobSub subpicture into a display set
+def read_vobsub_subpicture(data, start, palette):
+    if len(data) < 4:
+        return None
+    control_offset = int.from_bytes(data[2:4], "big")
+    colors = [0, 0, 0, 0]
+    alphas = [0, 0, 0, 0]
+    coordinates = None
+    offsets = None
+    end = None
+    position = control_offset
+
+    while position + 4 <= len(data):
+        delay = int.from_bytes(data[position : position + 2], "big")
+        next_position = int.from_bytes(data[position + 2 : position + 4], "big")
+        index = position + 4
+        while index < len(data):
+            command = data[index]
+            index += 1
+            if command == 0xFF:
+                break
+            elif command == 0x02 and delay:
+                end = start + (delay * 1024) / PGS_CLOCK_RATE
+            elif command == 0x03:
+                colors = [
+                    data[index + 1] & 0x0F,
+                    data[index + 1] >> 4,
+                    data[index] & 0x0F,
+                    data[index] >> 4,
+                ]
+                index += 2
+            elif command == 0x04:
+                alphas = [
+                    (data[index + 1] & 0x0F) * 17,
+                    (data[index + 1] >> 4) * 17,
+                    (data[index] & 0x0F) * 17,
+                    (data[index] >> 4) * 17,
+                ]
+                index += 2
+            elif command == 0x05:
+                coordinates = (
+                    (data[index] << 4) | (data[index + 1] >> 4),
+                    ((data[index + 1] & 0x0F) << 8) | data[index + 2],
+                    (data[index + 3] << 4) | (data[index + 4] >> 4),
+                    ((data[index + 4] & 0x0F) << 8) | data[index + 5],
+                )
+                index += 6
+            elif command == 0x06:
+                offsets = (
+                    int.from_bytes(data[index : index + 2], "big"),
+                    int.from_bytes(data[index + 2 : index + 4], "big"),
+                )
+                index += 4
+            elif command not in (0x00, 0x01, 0x02):
+                break
+        if next_position == position:
+            break
+        position = next_position
+
+    if not coordinates or not offsets:
+        return None
+    x1, x2, y1, y2 = coordinates
+    width, height = x2 - x1 + 1, y2 - y1 + 1
+    if width <= 0 or height <= 0:
+        return None
+
+    luma = np.zeros(4, dtype=np.float32)
+    alpha = np.array(alphas, dtype=np.float32)
+    for value, color in enumerate(colors):
+        red, green, blue = palette[color] if color < len(palette) else (0, 0, 0)
+        luma[value] = 0.299 * red + 0.587 * green + 0.114 * blue
+
+    display_set = DisplaySet(
+        start,
+        [(decode_vobsub_bitmap, (data, *offsets, width, height), x1, y1)],
+        luma,
+        alpha,
+    )
+    display_set.end = end
+    return display_set
+
+
+# Reads the subpicture starting at the position of a VobSub (.sub) MPEG program stream
+def read_vobsub_packet(data, position):
+    subpicture = bytearray()
+    size = None
+
+    while position + 14 <= len(data):
+        if data[position : position + 4] != b"\x00\x00\x01\xba":
+            raise ValueError(f"Invalid VobSub pack header at offset {position}")
+        if data[position + 4] & 0xC0 == 0x40:
+            position += 14 + (data[position + 13] & 0x07)
+        else:
+            position += 12
+
+        if data[position : position + 3] != b"\x00\x00\x01":
+            raise ValueError(f"Invalid VobSub packet at offset {position}")
+        stream_id = data[position + 3]
+        packet_length = int.from_bytes(data[position + 4 : position + 6], "big")
+        packet_end = position + 6 + packet_length
+        if stream_id != 0xBD:
+            position = packet_end
+            continue
+
+        header_length = data[position + 8]
+        # The first payload byte is the subpicture stream id
+        subpicture.extend(data[position + 9 + header_length + 1 : packet_end])
+        position = packet_end
+
+        if size is None and len(subpicture) >= 2:
+            size = int.from_bytes(subpicture[0:2], "big")
+        if size is not None and len(subpicture) >= size:
+            return bytes(subpicture[:size])
+    raise ValueError("Truncated VobSub packet")
+
+
+# Parses a VobSub timestamp, EX: 00:01:02:345
+def parse_vobsub_timestamp(timestamp):
+    hours, minutes, seconds, milliseconds = [int(part) for part in timestamp.split(":")]
+    return hours * 3600 + minutes * 60 + seconds + milliseconds / 1000
+
+
+# Reads the display sets of a VobSub .idx/.sub pair, without decoding their bitmaps
+def read_vobsub_display_sets(idx_file, sub_file):
+    palette = []
+    entries = []
+    with open(idx_file, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if line.startswith("palette:"):
+                for color in line.split(":", 1)[1].split(","):
+                    color = color.strip()
+                    if len(color) == 6:
+                        palette.append(
+                            tuple(int(color[i : i + 2], 16) for i in range(0, 6, 2))
+                        )
+            else:
+                match = re.match(
+                    r"timestamp:\s*(-?[\d:]+),\s*filepos:\s*([0-9a-fA-F]+)", line
+                )
+                if match and not match.group(1).startswith("-"):
+                    entries.append(
+                        (parse_vobsub_timestamp(match.group(1)), int(match.group(2), 16))
+                    )
+
+    with open(sub_file, "rb") as f:
+        data = f.read()
+
+    display_sets = []
+    for start, position in entries:
+        display_set = read_vobsub_subpicture(
+            read_vobsub_packet(data, position), start, palette
+        )
+        if display_set:
+            display_sets.append(display_set)
+    return display_sets
+
+
+# Reads the display sets of an image subtitle file, by extension
+def read_display_sets(input_file):
+    base, extension = os.path.splitext(input_file)
+    extension = extension.strip(".").lower()
+    if extension in pgs_extensions:
+        with open(input_file, "rb") as f:
+            return read_pgs_display_sets(f.read())
+    elif extension in vobsub_extensions:
+        return read_vobsub_display_sets(f"{base}.idx", f"{base}.sub")
+    raise ValueError(f"Unsupported image subtitle format: {extension}")
+
+
+# Returns up to sample_count display sets spread evenly across the track
+def sample_display_sets(display_sets, sample_count):
+    if not sample_count or len(display_sets) <= sample_count:
+        return list(display_sets)
+    step = len(display_sets) / sample_count
+    return [display_sets[int((i + 0.5) * step)] for i in range(sample_count)]
+
+
+# Writes the grayscale image as a binary PGM, which Tesseract reads natively
+def write_pgm(path, image):
+    with open(path, "wb") as f:
+        f.write(f"P5\n{image.shape[1]} {image.shape[0]}\n255\n".encode("ascii"))
+        f.write(image.tobytes())
+
+
+# Returns the languages Tesseract has traineddata for, EX: {"eng", "jpn", "osd"}
+def get_installed_languages(tesseract="tesseract"):
+    result = subprocess.run([tesseract, "--list-langs"], capture_output=True)
+    if result.returncode != 0:
+        return set()
+    # the first line names the tessdata folder
+    lines = result.stdout.decode("utf-8", errors="replace").splitlines()[1:]
+    return {line.strip() for line in lines if line.strip()}
+
+
+# Returns the text and mean word confidence of each page in Tesseract's TSV output,
+# its pages are numbered from 1 in the order of the list file
+def read_tesseract_tsv(output, page_count):
+    words = [[] for _ in range(page_count)]
+    confidences = [[] for _ in range(page_count)]
+    for line in output.splitlines()[1:]:
+        fields = line.split("\t")
+        # level, page, block, paragraph, line, word, left, top, width, height, conf, text
+        if len(fields) < 12 or fields[0] != "5":
+            continue
+        page = int(fields[1]) - 1
+        text = fields[11].strip()
+        if not text or not 0 <= page < page_count:
+            continue
+        words[page].append(text)
+        confidences[page].append(max(float(fields[10]), 0))
+    return [
+        (" ".join(page_words), sum(page_confidences) / len(page_confidences))
+        if page_words
+        else ("", 0)
+        for page_words, page_confidences in zip(words, confidences)
+    ]
+
+
+# OCRs the images in a single Tesseract process,
+# returns the text and mean word confidence of each image
+def run_tesseract(image_paths, list_file, languages, tesseract, wrap_command=None):
+    with open(list_file, "w") as f:
+        f.write("\n".join(image_paths) + "\n")
+
+    command = [tesseract, list_file, "stdout", "-l", languages, "--psm", "6", "tsv"]
+    if wrap_command:
+        command = wrap_command(command)
+    result = subprocess.run(command, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(
+            f"Tesseract failed: {result.stderr.decode('utf-8', errors='replace').strip()}"
+        )
+    return read_tesseract_tsv(
+        result.stdout.decode("utf-8", errors="replace"), len(image_paths)
+    )
+
+
+# Formats seconds as an SRT timestamp
+def format_srt_timestamp(seconds):
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
+
+
+# Writes the recognized lines as an SRT file
+def write_srt(output_file, entries):
+    with open(output_file, "w", encoding="utf-8") as f:
+        for number, (start, end, text) in enumerate(entries, start=1):
+            f.write(
+                f"{number}\n{format_srt_timestamp(start)} --> "
+                f"{format_srt_timestamp(end)}\n{text}\n\n"
+            )
+
+
+# Decodes a sample of the display sets in the image subtitle file, OCRs them
+# in parallel Tesseract processes, and writes the recognized text as an SRT file.
+# Lines Tesseract is less than min_confidence percent sure of are dropped, as text
+# in a script the languages don't cover comes out as confident looking garbage
+# to the language detector. Returns the number of lines written.
+def ocr_image_subtitles(
+    input_file,
+    output_file,
+    sample_count=40,
+    workers=4,
+    languages="eng",
+    tesseract="tesseract",
+    wrap_command=None,
+    min_confidence=0,
+):
+    display_sets = read_display_sets(input_file)
+    if not display_sets:
+        raise ValueError(f"No display sets found in {input_file}")
+    samples = sample_display_sets(display_sets, sample_count)
+
+    output_folder = os.path.dirname(os.path.abspath(output_file))
+    with tempfile.TemporaryDirectory(dir=output_folder) as folder:
+        rendered = []
+        for number, display_set in enumerate(samples):
+            image = display_set.render()
+            if image is None:
+                continue
+            path = os.path.join(folder, f"{number}.pgm")
+            write_pgm(path, image)
+            rendered.append((display_set, path))
+        if not rendered:
+            raise ValueError(f"No bitmaps could be decoded from {input_file}")
+
+        # Contiguous chunks, one Tesseract process each, so each process loads
+        # the language data once
+        workers = max(1, min(workers, len(rendered)))
+        chunk_size = -(-len(rendered) // workers)
+        chunks = [
+            rendered[i : i + chunk_size] for i in range(0, len(rendered), chunk_size)
+        ]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(
+                lambda chunk: run_tesseract(
+                    [path for _, path in chunk[1]],
+                    os.path.join(folder, f"list_{chunk[0]}.txt"),
+                    languages,
+                    tesseract,
+                    wrap_command,
+                ),
+                enumerate(chunks),
+            )
+            texts = [text for chunk_texts in results for text in chunk_texts]
+
+    entries = []
+    for (display_set, _), (text, confidence) in zip(rendered, texts):
+        if text and confidence >= min_confidence:
+            end = display_set.end
+            if end is None or end <= display_set.start:
+                end = display_set.start + 2
+            entries.append((display_set.start, end, text))
+
+    write_srt(output_file, entries)
+    return len(entries)
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(
+        description="OCRs a sample of a PGS (.sup) or VobSub (.idx/.sub) subtitle file with Tesseract."
+    )
+    p.add_argument("input", help="The PGS or VobSub subtitle file.")
+    p.add_argument("output", help="The SRT file to write.")
+    p.add_argument(
+        "-s",
+        "--samples",
+        type=int,
+        default=40,
+        help="The number of display sets to OCR, spread across the track. 0 for all.",
+    )
+    p.add_argument(
+        "-w", "--workers", type=int, default=4, help="The number of Tesseract processes."
+    )
+    p.add_argument(
+        "-l", "--languages", default="eng", help="The Tesseract languages, EX: eng+jpn"
+    )
+    p.add_argument(
+        "-c",
+        "--min-confidence",
+        type=float,
+        default=0,
+        help="The mean word confidence below which a line is dropped, 0 to 100.",
+    )
+    args = p.parse_args()
+    count = ocr_image_subtitles(
+        args.input,
+        args.output,
+        args.samples,
+        args.workers,
+        args.languages,
+        min_confidence=args.min_confidence,
+    )
+    print(f"Wrote {count} lines to {args.output}")
@@ -0,0 +1,290 @@
+import heapq
+import os
+import resource
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+
+# Returns the resident set size of the process in bytes,
+# or its peak where /proc isn't available
+def get_rss():
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+# Returns the resident set size without the memory tracemalloc uses to store its traces,
+# which otherwise grows with every allocation it tracks and swamps the script's own growth
+def get_untraced_rss():
+    return get_rss() - tracemalloc.get_tracemalloc_memory()
+
+
+# Formats the byte count in megabytes, or kilobytes below one, signed when it's a difference
+def format_size(count, signed=False):
+    sign = "+" if signed else ""
+    if abs(count) < 1024**2:
+        return f"{count / 1024:{sign}.1f} KB"
+    return f"{count / 1024**2:{sign}.1f} MB"
+
+
+# Formats the frame as a collapsed stack entry, EX: handle_tracks (script.py:2601)
+def format_frame(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+# The measurements of one processed file
+class FileProfile:
+    def __init__(self, name):
+        self.name = name
+        self.wall_seconds = 0
+        self.samples = 0
+        self.stacks = Counter()
+        self.rss_before = 0
+        self.rss_after = 0
+        self.traced_before = 0
+        self.traced_after = 0
+        # (file:line, size difference, count difference) of the top allocation sites
+        self.allocations = []
+
+    # Returns the functions by their samples on top of the stack, and anywhere in it
+    def get_functions(self):
+        self_samples = Counter()
+        total_samples = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            self_samples[frames[-1]] += count
+            for frame in set(frames):
+                total_samples[frame] += count
+        return self_samples, total_samples
+
+    # Drops the stacks and allocations once the file is no longer among the slowest
+    def trim(self):
+        self.stacks = Counter()
+        self.allocations = []
+
+
+# Profiles each processed file: a SIGPROF sampling CPU profiler over the thread processing
+# it, tracemalloc snapshots before and after it, and the process RSS net of tracemalloc.
+# In the async pipeline the prefetch threads run alongside, their CPU time and allocations
+# are charged to the file on the detection thread.
+# The stacks of every file are appended to a collapsed stack file for flamegraphs,
+# only the slowest files keep theirs in memory for the report.
+class FileProfiler:
+    def __init__(
+        self,
+        collapsed_path,
+        interval=0.005,
+        slowest_count=10,
+        top_entries=10,
+        watched=None,
+        concurrent=False,
+    ):
+        self.collapsed_path = collapsed_path
+        self.interval = interval
+        self.slowest_count = max(int(slowest_count), 1)
+        self.top_entries = top_entries
+        # name -> function returning the size of something that may grow across files
+        self.watched = watched or {}
+        self.watched_start = {}
+        # whether other threads work on upcoming files while one is profiled
+        self.concurrent = concurrent
+        self.current = None
+        self.thread_id = None
+        self.slowest = []
+        self.file_count = 0
+        self.total_seconds = 0
+        self.total_samples = 0
+        # (file number, name, rss after, rss growth) of every file
+        self.rss_history = []
+        self.rss_start = 0
+        self.collapsed = None
+
+    def start(self):
+        folder = os.path.dirname(self.collapsed_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.collapsed = open(self.collapsed_path, "w", encoding="utf-8")
+        self.watched_start = self.read_watched()
+        self.rss_start = get_untraced_rss()
+        tracemalloc.start()
+        signal.signal(signal.SIGPROF, self.sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, signal.SIG_DFL)
+        tracemalloc.stop()
+        if self.collapsed:
+            self.collapsed.close()
+            self.collapsed = None
+
+    def read_watched(self):
+        sizes = {}
+        for name, get_size in self.watched.items():
+            try:
+                sizes[name] = get_size()
+            except Exception:
+                sizes[name] = None
+        return sizes
+
+    # Records the stack of the thread processing the current file.
+    # Signals are handled on the main thread, so the processing thread may be another one.
+    def sample(self, signum, frame):
+        profile = self.current
+        if profile is None:
+            return
+        if self.thread_id != threading.get_ident():
+            frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None:
+            stack.append(format_frame(frame))
+            frame = frame.f_back
+        if stack:
+            profile.stacks[";".join(reversed(stack))] += 1
+            profile.samples += 1
+
+    # Profiles the processing of one file within the block
+    @contextmanager
+    def profile_file(self, name):
+        profile = FileProfile(name)
+        # the before snapshot is alive for both RSS readings, so it isn't counted as growth
+        before = tracemalloc.take_snapshot()
+        profile.rss_before = get_untraced_rss()
+        profile.traced_before = tracemalloc.get_traced_memory()[0]
+
+        self.thread_id = threading.get_ident()
+        self.current = profile
+        started = time.perf_counter()
+        try:
+            yield profile
+        finally:
+            profile.wall_seconds = time.perf_counter() - started
+            self.current = None
+            profile.rss_after = get_untraced_rss()
+            profile.traced_after = tracemalloc.get_traced_memory()[0]
+            after = tracemalloc.take_snapshot()
+            self.record_allocations(profile, before, after)
+            self.finish_file(profile)
+
+    # Keeps the allocation sites that grew the most while processing the file
+    def record_allocations(self, profile, before, after):
+        own_files = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ]
+        differences = after.filter_traces(own_files).compare_to(
+            before.filter_traces(own_files), "lineno"
+        )
+        profile.allocations = [
+            (
+                f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+                stat.size_diff,
+                stat.count_diff,
+            )
+            for stat in differences[: self.top_entries]
+            if stat.size_diff > 0
+        ]
+
+    def finish_file(self, profile):
+        self.file_count += 1
+        self.total_seconds += profile.wall_seconds
+        self.total_samples += profile.samples
+        self.rss_history.append(
+            (
+                self.file_count,
+                profile.name,
+                profile.rss_after,
+                profile.rss_after - profile.rss_before,
+            )
+        )
+
+        if self.collapsed:
+            root = os.path.basename(profile.name).replace(";", ",")
+            for stack, count in profile.stacks.items():
+                self.collapsed.write(f"{root};{stack} {count}\n")
+            self.collapsed.flush()
+
+        entry = (profile.wall_seconds, self.file_count, profile)
+        if len(self.slowest) < self.slowest_count:
+            heapq.heappush(self.slowest, entry)
+        else:
+            _, _, dropped = heapq.heappushpop(self.slowest, entry)
+            dropped.trim()
+
+    # Returns the report lines: totals, RSS growth across the files,
+    # watched sizes, and the hot spots of the slowest files
+    def get_report(self):
+        lines = ["\n\t--- Profile ---"]
+        lines.append(
+            f"\tFiles Profiled: {self.file_count} in {round(self.total_seconds, 2)}s, "
+            f"{self.total_samples} CPU samples every {self.interval * 1000:g}ms"
+        )
+        if not self.file_count:
+            return lines
+        lines.append("\tRSS figures exclude the memory tracemalloc uses for its traces.")
+        if self.concurrent:
+            lines.append(
+                "\tThe prefetch threads' CPU samples and allocations are charged "
+                "to the file on the detection thread."
+            )
+
+        rss_end = self.rss_history[-1][2]
+        lines.append(
+            f"\tRSS: {format_size(self.rss_start)} -> {format_size(rss_end)} "
+            f"({format_size(rss_end - self.rss_start, True)}, "
+            f"{format_size((rss_end - self.rss_start) / self.file_count, True)} per file)"
+        )
+        # the RSS at each tenth of the run shows a steady creep apart from one-off jumps
+        step = max(self.file_count // 10, 1)
+        checkpoints = self.rss_history[step - 1 :: step]
+        lines.append(
+            "\tRSS Over The Run: "
+            + ", ".join(
+                f"#{number} {format_size(rss)}" for number, _, rss, _ in checkpoints
+            )
+        )
+        lines.append("\tLargest RSS Growth:")
+        for number, name, _, growth in sorted(
+            self.rss_history, key=lambda entry: entry[3], reverse=True
+        )[:5]:
+            lines.append(f"\t\t{format_size(growth, True)} #{number} {name}")
+
+        watched_end = self.read_watched()
+        if watched_end:
+            lines.append("\tWatched Sizes:")
+            for name, size in watched_end.items():
+                lines.append(f"\t\t{name}: {self.watched_start.get(name)} -> {size}")
+
+        lines.append(f"\n\tSlowest {len(self.slowest)} Files:")
+        for wall_seconds, _, profile in sorted(self.slowest, reverse=True):
+            lines.append(
+                f"\n\t{profile.name}\n\t\tTime: {round(wall_seconds, 2)}s, "
+                f"CPU: ~{round(profile.samples * self.interval, 2)}s, "
+                f"RSS: {format_size(profile.rss_after - profile.rss_before, True)}, "
+                f"Traced: {format_size(profile.traced_after - profile.traced_before, True)}"
+            )
+            self_samples, total_samples = profile.get_functions()
+            if self_samples:
+                lines.append("\t\tTop Functions (self / total samples):")
+                for function, count in self_samples.most_common(self.top_entries):
+                    lines.append(
+                        f"\t\t\t{count} / {total_samples[function]} {function}"
+                    )
+            if profile.allocations:
+                lines.append("\t\tTop Allocation Sites:")
+                for site, size, count in profile.allocations:
+                    lines.append(
+                        f"\t\t\t{format_size(size, True)} ({count:+d} blocks) {site}"
+                    )
+        lines.append(f"\n\tCollapsed Stacks: {self.collapsed_path}")
+        return lines
@@ -1,6 +1,16 @@
 # The name of the fasttext model in the root of the script folder
 fasttext_model_name = "lid.176.ftz"
 
+# The language detector backend, see detectors.py:
+# "fasttext" uses the fasttext_model_name model above (the full lid.176.bin or the quantized lid.176.ftz),
+# "ngram" uses naive Bayes character n-gram profiles, built from the fasttext model on first use.
+# It doesn't need fasttext to predict, but it's slower and less accurate than fasttext.
+# Compare them on your own subtitles with evaluate_detectors.py.
+detector_backend = "fasttext"
+
+# The n-gram profiles used by the ngram backend, in the root of the script folder
+ngram_profile_name = "ngram_profiles.npz"
+
 # Folder names to ignore when recursively scanning a path
 ignored_folder_names = []
 
@@ -23,3 +33,285 @@ audio_languages_to_check = [
     "zxx",
     "und",
 ]
+
+# Whether or not to run the Unicode script pre-classifier before FastText.
+# Tracks dominated by a single non-Latin script (kana, hangul, Han, Cyrillic,
+# Greek, Arabic, Hebrew) are decided from a script histogram alone.
+script_detection_enabled = True
+
+# The percentage of letters that must belong to one script for the
+# pre-classifier to decide the track without FastText.
+script_detection_threshold = 85
+
+# The minimum number of letters a track needs before its script histogram is trusted.
+script_detection_min_letters = 50
+
+# The minimum percentage of a CJK track's Han and kana letters that must be kana
+# for it to be Japanese rather than Chinese.
+script_detection_min_kana_percent = 10
+
+# Whether or not to infer track languages across a season folder.
+# Files sharing a release group and an identical track layout are clustered,
+# a small sample of each cluster goes through full detection, and if the
+# sample agrees, its decisions are applied to the rest of the cluster.
+season_layout_inference = True
+
+# The number of files per layout cluster that go through full detection.
+layout_sample_size = 2
+
+# Whether or not to overlap extraction, detection and writes with asyncio.
+# The next files' subtitle tracks are extracted and converted while the
+# current file is being detected, and mkvpropedit writes run in the background.
+async_pipeline = False
+
+# The concurrency limits per resource class for the asyncio pipeline.
+# disk: mkvextract/mkvpropedit, ocr: SubtitleEdit conversions,
+# cpu: subtitle parsing done ahead of detection.
+async_pipeline_limits = {
+    "disk": 2,
+    "ocr": 1,
+    "cpu": 1,
+}
+
+# The number of upcoming files to prefetch while the current one is detected.
+async_prefetch_depth = 1
+
+# The number of completed files to buffer before the run journal is fsynced.
+# Unsynced files are simply processed again when a run is resumed.
+journal_fsync_batch = 10
+
+# Whether or not to guard mkvpropedit with advisory lock files next to each video,
+# so several hosts scanning the same share never edit the same file at once.
+# Always enabled when scanning a shard with --shard.
+lock_files_enabled = False
+
+# The seconds to wait for another host's lock before skipping the edit.
+lock_wait_seconds = 60
+
+# The minutes after which a lock file left behind by a crashed host is stale.
+lock_stale_minutes = 30
+
+# The minimum number of lines a comparison track must share with the original track
+# for it to be extracted and compared. Tracks with fewer subtitle events in their
+# header statistics, or already extracted tracks sharing fewer lines (counted from
+# their cached line hashes), are skipped.
+comparison_min_shared_lines = 2
+
+# Whether or not to throttle the spawned tools, so scans can run while
+# the same machine is serving playback.
+resource_governor_enabled = False
+
+# The ionice class (2 best-effort, 3 idle) and nice level given to spawned tools.
+governor_ionice_class = 3
+governor_nice_level = 19
+
+# The bytes per second extractions may read, across all extraction jobs.
+# Where systemd-run can create a transient scope and the file is on a local block device,
+# each extraction's reads are limited directly (IOReadBandwidthMax, cgroup io.max).
+# Elsewhere only the starts of extractions are spaced out, each charged the file size
+# up front, and a single extraction still reads at full speed.
+# 0 for unlimited.
+governor_read_bytes_per_second = 50 * 1024 * 1024
+
+# The maximum number of concurrent heavy subprocesses, per class.
+governor_concurrency = {
+    "extract": 1,
+    "ocr": 1,
+    "write": 1,
+}
+
+# The 1-minute load average per CPU above which new heavy work backs off.
+# The load this tool adds itself (its running tools and its own CPU) is subtracted first.
+# 0 to ignore the load average.
+governor_max_load = 0.75
+
+# A file that a playback hook creates while something is playing,
+# new heavy work backs off while it exists. Empty to disable.
+governor_pause_file = ""
+
+# The longest wait between load checks while backing off, in seconds.
+governor_max_backoff_seconds = 60
+
+# The maximum number of cleaned subtitle lines whose predicted language is kept
+# in memory, so repeated lines (OP/ED lyrics, catchphrases, signs) are only predicted once.
+line_cache_size = 100000
+
+# An optional SQLite file that persists the predicted line languages across runs.
+# Empty to only cache in memory.
+line_cache_path = ""
+
+# Parse ASS/SSA tracks directly and only feed their dialogue events to detection,
+# skipping sign, typesetting and karaoke events. ASS tracks no longer go through SubtitleEdit.
+ass_style_filtering = True
+
+# Style or actor names that mark an ASS event as a sign or karaoke event,
+# matched as whole words, in addition to the signs_keywords.
+ass_sign_style_keywords = [
+    "op",
+    "ed",
+    "kara",
+    "karaoke",
+    "romaji",
+    "kanji",
+    "title",
+    "typeset",
+    "ts",
+    "insert",
+    "lyrics",
+    "eyecatch",
+]
+
+# The number of events sharing the same start and end time at which
+# they are treated as a layered sign.
+ass_layered_event_threshold = 3
+
+# OCR image subtitles (PGS/VobSub) by decoding their bitmaps and running Tesseract
+# on a sample of them, instead of SubtitleEdit's full OCR of every bitmap.
+# Falls back to SubtitleEdit when Tesseract isn't installed or decoding fails.
+native_ocr_enabled = True
+
+# The number of bitmaps OCR'd per track, spread evenly across it. 0 for all of them.
+native_ocr_sample_count = 40
+
+# The number of Tesseract processes run in parallel per track.
+native_ocr_workers = 4
+
+# The Tesseract languages, joined with "+", EX: "eng+jpn".
+# Each needs its traineddata installed (tesseract-ocr-<lang>), the missing ones are
+# skipped with a warning. Without a language's model its text is OCR'd as garbage.
+tesseract_languages = "eng+jpn+chi_sim+rus"
+
+# The mean word confidence (0 to 100) Tesseract needs for an OCR'd line to be kept.
+# When no sampled line reaches it, the track falls back to SubtitleEdit.
+native_ocr_min_confidence = 60
+
+# The number of mkvmerge processes reading track headers in parallel.
+header_read_workers = 8
+
+# An optional JSON file that caches the track headers by file size and
+# modification time across runs. Empty to only cache in memory.
+header_cache_path = ""
+
+# The estimated seconds per track action, used by --triage to estimate the cost
+# of each file. read_per_gb is added per extraction, as each one reads the whole file.
+triage_cost_seconds = {
+    "elimination": 0.5,
+    "keyword": 0.5,
+    "rule": 0.5,
+    "extract": 2,
+    "ocr": 20,
+    "read_per_gb": 5,
+}
+
+# The languages subtitles are expected in, as fastText labels: the ngram backend
+# profiles these, and evaluate_detectors.py reports the accuracy on them.
+# These cover the languages in lang_codes.
+detector_languages = [
+    "en",
+    "ja",
+    "es",
+    "pt",
+    "fr",
+    "de",
+    "it",
+    "ko",
+    "pl",
+    "ru",
+    "sv",
+    "tr",
+    "vi",
+    "ar",
+    "he",
+    "ca",
+    "cs",
+    "da",
+    "el",
+    "fi",
+    "hu",
+    "id",
+    "no",
+    "nl",
+    "ro",
+    "sk",
+    "sl",
+    "sr",
+    "uk",
+    "zh",
+]
+
+# How a track's subtitle lines are scored:
+# "lines" predicts every unique cleaned line and counts the votes.
+# "windows" joins the cleaned lines into windows of detection_window_size characters,
+# predicts those in one batch, and weights each window's language by its probability and length.
+detection_mode = "lines"
+
+# The size in characters of each window when detection_mode is "windows".
+detection_window_size = 400
+
+# The number of files edited in parallel when applying an edit plan with --apply.
+apply_workers = 16
+
+# The bytes read from the start and the end of each file to fingerprint it in an edit plan,
+# so --apply can tell whether the file changed since it was planned.
+plan_fingerprint_bytes = 65536
+
+# The order path scans process directories in:
+# "walk" keeps the sorted os.walk order.
+# "newest" processes the directories with the most recently added files first,
+# and the newest files first within each directory. A file's age is its birth time
+# where the platform reports one, otherwise its modification time.
+scan_order = "walk"
+
+# Directories scanned before all others, in this order. Folder names (EX: "Zetman")
+# match anywhere in the path, other entries are resolved relative to the scanned path.
+priority_directories = []
+
+# Only scan files added or modified within this many days, 0 scans every file.
+# Useful for a frequent quick pass over new imports between full scans.
+fresh_days = 0
+
+# Whether or not to learn release group rules: after enough consistent detections of a
+# track with the same release group, track name and codec, later tracks like it are
+# set from the rule instead of being extracted and detected.
+release_rules_enabled = True
+
+# An optional JSON file that keeps the learned release group rules across runs.
+# Empty to only learn within a run.
+release_rules_path = ""
+
+# The consistent detections a release group, track name and codec need before their rule is used.
+release_rule_min_detections = 5
+
+# The minimum match percentage a detection needs to count towards a rule.
+release_rule_min_confidence = 90
+
+# Every this many uses, a rule is spot checked by running full detection instead,
+# a conflicting detection revokes the rule. 0 never spot checks.
+release_rule_spot_check_interval = 20
+
+# Whether or not to read the track headers and demux the text and PGS subtitle tracks of local
+# files with the built-in Matroska reader (file_sources.py) instead of mkvmerge and mkvextract.
+# Remote http(s) files, passed with -f or listed in a worklist, always go through it.
+native_demux_enabled = False
+
+# The clusters sampled when demuxing a subtitle track with the built-in reader,
+# spread across the ones the file's Cues list for the track. 0 reads every cluster.
+demux_sample_clusters = 32
+
+# The block size, cached blocks and read-ahead blocks of the HTTP range source for remote files.
+http_block_size = 262144
+http_cache_blocks = 64
+http_read_ahead_blocks = 4
+
+# Remote files can only be scanned with --plan. When applying the plan on a host with
+# local access to them, each url prefix here is replaced with its local path.
+# EX: {"https://gateway/anime/": "/mnt/anime/"}
+remote_path_mappings = {}
+
+# The CPU time between the stack samples of --profile, in seconds.
+profile_sample_interval = 0.005
+
+# The slowest files --profile reports the top functions and allocation sites of,
+# and how many of each it reports.
+profile_slowest_files = 10
+profile_top_entries = 10
@@ -0,0 +1,35 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+# the modules live next to the main script, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark_harness import generate_library
+
+
+# The main script, imported with arguments that only parse the settings
+@pytest.fixture(scope="session")
+def corrector():
+    argv = sys.argv
+    sys.argv = ["anime_lang_track_corrector.py", "--list-rules"]
+    try:
+        return importlib.import_module("anime_lang_track_corrector")
+    finally:
+        sys.argv = argv
+
+
+# The benchmark's synthetic library, two series of three episodes
+@pytest.fixture
+def library(tmp_path):
+    library_path = tmp_path / "library"
+    generate_library(str(library_path), 2, 3, 20)
+    return library_path
+
+
+# The episode paths of the synthetic library, in disk order
+@pytest.fixture
+def episodes(library):
+    return sorted(str(path) for path in library.rglob("*.mkv"))
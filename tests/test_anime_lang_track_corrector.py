@@ -0,0 +1,217 @@
+import json
+import os
+
+import pytest
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    return str(tmp_path / "logs" / "journal.jsonl")
+
+
+def read_journal(journal_path):
+    with open(journal_path, "r", encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle]
+
+
+def test_journal_resume_skips_completed_files(corrector, journal_path, episodes):
+    journal = corrector.RunJournal(journal_path, 2)
+    journal.open(False)
+    corrector.items_changed.append("changed the first episode")
+    journal.record_file(episodes[0], {2: "eng"})
+    journal.record_file(episodes[1], {}, failed=True)
+    journal.record_file(episodes[2], {3: "spa"})
+    # interrupted before the third episode's batch was checkpointed
+    journal.handle.close()
+
+    entries = read_journal(journal_path)
+    assert [entry["type"] for entry in entries] == ["run_start", "file", "file"]
+    assert entries[1]["changes"] == ["changed the first episode"]
+    assert not corrector.items_changed
+
+    resumed = corrector.RunJournal(journal_path, 2)
+    resumed.open(True)
+    assert resumed.is_completed(episodes[0])
+    assert resumed.get_decisions(episodes[0]) == {2: "eng"}
+    # failed files are processed again
+    assert not resumed.is_completed(episodes[1])
+    assert not resumed.is_completed(episodes[2])
+
+    resumed.record_file(episodes[1], {2: "jpn"})
+    resumed.close("complete")
+    again = corrector.RunJournal(journal_path, 2)
+    again.open(True)
+    assert again.get_decisions(episodes[1]) == {2: "jpn"}
+    again.close("complete")
+
+
+def test_journal_resume_skips_torn_line(corrector, journal_path, episodes):
+    journal = corrector.RunJournal(journal_path, 1)
+    journal.open(False)
+    journal.record_file(episodes[0], {2: "eng"})
+    journal.handle.write('{"type": "file", "path": "')
+    journal.handle.close()
+
+    resumed = corrector.RunJournal(journal_path, 1)
+    resumed.open(True)
+    assert list(resumed.completed) == [episodes[0]]
+    resumed.close("complete")
+
+
+def test_journal_rotates_unfinished_run(corrector, journal_path, episodes):
+    journal = corrector.RunJournal(journal_path, 1)
+    journal.open(False)
+    journal.record_file(episodes[0], {2: "eng"})
+    journal.handle.close()
+
+    # a run started without resuming keeps the unfinished journal aside
+    restarted = corrector.RunJournal(journal_path, 1)
+    restarted.open(False)
+    assert not restarted.completed
+    restarted.close("complete")
+    folder = os.path.dirname(journal_path)
+    assert len(os.listdir(folder)) == 2
+
+    # a finished journal is replaced
+    replaced = corrector.RunJournal(journal_path, 1)
+    replaced.open(False)
+    replaced.handle.close()
+    assert len(os.listdir(folder)) == 2
+    assert [entry["type"] for entry in read_journal(journal_path)] == ["run_start"]
+
+
+def test_file_identity(corrector, episodes):
+    identity = corrector.get_file_identity(episodes[0])
+    assert identity["size"] == os.path.getsize(episodes[0])
+    assert corrector.matches_file_identity(episodes[0], identity)
+    # the same content elsewhere matches too, the modification time isn't compared
+    assert corrector.matches_file_identity(episodes[1], identity)
+
+    os.utime(episodes[0], ns=(0, 0))
+    assert corrector.matches_file_identity(episodes[0], identity)
+
+    with open(episodes[0], "r+b") as handle:
+        handle.seek(-1, os.SEEK_END)
+        handle.write(b"!")
+    assert not corrector.matches_file_identity(episodes[0], identity)
+
+    os.remove(episodes[0])
+    assert not corrector.matches_file_identity(episodes[0], identity)
+
+
+def test_file_identity_reads_head_and_tail(corrector, tmp_path):
+    size = corrector.plan_fingerprint_bytes * 3
+    path = tmp_path / "episode.mkv"
+    path.write_bytes(bytes(size))
+    identity = corrector.get_file_identity(str(path))
+
+    # the middle of the file is the clusters, which a language edit doesn't touch
+    with open(path, "r+b") as handle:
+        handle.seek(size // 2)
+        handle.write(b"!")
+    assert corrector.matches_file_identity(str(path), identity)
+
+    path.write_bytes(b"!" + bytes(size - 1))
+    assert not corrector.matches_file_identity(str(path), identity)
+
+
+def test_plan_applies_under_another_root(corrector, monkeypatch, tmp_path, library, episodes):
+    plan_path = str(tmp_path / "plan.jsonl")
+    plan = corrector.EditPlan(plan_path, str(library))
+    plan.open(False)
+    edit = {"track": 2, "old": "und", "new": "eng", "evidence": "detection"}
+    plan.record_file(episodes[3], {2: edit})
+    plan.record_file(episodes[0], {2: edit})
+    plan.handle.close()
+
+    entries = corrector.read_edit_plan(plan_path)
+    assert [entry["path"] for entry in entries] == [
+        os.path.relpath(episodes[0], library),
+        os.path.relpath(episodes[3], library),
+    ]
+    assert [corrector.get_planned_path(entry) for entry in entries] == [
+        episodes[0],
+        episodes[3],
+    ]
+    monkeypatch.setattr(corrector, "apply_root", "/replica")
+    assert corrector.get_planned_path(entries[0]) == os.path.join(
+        "/replica", os.path.relpath(episodes[0], library)
+    )
+
+
+def test_plan_skips_changed_files(corrector, monkeypatch, tmp_path, episodes):
+    plan_path = str(tmp_path / "plan.jsonl")
+    plan = corrector.EditPlan(plan_path)
+    plan.open(False)
+    plan.record_file(
+        episodes[0], {2: {"track": 2, "old": "und", "new": "eng", "evidence": "detection"}}
+    )
+    plan.handle.close()
+    with open(episodes[0], "a", encoding="utf-8") as handle:
+        handle.write("\n")
+
+    commands = []
+    monkeypatch.setattr(corrector, "lock_files_enabled", False)
+    monkeypatch.setattr(corrector, "execute_command", lambda *args: commands.append(args))
+    monkeypatch.setattr(corrector, "errors", [])
+    entry = corrector.read_edit_plan(plan_path)[0]
+    assert corrector.apply_file_edits(entry) == "changed"
+    assert not commands
+
+
+def make_lines(text, count=20):
+    return [text] * count
+
+
+@pytest.mark.parametrize(
+    "text, language",
+    [
+        # kana with Han is Japanese, Han with no kana Chinese
+        ("今日はいい天気ですね、散歩に行きましょう", "ja"),
+        ("今天天气很好，我们去散步吧", "zh"),
+        ("오늘은 날씨가 좋네요", "ko"),
+        ("Σήμερα ο καιρός είναι καλός", "el"),
+        ("Сегодня хорошая погода, пойдём гулять вы", "ru"),
+        ("Сьогодні гарна погода, їдемо гуляти", "uk"),
+        ("Данас је лепо време, хајде да шетамо", "sr"),
+    ],
+)
+def test_script_language(corrector, text, language):
+    result = corrector.detect_script_language(make_lines(text))
+    assert result is not None
+    assert result[0] == language
+    assert result[1] >= corrector.script_detection_threshold
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        # Latin scripts are left to the detector
+        "The weather is nice today, let's go for a walk",
+        # Bulgarian has no marker letters of its own
+        "Днес времето е хубаво, да отидем на разходка",
+        # Belarusian shares letters with Russian and Ukrainian
+        "Сёння добрае надвор'е, пойдзем гуляць ў парк",
+        # markers of two languages
+        "Сьогодні ї гарна погода, вы",
+        # Macedonian markers are left to the detector
+        "Денес времето е убаво, ќе одиме на прошетка",
+        # no script dominates
+        "Сегодня хорошая погода вы and the weather is nice today",
+    ],
+)
+def test_script_language_deferred(corrector, text):
+    assert corrector.detect_script_language(make_lines(text)) is None
+
+
+def test_script_language_needs_enough_letters(corrector):
+    text = "今日はいい天気"
+    assert corrector.detect_script_language([text]) is None
+    assert corrector.detect_script_language(make_lines(text)) == ("ja", 100.0)
+    assert corrector.detect_script_language([]) is None
+
+
+def test_stray_kana_is_chinese(corrector):
+    # one kana letter in 28 CJK letters, under script_detection_min_kana_percent
+    text = "今天天气很好，我们去散步吧。明天也许会下雨，我们在家看电视吧の"
+    assert corrector.detect_script_language(make_lines(text))[0] == "zh"
@@ -0,0 +1,372 @@
+import contextlib
+import functools
+import http.server
+import threading
+import urllib.error
+
+import pytest
+
+import file_sources as mkv
+from file_sources import (
+    HttpRangeSource,
+    LocalFileSource,
+    MatroskaReader,
+    RangeRequestHandler,
+    extract_track,
+    read_vint,
+)
+
+BLOCK_SIZE = 4096
+# not a multiple of the block size, so the last block is short
+FILE_SIZE = BLOCK_SIZE * 10 + 123
+
+
+class QuietRangeRequestHandler(RangeRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+# Serves the folder on a local port, yields its url
+@contextlib.contextmanager
+def serve_folder(folder):
+    handler = functools.partial(QuietRangeRequestHandler, directory=str(folder))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(scope="module")
+def served_file(tmp_path_factory):
+    folder = tmp_path_factory.mktemp("served")
+    data = bytes(index * 7 % 251 for index in range(FILE_SIZE))
+    (folder / "video.mkv").write_bytes(data)
+    with serve_folder(folder) as url:
+        yield f"{url}/video.mkv", data
+
+
+def open_source(url, **kwargs):
+    kwargs.setdefault("read_ahead_blocks", 0)
+    return HttpRangeSource(url, block_size=BLOCK_SIZE, **kwargs)
+
+
+def test_size_from_head_request(served_file):
+    url, data = served_file
+    with open_source(url) as source:
+        assert source.size == len(data)
+        assert source.block_count == 11
+        assert source.validator is not None
+        assert source.stats()["requests"] == 1
+
+
+def test_nearby_blocks_are_coalesced(served_file):
+    url, data = served_file
+    with open_source(url, max_gap_blocks=1) as source:
+        # blocks 0 and 2 are one block apart, so one request also fetches block 1
+        source.prefetch([(10, 20), (BLOCK_SIZE * 2 + 10, 20)])
+        assert source.stats()["requests"] == 2
+        assert source.stats()["bytes_fetched"] == BLOCK_SIZE * 3
+        assert source.read(BLOCK_SIZE + 5, 10) == data[BLOCK_SIZE + 5 : BLOCK_SIZE + 15]
+        assert source.stats()["requests"] == 2
+
+        # blocks 5 and 8 are too far apart
+        source.prefetch([(BLOCK_SIZE * 5, 1), (BLOCK_SIZE * 8, 1)])
+        assert source.stats()["requests"] == 4
+        assert source.stats()["bytes_fetched"] == BLOCK_SIZE * 5
+
+
+def test_read_spanning_blocks(served_file):
+    url, data = served_file
+    with open_source(url) as source:
+        offset = BLOCK_SIZE - 100
+        assert source.read(offset, BLOCK_SIZE * 2) == data[offset : offset + BLOCK_SIZE * 2]
+        assert source.stats()["requests"] == 2
+        assert source.stats()["bytes_read"] == BLOCK_SIZE * 2
+
+
+def test_read_ahead_only_when_sequential(served_file):
+    url, data = served_file
+    with open_source(url, read_ahead_blocks=2) as source:
+        # the first read has no previous one to continue
+        assert source.read(0, 10) == data[:10]
+        assert source.stats()["bytes_fetched"] == BLOCK_SIZE
+
+        # continuing reads fetch the next blocks along in the same request
+        assert source.read(BLOCK_SIZE, 10) == data[BLOCK_SIZE : BLOCK_SIZE + 10]
+        assert source.stats()["requests"] == 3
+        assert source.stats()["bytes_fetched"] == BLOCK_SIZE * 4
+        for index in [2, 3]:
+            offset = BLOCK_SIZE * index
+            assert source.read(offset, 10) == data[offset : offset + 10]
+        assert source.stats()["requests"] == 3
+
+        # a seek doesn't read ahead
+        source.read(BLOCK_SIZE * 7, 10)
+        assert source.stats()["bytes_fetched"] == BLOCK_SIZE * 5
+
+
+def test_cache_evicts_least_recently_used(served_file):
+    url, data = served_file
+    with open_source(url, cache_blocks=2) as source:
+        for index in [0, 4, 0, 8]:
+            source.read(BLOCK_SIZE * index, 1)
+        assert list(source.blocks) == [0, 8]
+        assert source.stats()["requests"] == 4
+
+
+def test_short_read_at_end_of_file(served_file):
+    url, data = served_file
+    with open_source(url, read_ahead_blocks=4) as source:
+        offset = BLOCK_SIZE * 9
+        assert source.read(offset, BLOCK_SIZE) == data[offset : offset + BLOCK_SIZE]
+        # reading ahead stops at the last block, which is only as long as what's left
+        assert source.read(BLOCK_SIZE * 10, 200) == data[BLOCK_SIZE * 10 :]
+        assert len(source.blocks[10]) == 123
+        assert source.stats()["bytes_fetched"] == BLOCK_SIZE + 123
+
+        assert source.read(FILE_SIZE - 10, 100) == data[-10:]
+        assert source.read(FILE_SIZE, 10) == b""
+        assert source.read(FILE_SIZE + 10, 10) == b""
+        assert source.stats()["requests"] == 3
+
+
+def test_unsatisfiable_range(served_file):
+    url, data = served_file
+    with open_source(url) as source:
+        with pytest.raises(urllib.error.HTTPError) as error:
+            source.fetch_range(FILE_SIZE, FILE_SIZE + 10)
+        assert error.value.code == 416
+        assert source.stats()["requests"] == 1
+
+
+# Builds an EBML element from its id and an int, string, bytes or list of elements payload
+def element(element_id, payload):
+    if isinstance(payload, int):
+        payload = payload.to_bytes(max((payload.bit_length() + 7) // 8, 1), "big")
+    elif isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    elif isinstance(payload, list):
+        payload = b"".join(payload)
+    size_length = 1
+    while len(payload) >= (1 << (7 * size_length)) - 1:
+        size_length += 1
+    size = ((1 << (7 * size_length)) | len(payload)).to_bytes(size_length, "big")
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, "big") + size + payload
+
+
+def make_seek(element_id, position):
+    return element(
+        mkv.SEEK,
+        [
+            element(mkv.SEEK_ID, element_id),
+            element(mkv.SEEK_POSITION, position.to_bytes(4, "big")),
+        ],
+    )
+
+
+def make_simple_block(track_number, timecode, text):
+    return element(
+        mkv.SIMPLE_BLOCK,
+        bytes([0x80 | track_number]) + timecode.to_bytes(2, "big") + b"\x80" + text.encode(),
+    )
+
+
+# Builds a Matroska file with a video track and a subtitle track in two clusters,
+# listed in the SeekHead and, when cues is set, in the Cues
+def make_matroska(path, subtitle_entry=(), cues=True):
+    info = element(mkv.INFO, [element(mkv.TIMECODE_SCALE, 1000000)])
+    tracks = element(
+        mkv.TRACKS,
+        [
+            element(
+                mkv.TRACK_ENTRY,
+                [
+                    element(mkv.TRACK_NUMBER, 1),
+                    element(mkv.TRACK_UID, 11),
+                    element(mkv.TRACK_TYPE, 1),
+                    element(mkv.CODEC_ID, "V_MPEG4/ISO/AVC"),
+                    element(mkv.TRACK_LANGUAGE, "und"),
+                ],
+            ),
+            element(
+                mkv.TRACK_ENTRY,
+                [
+                    element(mkv.TRACK_NUMBER, 2),
+                    element(mkv.TRACK_UID, 22),
+                    element(mkv.TRACK_TYPE, 0x11),
+                    element(mkv.CODEC_ID, "S_TEXT/UTF8"),
+                    element(mkv.TRACK_NAME, "Full Subs"),
+                    element(mkv.FLAG_DEFAULT, 0),
+                    *subtitle_entry,
+                ],
+            ),
+        ],
+    )
+    tags = element(
+        mkv.TAGS,
+        [
+            element(
+                mkv.TAG,
+                [
+                    element(mkv.TARGETS, [element(mkv.TAG_TRACK_UID, 22)]),
+                    element(
+                        mkv.SIMPLE_TAG,
+                        [element(mkv.TAG_NAME, "NUMBER_OF_FRAMES"), element(mkv.TAG_STRING, "3")],
+                    ),
+                    element(
+                        mkv.SIMPLE_TAG,
+                        [element(mkv.TAG_NAME, "NUMBER_OF_BYTES"), element(mkv.TAG_STRING, "15")],
+                    ),
+                ],
+            )
+        ],
+    )
+    clusters = [
+        element(
+            mkv.CLUSTER,
+            [
+                element(mkv.CLUSTER_TIMECODE, 0),
+                make_simple_block(1, 0, "video"),
+                make_simple_block(2, 1000, "one"),
+                element(
+                    mkv.BLOCK_GROUP,
+                    [
+                        element(mkv.BLOCK, make_simple_block(2, 3000, "two")[2:]),
+                        element(mkv.BLOCK_DURATION, 500),
+                    ],
+                ),
+            ],
+        ),
+        element(
+            mkv.CLUSTER,
+            [element(mkv.CLUSTER_TIMECODE, 10000), make_simple_block(2, 0, "three")],
+        ),
+    ]
+
+    # the SeekHead's size doesn't depend on the positions it lists
+    seek_head_size = len(element(mkv.SEEK_HEAD, [make_seek(mkv.TRACKS, 0)] * (4 if cues else 3)))
+    positions = {}
+    position = seek_head_size
+    for element_id, data in [(mkv.INFO, info), (mkv.TRACKS, tracks), (mkv.TAGS, tags)]:
+        positions[element_id] = position
+        position += len(data)
+    cluster_positions = []
+    for cluster in clusters:
+        cluster_positions.append(position)
+        position += len(cluster)
+    cue_points = element(
+        mkv.CUES,
+        [
+            element(
+                mkv.CUE_POINT,
+                [
+                    element(
+                        mkv.CUE_TRACK_POSITIONS,
+                        [
+                            element(mkv.CUE_TRACK, 2),
+                            element(mkv.CUE_CLUSTER_POSITION, cluster_position),
+                        ],
+                    )
+                ],
+            )
+            for cluster_position in cluster_positions
+        ],
+    )
+    if cues:
+        positions[mkv.CUES] = position
+    seek_head = element(
+        mkv.SEEK_HEAD,
+        [make_seek(element_id, position) for element_id, position in positions.items()],
+    )
+    segment = seek_head + info + tracks + tags + b"".join(clusters)
+    if cues:
+        segment += cue_points
+
+    header = element(mkv.EBML_HEADER, [element(0x4282, "matroska")])
+    path.write_bytes(header + element(mkv.SEGMENT, segment))
+    return str(path)
+
+
+def test_read_vint():
+    assert read_vint(bytes([0x81]), 0) == (1, 1)
+    assert read_vint(bytes([0x40, 0x02]), 0) == (2, 2)
+    assert read_vint(bytes([0x1A, 0x45, 0xDF, 0xA3]), 0, keep_marker=True) == (mkv.EBML_HEADER, 4)
+    # all ones is the reserved unknown size
+    assert read_vint(bytes([0xFF]), 0) == (None, 1)
+    with pytest.raises(ValueError):
+        read_vint(bytes(9), 0)
+
+
+def test_read_tracks(tmp_path):
+    path = make_matroska(tmp_path / "episode.mkv", [element(mkv.TRACK_LANGUAGE, "jpn")])
+    with LocalFileSource(path) as source:
+        tracks = MatroskaReader(source).read_tracks()
+
+    assert [(track["id"], track["type"], track["codec"]) for track in tracks] == [
+        (0, "video", "AVC/H.264/MPEG-4p10"),
+        (1, "subtitles", "SubRip/SRT"),
+    ]
+    assert tracks[1]["properties"] == {
+        "number": 2,
+        "track_name": "Full Subs",
+        "language": "jpn",
+        "default_track": False,
+        "forced_track": False,
+        "tag_number_of_frames": "3",
+        "tag_number_of_bytes": "15",
+    }
+    # the video track has no statistics tags
+    assert "tag_number_of_frames" not in tracks[0]["properties"]
+
+
+def test_read_tracks_language_defaults_and_ietf(tmp_path):
+    path = make_matroska(tmp_path / "default.mkv")
+    with LocalFileSource(path) as source:
+        assert MatroskaReader(source).read_tracks()[1]["properties"]["language"] == "eng"
+
+    # mkvpropedit writes both, the IETF tag wins
+    path = make_matroska(
+        tmp_path / "ietf.mkv",
+        [element(mkv.TRACK_LANGUAGE, "und"), element(mkv.TRACK_LANGUAGE_IETF, "de")],
+    )
+    with LocalFileSource(path) as source:
+        properties = MatroskaReader(source).read_tracks()[1]["properties"]
+    assert (properties["language"], properties["language_ietf"]) == ("ger", "de")
+
+
+@pytest.mark.parametrize("cues", [True, False])
+def test_extract_track(tmp_path, cues):
+    path = make_matroska(tmp_path / "episode.mkv", cues=cues)
+    output = tmp_path / "subtitles.srt"
+    with LocalFileSource(path) as source:
+        assert extract_track(source, 1, str(output)) == 3
+    assert output.read_text(encoding="utf-8") == (
+        "1\n00:00:01,000 --> 00:00:03,000\none\n\n"
+        "2\n00:00:03,000 --> 00:00:03,500\ntwo\n\n"
+        "3\n00:00:10,000 --> 00:00:12,000\nthree\n\n"
+    )
+
+
+def test_extract_track_sampled_over_http(tmp_path):
+    folder = tmp_path / "served"
+    folder.mkdir()
+    make_matroska(folder / "episode.mkv")
+    output = tmp_path / "subtitles.srt"
+    with serve_folder(folder) as url:
+        with open_source(f"{url}/episode.mkv") as source:
+            # only the first of the two clusters the Cues list
+            assert extract_track(source, 1, str(output), sample_clusters=1) == 2
+    text = output.read_text(encoding="utf-8")
+    assert "two" in text
+    assert "three" not in text
+
+
+def test_not_matroska(tmp_path):
+    path = tmp_path / "episode.mkv"
+    path.write_bytes(b"not a matroska file")
+    with LocalFileSource(str(path)) as source:
+        with pytest.raises(ValueError):
+            MatroskaReader(source)
@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+
+from image_subtitles import (
+    PGS_CLOCK_RATE,
+    PGS_COMPOSITION_SEGMENT,
+    PGS_END_SEGMENT,
+    PGS_OBJECT_SEGMENT,
+    PGS_PALETTE_SEGMENT,
+    decode_pgs_rle,
+    decode_vobsub_bitmap,
+    decode_vobsub_field,
+    image_border,
+    read_pgs_display_sets,
+)
+
+
+def test_pgs_rle_runs():
+    data = bytes(
+        [
+            # one pixel of color 1, three of color 0, four of color 5
+            0x01, 0x00, 0x03, 0x00, 0x84, 0x05, 0x00, 0x00,
+            # eight pixels of color 2, with the long run length form
+            0x00, 0xC0, 0x08, 0x02, 0x00, 0x00,
+        ]
+    )
+    bitmap = decode_pgs_rle(data, 8, 2)
+    assert bitmap.tolist() == [
+        [1, 0, 0, 0, 5, 5, 5, 5],
+        [2, 2, 2, 2, 2, 2, 2, 2],
+    ]
+
+
+def test_pgs_rle_clips_long_rows_and_missing_rows():
+    # ten pixels on a row four wide, and no second row
+    bitmap = decode_pgs_rle(bytes([0x00, 0x8A, 0x03, 0x00, 0x00]), 4, 2)
+    assert bitmap.tolist() == [[3, 3, 3, 3], [0, 0, 0, 0]]
+
+
+def test_pgs_rle_truncated():
+    with pytest.raises(ValueError):
+        decode_pgs_rle(bytes([0x01, 0x00, 0x84]), 4, 1)
+
+
+def test_vobsub_field_code_lengths():
+    data = bytes(
+        [
+            # runs of 2 x 1, 1 x 2 and 1 x 3 in one nibble each, padded to a byte
+            0x96, 0x70,
+            # a run of 5 x 3 in two nibbles
+            0x17,
+            # a run of 16 x 1 in three nibbles, padded
+            0x04, 0x10,
+            # the rest of the line in color 2, in four nibbles
+            0x00, 0x02,
+        ]
+    )
+    lines = decode_vobsub_field(data, 0, 4, 1)
+    assert [list(line) for line in lines] == [[1, 1, 2, 3]]
+    assert list(decode_vobsub_field(data, 2, 5, 1)[0]) == [3] * 5
+    assert list(decode_vobsub_field(data, 3, 16, 1)[0]) == [1] * 16
+    assert list(decode_vobsub_field(data, 5, 6, 1)[0]) == [2] * 6
+
+
+def test_vobsub_bitmap_interlaces_fields():
+    # the top field has the even lines, the bottom field the odd lines
+    data = bytes([0x96, 0x70, 0x96, 0x70, 0x00, 0x02])
+    bitmap = decode_vobsub_bitmap(data, 0, 4, 4, 3)
+    assert bitmap.tolist() == [[1, 1, 2, 3], [2, 2, 2, 2], [1, 1, 2, 3]]
+
+
+def test_vobsub_field_truncated():
+    with pytest.raises(ValueError):
+        decode_vobsub_field(bytes([0x96]), 0, 4, 1)
+
+
+# Builds a PGS segment at the timestamp, in seconds
+def make_pgs_segment(seconds, segment_type, segment):
+    pts = int(seconds * PGS_CLOCK_RATE).to_bytes(4, "big")
+    header = bytes([segment_type]) + len(segment).to_bytes(2, "big")
+    return b"PG" + pts + bytes(4) + header + segment
+
+
+# Builds a display set showing a 4x2 object of color 1 at (100, 50)
+def make_pgs_display_set(seconds):
+    composition = (
+        (1920).to_bytes(2, "big")
+        + (1080).to_bytes(2, "big")
+        + bytes([0x10, 0x00, 0x01, 0x80, 0x00, 0x00, 0x01])
+        + bytes([0x00, 0x00, 0x00, 0x00])
+        + (100).to_bytes(2, "big")
+        + (50).to_bytes(2, "big")
+    )
+    # palette 0: color 1 is opaque white
+    palette = bytes([0x00, 0x00, 0x01, 0xFF, 0x80, 0x80, 0xFF])
+    rle = bytes([0x00, 0x84, 0x01, 0x00, 0x00]) * 2
+    pgs_object = (
+        bytes([0x00, 0x00, 0x00, 0xC0])
+        + (len(rle) + 4).to_bytes(3, "big")
+        + (4).to_bytes(2, "big")
+        + (2).to_bytes(2, "big")
+        + rle
+    )
+    return (
+        make_pgs_segment(seconds, PGS_COMPOSITION_SEGMENT, composition)
+        + make_pgs_segment(seconds, PGS_PALETTE_SEGMENT, palette)
+        + make_pgs_segment(seconds, PGS_OBJECT_SEGMENT, pgs_object)
+        + make_pgs_segment(seconds, PGS_END_SEGMENT, b"")
+    )
+
+
+def test_pgs_display_sets_render():
+    display_sets = read_pgs_display_sets(make_pgs_display_set(1) + make_pgs_display_set(3))
+    assert [display_set.start for display_set in display_sets] == [1, 3]
+    # the next composition ends the previous display set
+    assert display_sets[0].end == 3
+    assert display_sets[1].end is None
+
+    image = display_sets[0].render()
+    assert image.shape == (2 + image_border * 2, 4 + image_border * 2)
+    text = image[image_border : image_border + 2, image_border : image_border + 4]
+    assert (text == 0).all()
+    assert image[0, 0] == 255
+    assert np.count_nonzero(image == 0) == 8
+
+
+def test_pgs_invalid_segment():
+    with pytest.raises(ValueError):
+        read_pgs_display_sets(b"XX" + bytes(11))